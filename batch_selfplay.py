@@ -0,0 +1,169 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard, STATE_STRINGS, WINNING_COMBINATIONS
+from simple_selfplay import load_agent, save_agent, play_training_game
+from tqdm import tqdm
+import numpy as np
+import argparse
+import time
+
+EMPTY, X, O = 0, 1, 2 # Cell values, X and O are also the base 3 digits of the markers
+MARKERS = {X: "X", O: "O"}
+POWERS_OF_3 = 3 ** np.arange(9, dtype=np.int64)
+#Column j is the mask of winning combination j.
+WIN_LINES = np.zeros((9, len(WINNING_COMBINATIONS)), dtype=np.int8)
+for line, combo in enumerate(WINNING_COMBINATIONS):
+    WIN_LINES[combo, line] = 1
+
+
+def batch_weighted_moves(rewards: np.ndarray, legal: np.ndarray, rng: np.random.Generator):
+    """
+    Pick one move per row with the same weights as random_weighted_move.
+
+    :param rewards: An (N, 9) array of move rewards.
+    :param legal: An (N, 9) boolean array of the valid moves.
+    :param rng: The random generator to draw with.
+    :return: An (N,) array of move indices.
+    """
+    low = np.where(legal, rewards, np.inf).min(axis=1, keepdims=True)
+    high = np.where(legal, rewards, -np.inf).max(axis=1, keepdims=True)
+    spread = high - low
+    normalized = np.divide(rewards - low, spread, out=np.zeros_like(rewards), where=spread > 0)
+    weights = np.where(legal, 1 / (1 + np.exp(-normalized)) + 0.01, 0)
+    cumulative = weights.cumsum(axis=1)
+    draws = rng.random((len(rewards), 1)) * cumulative[:, -1:]
+    #Illegal moves add no weight, so the first column past the draw is always a valid move
+    return (cumulative <= draws).sum(axis=1)
+
+
+def play_batch(agent1: Agent, agent2: Agent, games: int, rng: np.random.Generator):
+    """
+    Play a batch of games in lockstep against a snapshot of both brains.
+
+    Every game picks its moves from the brains as they were at the start of the batch, the
+    brains only learn from the batch once all of its games are over.
+
+    :return: The finished games in the order they ended as (states, movers, blocked, winner) tuples.
+    """
+    brains = {X: agent1.brain, O: agent2.brain}
+    boards = np.zeros((games, 9), dtype=np.int8)
+    state_index = np.zeros(games, dtype=np.int64)
+    movers = rng.choice(np.array([X, O], dtype=np.int8), size=games)
+    active = np.ones(games, dtype=bool)
+    contexts = {marker: [brain.root_context()] * games for marker, brain in brains.items()}
+    states = [[] for _ in range(games)]
+    mover_history = [[] for _ in range(games)]
+    blocked = [[] for _ in range(games)]
+    winners = [None] * games
+    finished = []
+
+    while active.any():
+        rows = np.flatnonzero(active)
+        mover = movers[rows]
+        legal = boards[rows] == EMPTY
+        candidates = state_index[rows, None] + mover[:, None].astype(np.int64) * POWERS_OF_3
+
+        #Brain lookups are per game, everything else works on the whole batch
+        rewards = np.zeros(legal.shape)
+        for i, row in enumerate(rows):
+            moves = legal[i]
+            next_states = [STATE_STRINGS[index] for index in candidates[i, moves]]
+            rewards[i, moves] = brains[mover[i]].context_rewards(contexts[mover[i]][row], next_states)
+
+        moves = batch_weighted_moves(rewards, legal, rng)
+        boards[rows, moves] = mover
+        state_index[rows] += mover * POWERS_OF_3[moves]
+        played = boards[rows]
+        own_lines = (played == mover[:, None]).astype(np.int8) @ WIN_LINES
+        opponent_lines = (played == (3 - mover)[:, None]).astype(np.int8) @ WIN_LINES
+        won = (own_lines == 3).any(axis=1)
+        blocks = ((opponent_lines == 2) & (WIN_LINES[moves] == 1)).any(axis=1)
+        over = won | (played != EMPTY).all(axis=1)
+
+        for i, row in enumerate(rows):
+            state = STATE_STRINGS[state_index[row]]
+            states[row].append(state)
+            mover_history[row].append(MARKERS[mover[i]])
+            blocked[row].append(bool(blocks[i]))
+            for marker, brain in brains.items():
+                contexts[marker][row] = brain.extend_context(contexts[marker][row], state, create=False)
+            if won[i]:
+                winners[row] = MARKERS[mover[i]]
+            if over[i]:
+                finished.append(row)
+        active[rows[over]] = False
+        movers[rows] = 3 - mover
+
+    return [(states[row], mover_history[row], blocked[row], winners[row]) for row in finished]
+
+
+def learn_games(agent1: Agent, agent2: Agent, games):
+    """Learn finished games into both brains in bulk with the same rewards as self play."""
+    for states, movers, blocked, winner in games:
+        for agent, opponent in ((agent1, agent2), (agent2, agent1)):
+            move_rewards = [None if not was_blocked else 0.5 if mover == agent.marker else 0
+                for mover, was_blocked in zip(movers, blocked)]
+            if winner == agent.marker:
+                reward = 1
+            elif winner == opponent.marker:
+                reward = -0.33
+            else:
+                reward = 0.2
+            agent.brain.learn_game(states, move_rewards, reward)
+
+
+def batch_self_play_loop(epochs: int, batch_size: int=1024, load_brains: bool=False, store=None, seed=None, save: bool=True, canonical: bool=False):
+    """
+    Batched self play, the brains produced are the same flat JSON tables as self_play_loop.
+
+    :param epochs: The number of games to play.
+    :param batch_size: The number of games to play in lockstep.
+    :return: The trained agents.
+    """
+    rng = np.random.default_rng(seed)
+    agent1 = Agent(marker="X", store=store, canonical=canonical)
+    agent2 = Agent(marker="O", store=store, canonical=canonical)
+    if load_brains:
+        agent1 = load_agent("brain1.json", "X", store, canonical)
+        agent2 = load_agent("brain2.json", "O", store, canonical)
+
+    remaining = epochs
+    with tqdm(total=epochs) as progress:
+        while remaining > 0:
+            games = play_batch(agent1, agent2, min(batch_size, remaining), rng)
+            learn_games(agent1, agent2, games)
+            remaining -= len(games)
+            progress.update(len(games))
+
+    if save:
+        save_agent(agent1, "brain1.json")
+        save_agent(agent2, "brain2.json")
+    return agent1, agent2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self play many games at once with NumPy.")
+    parser.add_argument("--epochs", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--canonical", action="store_true", help="Share learning across rotations and reflections.")
+    parser.add_argument("--load", action="store_true", help="Continue from brain1.json and brain2.json.")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", type=int, default=0, help="Also time this many games of the one at a time loop.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    batch_self_play_loop(args.epochs, args.batch_size, args.load, args.store, args.seed, not args.no_save, args.canonical)
+    batch_rate = args.epochs / (time.perf_counter() - start)
+    print(f"Batched: {batch_rate:,.0f} games/s")
+
+    if args.compare:
+        board = BitBoard()
+        agent1 = Agent(marker="X", store=args.store, canonical=args.canonical)
+        agent2 = Agent(marker="O", store=args.store, canonical=args.canonical)
+        start = time.perf_counter()
+        for _ in range(args.compare):
+            play_training_game(board, agent1, agent2)
+        single_rate = args.compare / (time.perf_counter() - start)
+        print(f"One at a time: {single_rate:,.0f} games/s")
+        print(f"Speedup: {batch_rate / single_rate:.2f}x")
@@ -0,0 +1,47 @@
+from plugin.tictactoe.game import Board, BitBoard
+import argparse
+import random
+import time
+
+def random_games(count: int, seed: int):
+    """Build seeded move sequences so both board cores replay the exact same games."""
+    rng = random.Random(seed)
+    board = BitBoard()
+    games = []
+    for _ in range(count):
+        board.reset()
+        moves = []
+        while not board.is_game_over():
+            move = rng.choice(board.get_valid_moves())
+            board.make_move(move)
+            moves.append(move)
+        games.append(moves)
+    return games
+
+def time_board(board_class, games):
+    """Replay the games doing the per move work of the self play loop, return seconds per move."""
+    board = board_class()
+    move_count = 0
+    start = time.perf_counter()
+    for moves in games:
+        board.reset()
+        for move in moves:
+            board.get_valid_moves()
+            board.make_move(move)
+            board.get_board_state()
+            board.check_if_last_move_blocked_win()
+            move_count += 1
+    return (time.perf_counter() - start) / move_count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per move cost of Board against BitBoard.")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = random_games(args.games, args.seed)
+    board_time = time_board(Board, games)
+    bitboard_time = time_board(BitBoard, games)
+    print(f"Board:    {board_time * 1e6:.3f} us/move")
+    print(f"BitBoard: {bitboard_time * 1e6:.3f} us/move")
+    print(f"Speedup:  {board_time / bitboard_time:.2f}x")
@@ -0,0 +1,64 @@
+from plugin.tictactoe.brainfile import write_brain_file, load_reward_store
+import subprocess
+import argparse
+import resource
+import random
+import json
+import time
+import sys
+import os
+
+def current_rss_mb():
+    """Get the resident set size of this process, falling back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(path: str, lookups: int):
+    """Load a brain in this process and print its load time, RSS growth and lookup time as JSON."""
+    baseline_rss = current_rss_mb()
+    start = time.perf_counter()
+    store = load_reward_store(path)
+    load_time = time.perf_counter() - start
+    rss = current_rss_mb() - baseline_rss
+
+    rng = random.Random(0)
+    keys = [store.cursor(key) for key in rng.sample(sorted(store.to_flat()), lookups)] if lookups else []
+    start = time.perf_counter()
+    for cursor in keys:
+        store.get(cursor)
+    lookup_time = (time.perf_counter() - start) / max(len(keys), 1)
+    print(json.dumps({
+        "load_seconds": load_time,
+        "lookup_us": lookup_time * 1e6,
+        "rss_mb": rss,
+    }))
+
+def run_measure(path: str, lookups: int):
+    """Measure a brain file in a fresh interpreter so peak RSS is not shared between formats."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.brainfile_benchmark", "--measure", path, "--lookups", str(lookups)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load time, lookup time and RSS of JSON against binary brains.")
+    parser.add_argument("brain", nargs="?", default="brain1.json", help="A JSON brain to convert and compare.")
+    parser.add_argument("--lookups", type=int, default=0, help="Time this many random key lookups, 0 skips it.")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.lookups)
+        sys.exit()
+
+    binary = os.path.splitext(args.brain)[0] + ".brain"
+    store = load_reward_store(args.brain)
+    write_brain_file(binary, store.to_flat(), store.to_flat_counts())
+    print(f"{len(store):,} entries, JSON {os.path.getsize(args.brain) / 2**20:.1f} MB, binary {os.path.getsize(binary) / 2**20:.1f} MB")
+    for name, path in (("json", args.brain), ("binary", binary)):
+        result = run_measure(path, args.lookups)
+        print(f"{name:>6}: load {result['load_seconds'] * 1000:8.1f} ms  lookup {result['lookup_us']:6.2f} us  RSS +{result['rss_mb']:7.1f} MB")
@@ -0,0 +1,132 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.pruning import is_fallback_file
+from plugin.tictactoe.game import BitBoard
+from plugin.tictactoe.solver import get_solver
+from benchmarks.symmetry_benchmark import greedy_move
+from simple_selfplay import play_training_game, save_agent
+from brain_tools import json_to_binary
+from evaluate import Evaluator, find_brains, standings
+import tempfile
+import subprocess
+import argparse
+import resource
+import random
+import json
+import time
+import sys
+import os
+
+def non_loss_rate(agent1: Agent, agent2: Agent, opponent, games: int, rng: random.Random):
+    """
+    Play each agent greedily against an opponent for half the games and return how often it did not lose.
+
+    :param opponent: Picks the opponent's move from the board, the opponent's marker and the random generator.
+    """
+    board = BitBoard()
+    not_lost = 0
+    for game in range(games):
+        agent = agent1 if game % 2 == 0 else agent2
+        marker = "X" if agent is agent1 else "O"
+        board.reset()
+        board.last_player = "O" # X always starts the evaluation games
+        context = agent.brain.root_context()
+        while not board.is_game_over():
+            mover = "O" if board.last_player == "X" else "X"
+            if mover == marker:
+                move = greedy_move(agent, context, board, marker, rng)
+            else:
+                move = opponent(board, mover, rng)
+            board.make_move(move)
+            context = agent.brain.extend_context(context, board.get_board_state(), create=False)
+        not_lost += board.get_winner() in (None, marker)
+    return not_lost / games
+
+def random_opponent(board: BitBoard, marker: str, rng: random.Random):
+    return rng.choice(board.get_valid_moves())
+
+def perfect_opponent(board: BitBoard, marker: str, rng: random.Random):
+    return rng.choice(get_solver().get_best_moves(board.get_board_state(), marker))
+
+def measure(games: int, budget: int, canonical: bool, evaluation_games: int, seed: int):
+    """Self play in this process and print the brain sizes, peak RSS and playing strength as JSON."""
+    random.seed(seed)
+    board = BitBoard()
+    agent1 = Agent(marker="X", canonical=canonical, budget=budget)
+    agent2 = Agent(marker="O", canonical=canonical, budget=budget)
+    start = time.perf_counter()
+    for _ in range(games):
+        play_training_game(board, agent1, agent2)
+    seconds = time.perf_counter() - start
+    get_solver() # Solve before reading the peak, so it is the same for both runs
+    rng = random.Random(seed)
+    print(json.dumps({
+        "seconds": seconds,
+        "histories": len(agent1.brain.store) + len(agent2.brain.store),
+        "pruned": agent1.brain.pruned + agent2.brain.pruned,
+        "fallback": len(agent1.brain.fallback) + len(agent2.brain.fallback),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "against_random": non_loss_rate(agent1, agent2, random_opponent, evaluation_games, rng),
+        "against_perfect": non_loss_rate(agent1, agent2, perfect_opponent, evaluation_games, rng),
+    }))
+
+def check_tournament(games: int, budget: int, seed: int):
+    """
+    Save a budgeted pair of brains, which leave fallback files beside them, and an unbounded pair to a directory,
+    and check that a tournament over it finds only the brains and plays every one of them.
+    """
+    random.seed(seed)
+    board = BitBoard()
+    with tempfile.TemporaryDirectory() as directory:
+        for name, brain_budget in (("budgeted", budget), ("unbounded", None)):
+            agents = [Agent(marker=marker, budget=brain_budget) for marker in "XO"]
+            for _ in range(games):
+                play_training_game(board, *agents)
+            for agent in agents:
+                save_agent(agent, os.path.join(directory, f"{name}_{agent.marker}.json"))
+        json_to_binary(os.path.join(directory, "budgeted_O.json"), os.path.join(directory, "budgeted_O.bin"))
+        fallback_files = [name for name in os.listdir(directory) if is_fallback_file(name)]
+        specs = find_brains(directory)
+        with Evaluator(specs, workers=2) as evaluator:
+            played = {player for player, _ in standings(evaluator.round_robin(100, seed))}
+    names = sorted(os.path.basename(spec) for spec in specs)
+    print(
+        f"tournament: {len(names)} brains found ({', '.join(names)}), {len(fallback_files)} fallback files skipped: "
+        f"{not any(is_fallback_file(spec) for spec in specs)}, every brain played: {played == set(specs)}"
+    )
+
+def run_measure(games: int, budget: int, canonical: bool, evaluation_games: int, seed: int):
+    """Measure a run in a fresh interpreter so peak RSS is not shared between runs."""
+    command = [
+        sys.executable, "-m", "benchmarks.budget_benchmark", "--measure", "--games", str(games),
+        "--evaluation-games", str(evaluation_games), "--seed", str(seed),
+    ]
+    if budget is not None:
+        command += ["--budget", str(budget)]
+    if canonical:
+        command.append("--canonical")
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS and playing strength of a long self play run with and without a history budget.")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--budget", type=int, default=None, help="The most histories each brain keeps in the budgeted run, 20,000 by default.")
+    parser.add_argument("--canonical", action="store_true")
+    parser.add_argument("--evaluation-games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.games, args.budget, args.canonical, args.evaluation_games, args.seed)
+        sys.exit()
+
+    limit = args.budget or 20000
+    for name, budget in (("unbounded", None), (f"budget {limit:,}", limit)):
+        result = run_measure(args.games, budget, args.canonical, args.evaluation_games, args.seed)
+        print(
+            f"{name:>16}: {result['histories']:8,} histories ({result['pruned']:,} pruned, {result['fallback']:,} fallback states)  "
+            f"peak RSS {result['peak_rss_mb']:6.1f} MB  {result['seconds']:6.1f} s  "
+            f"not lost {result['against_random']:.1%} vs random, {result['against_perfect']:.1%} vs perfect"
+        )
+    check_tournament(min(args.games, 5000), min(limit, 1000), args.seed)
@@ -0,0 +1,100 @@
+from plugin.tictactoe.checkpoint import Checkpointer, resume_together
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from simple_selfplay import play_training_game, save_agent
+import tempfile
+import argparse
+import random
+import time
+import os
+
+def train(epochs: int, seed: int, store: str, checkpoint=None):
+    """
+    Train two seeded agents, calling checkpoint(agents, epoch) after every epoch.
+
+    :return: The seconds spent training and the seconds spent in checkpoint.
+    """
+    random.seed(seed)
+    board = BitBoard()
+    agents = (Agent(marker="X", store=store), Agent(marker="O", store=store))
+    checkpoint_seconds = 0.0
+    start = time.perf_counter()
+    for epoch in range(1, epochs + 1):
+        play_training_game(board, *agents)
+        if checkpoint is not None:
+            checkpoint_start = time.perf_counter()
+            checkpoint(agents, epoch)
+            checkpoint_seconds += time.perf_counter() - checkpoint_start
+    return time.perf_counter() - start, checkpoint_seconds
+
+def brain_state(brain):
+    """Get everything a resumed brain should match, its last updates by history key rather than store cursor."""
+    store = brain.store
+    last_update = None if brain.last_update is None else {store.key(cursor): epoch for cursor, epoch in brain.last_update.items()}
+    return brain.epoch, last_update, store.to_flat(), store.to_flat_counts(), brain.fallback
+
+def check_resume(epochs: int, interval: int, seed: int, store: str, budget: int):
+    """
+    Checkpoint two seeded agents, resume fresh agents from the checkpoints, and check that the resumed brains
+    match the originals, and still match after both pairs train on for the same seeded games.
+    """
+    def play(agents, games, game_seed):
+        random.seed(game_seed)
+        board = BitBoard()
+        for _ in range(games):
+            play_training_game(board, *agents)
+
+    with tempfile.TemporaryDirectory() as directory:
+        agents = [Agent(marker=marker, store=store, budget=budget) for marker in "XO"]
+        checkpointers = [Checkpointer(agent.brain, directory, agent.marker, snapshot_every=4) for agent in agents]
+        random.seed(seed)
+        board = BitBoard()
+        for epoch in range(1, epochs + 1):
+            play_training_game(board, *agents)
+            if epoch % interval == 0:
+                for checkpointer in checkpointers:
+                    checkpointer.checkpoint(epoch)
+        resumed = [Agent(marker=marker, store=store, budget=budget) for marker in "XO"]
+        epoch = resume_together([Checkpointer(agent.brain, directory, agent.marker) for agent in resumed])
+        same = all(brain_state(agent.brain) == brain_state(original.brain) for agent, original in zip(resumed, agents))
+        play(agents, epochs // 4, seed + 1)
+        play(resumed, epochs // 4, seed + 1)
+        same_after = all(brain_state(agent.brain) == brain_state(original.brain) for agent, original in zip(resumed, agents))
+    pruned = sum(agent.brain.pruned for agent in agents)
+    print(f"resume at epoch {epoch:,}  brain state same: {same}, same after {epochs // 4:,} more games: {same_after} ({pruned:,} histories pruned)")
+
+def benchmark(epochs: int, interval: int, seed: int, store: str):
+    baseline, _ = train(epochs, seed, store)
+    print(f"no checkpoints        {epochs / baseline:,.0f} games/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpointers = []
+
+        def incremental(agents, epoch):
+            if not checkpointers:
+                checkpointers.extend(Checkpointer(agent.brain, directory, agent.marker, every_epochs=interval) for agent in agents)
+            for checkpointer in checkpointers:
+                checkpointer.maybe_checkpoint(epoch)
+
+        def full(agents, epoch):
+            if epoch % interval == 0:
+                for agent in agents:
+                    save_agent(agent, os.path.join(directory, f"{agent.marker}.json"))
+
+        for name, checkpoint in (("incremental", incremental), ("full save", full)):
+            elapsed, checkpoint_seconds = train(epochs, seed, store, checkpoint)
+            print(
+                f"{name:<21} {epochs / elapsed:,.0f} games/s, {checkpoint_seconds / elapsed:.1%} of training time"
+                f" ({(elapsed - baseline) / baseline:+.1%} run time against no checkpoints)"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training throughput with incremental checkpoints against full saves.")
+    parser.add_argument("--epochs", type=int, default=20000)
+    parser.add_argument("--interval", type=int, default=500, help="Epochs between checkpoints")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", choices=["flat", "trie"], default="flat")
+    parser.add_argument("--budget", type=int, default=2000, help="History budget of the brains in the resume check")
+    args = parser.parse_args()
+    benchmark(args.epochs, args.interval, args.seed, args.store)
+    check_resume(min(args.epochs, 4000), args.interval, args.seed, args.store, args.budget)
@@ -0,0 +1,81 @@
+from benchmarks.swap_benchmark import train_brains
+from plugin.tictactoe.brainfile import load_reward_store
+from plugin.tictactoe.service import GameService
+from plugin.tictactoe.registry import BrainRegistry
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import Game
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import argparse
+import asyncio
+import random
+import time
+
+def expected_rewards(reference: Agent, history):
+    """Get the rewards of the agent's moves the old way, through past_moves of a private agent."""
+    reference.brain.past_moves = list(history)
+    moves = reference.get_possible_moves_experimental()
+    reference.brain.past_moves = []
+    return {move["index"]: move["reward"] for move in moves.values()}
+
+async def play_game(service: GameService, reference: Agent, rng: random.Random, checked: list):
+    """Play one game through the service, checking every agent move against the reference agent."""
+    status = service.new_game()
+    game_id = status["gameId"]
+    history = []
+    while not status["gameStatus"]["isGameOver"]:
+        position = rng.choice(status["validMoves"])
+        await asyncio.sleep(0) # Interleave with the other games
+        status = await service.make_move(game_id, position)
+        board_state = history[-1] if history else "_" * 9
+        history.append(board_state[:position] + "X" + board_state[position + 1:])
+        if status["position"] is None:
+            continue
+        expected = expected_rewards(reference, history)
+        rewards = {move["position"]: move["reward"] for move in status["rewards"].values()}
+        best = max(expected.values())
+        if rewards != expected or expected[status["position"]] != best:
+            raise AssertionError(f"Game {game_id} got {rewards} choosing {status['position']}, expected {expected}")
+        board_state = history[-1]
+        history.append(board_state[:status["position"]] + "O" + board_state[status["position"] + 1:])
+        checked.append(1)
+
+async def stress(games: int, concurrency: int, threads: int, brain_file: str, seed: int):
+    """Play games through one shared agent, concurrency of them at a time, and report throughput."""
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads))
+    registry = BrainRegistry(Agent(marker="O"))
+    await registry.load(brain_file)
+    reference = Agent(marker="O", store=load_reward_store(brain_file, "flat"))
+    service = GameService(Game(), registry)
+    rng = random.Random(seed)
+    checked = []
+    remaining = games
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await play_game(service, reference, rng, checked)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{games:,} games, {concurrency:,} at a time over {threads} threads: {len(checked):,} agent moves checked")
+    print(f"{games / elapsed:,.0f} games/s, {len(checked) / elapsed:,.0f} agent moves/s (including the checks)")
+
+def main(games: int, concurrency: int, threads: int, epochs: int, seed: int):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file, binary_file = train_brains(directory, epochs, seed)
+        for brain_file in (json_file, binary_file):
+            print(brain_file.rsplit(".", 1)[-1])
+            asyncio.run(stress(games, concurrency, threads, brain_file, seed))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thousands of interleaved games against one shared agent, checked move by move.")
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1000, help="Games in progress at once")
+    parser.add_argument("--threads", type=int, default=32, help="Executor threads choosing moves")
+    parser.add_argument("--epochs", type=int, default=20000, help="Self play games to train the shared brain with")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.games, args.concurrency, args.threads, args.epochs, args.seed)
@@ -0,0 +1,46 @@
+from benchmarks.symmetry_benchmark import non_loss_rate
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from simple_selfplay import play_training_game
+import argparse
+import random
+
+RULES = {"halving": 0.5, "mean": None, "rate 0.1": 0.1}
+
+def train_until(learning_rate, target: float, chunk: int, max_games: int, evaluation_games: int, seed: int):
+    """
+    Self play in chunks until the non loss rate against random reaches the target.
+
+    :return: The games played, the last non loss rate and the mean reward change over the last chunk.
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    board = BitBoard()
+    agent1 = Agent(marker="X", learning_rate=learning_rate)
+    agent2 = Agent(marker="O", learning_rate=learning_rate)
+    played = 0
+    rate = 0
+    change = None
+    while played < max_games:
+        for _ in range(chunk):
+            play_training_game(board, agent1, agent2)
+        played += chunk
+        changes = (agent1.brain.take_mean_change(), agent2.brain.take_mean_change())
+        change = max((change for change in changes if change is not None), default=None)
+        rate = non_loss_rate(agent1, agent2, evaluation_games, rng)
+        if rate >= target:
+            break
+    return played, rate, change
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Games to a non loss rate against a random player for each reward update rule.")
+    parser.add_argument("--target", type=float, default=0.65, help="Non loss rate against a random player to stop at.")
+    parser.add_argument("--chunk", type=int, default=1000)
+    parser.add_argument("--max-games", type=int, default=100000)
+    parser.add_argument("--evaluation-games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, learning_rate in RULES.items():
+        played, rate, change = train_until(learning_rate, args.target, args.chunk, args.max_games, args.evaluation_games, args.seed)
+        print(f"{name:>8}: {played:>7,} games to {rate:.1%} non loss, mean reward change {change:.5f} over the last chunk")
@@ -0,0 +1,81 @@
+from benchmarks.swap_benchmark import train_brains
+from plugin.tictactoe.agent import get_best_moves
+from plugin.tictactoe.game import BitBoard
+from plugin.app import App
+import tempfile
+import argparse
+import asyncio
+import random
+import time
+import json
+
+def random_histories(count: int, seed: int):
+    """Get the histories of seeded games stopped after a random number of random moves."""
+    rng = random.Random(seed)
+    board = BitBoard()
+    histories = []
+    for _ in range(count):
+        board.reset()
+        moves = rng.randint(0, 8)
+        while len(board.moves) < moves and not board.is_game_over():
+            board.make_move(rng.choice(board.get_valid_moves()))
+        histories.append(board.get_history())
+    return histories
+
+def agent_rates(agent, histories):
+    """Positions per second ranking every history one call at a time, then all at once with rank_moves_many."""
+    start = time.perf_counter()
+    single = []
+    for history in histories:
+        moves = agent.get_possible_moves_for(history)
+        single.append(get_best_moves(moves) if moves else [])
+    single_rate = len(histories) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    batch = agent.rank_moves_many(histories)
+    batch_rate = len(histories) / (time.perf_counter() - start)
+    same = all(sorted(best) == sorted(best_moves) for best, (_, best_moves) in zip(single, batch))
+    return single_rate, batch_rate, same
+
+async def http_rates(app, histories, single_requests: int):
+    """Positions per second over HTTP, one position per request, then one batch as JSON and as a stream."""
+    async with app.test_app():
+        client = app.test_client()
+        start = time.perf_counter()
+        for history in histories[:single_requests]:
+            response = await client.post("/play/evaluate", json={"positions": [history]})
+            await response.get_json()
+        single_rate = single_requests / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await client.post("/play/evaluate", json={"positions": histories})
+        results = (await response.get_json())["results"]
+        batch_rate = len(results) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await client.post("/play/evaluate", json={"positions": histories}, headers={"Accept": "application/x-ndjson"})
+        lines = (await response.get_data(as_text=True)).splitlines()
+        stream_rate = len(lines) / (time.perf_counter() - start)
+        same = [json.loads(line)["bestMoves"] for line in lines] == [result["bestMoves"] for result in results]
+    return single_rate, batch_rate, stream_rate, same
+
+async def benchmark(positions: int, epochs: int, single_requests: int, seed: int):
+    histories = random_histories(positions, seed)
+    server = App(name="Evaluate Benchmark")
+    with tempfile.TemporaryDirectory() as directory:
+        json_file, binary_file = train_brains(directory, epochs, seed)
+        for path in (json_file, binary_file):
+            await server.registry.load(path)
+            agent = server.registry.get()
+            single, batch, same = agent_rates(agent, histories)
+            print(f"{path.split('.')[-1]:<5} agent  {single:>10,.0f} positions/s one at a time, {batch:>10,.0f} batched ({batch / single:.1f}x), same best moves: {same}")
+        single, batch, stream, same = await http_rates(server.app, histories, single_requests)
+    print(f"HTTP         {single:>10,.0f} positions/s one per request, {batch:>10,.0f} batched ({batch / single:.0f}x), {stream:,.0f} streamed, same: {same}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Positions per second of batch move evaluation against one position at a time.")
+    parser.add_argument("--positions", type=int, default=50000)
+    parser.add_argument("--epochs", type=int, default=20000, help="Self play games to train the served brain with")
+    parser.add_argument("--single-requests", type=int, default=2000, help="Positions sent one request at a time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.positions, args.epochs, args.single_requests, args.seed))
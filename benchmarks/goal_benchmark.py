@@ -0,0 +1,90 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.trajectory import game_states
+import argparse
+import random
+import time
+
+def legacy_goal(brain):
+    """The goal set_goal picked before the reward index, by copying and scanning the whole table."""
+    rewards = brain.reward_table.copy()
+    keys = list(rewards.keys())
+    values = list(rewards.values())
+    return keys[values.index(max(values))]
+
+def random_game():
+    """Get the board states, unrewarded moves and outcome reward of a game of random moves."""
+    moves = random.sample(range(9), random.randint(5, 9))
+    return game_states(random.choice("XO"), moves), [None] * len(moves), random.choice([1, -0.33, 0.2])
+
+def brute_top(brain, k, depth):
+    """The k best rewards at a depth by sorting the whole table."""
+    rewards = [
+        reward for key, reward in brain.reward_table.items()
+        if depth is None or (key.count("-") + 1 if key else 0) == depth
+    ]
+    return sorted(rewards, reverse=True)[:k]
+
+def benchmark(games: int, store: str, queries: int, seed: int):
+    random.seed(seed)
+    agent = Agent(marker="X", store=store)
+    for _ in range(games):
+        agent.brain.learn_game(*random_game())
+    print(f"Brain           {len(agent.brain.store):,} histories from {games:,} random games, {store or 'flat'} store")
+
+    start = time.perf_counter()
+    goal = legacy_goal(agent.brain)
+    legacy = time.perf_counter() - start
+    print(f"Legacy goal     {legacy * 1000:.1f}ms per call")
+
+    start = time.perf_counter()
+    agent.set_goal()
+    build = time.perf_counter() - start
+    table = agent.brain.reward_table
+    print(f"Index build     {build * 1000:.1f}ms once, same best reward: {table[agent.goal] == table[goal]}")
+
+    #Learn a game between each goal, the way a goal is set during training. The index only notes changed
+    #histories while learning and indexes them at the next goal, so that cost is counted in the goal
+    lessons = [random_game() for _ in range(queries)]
+    index = agent.brain.index
+    agent.brain.index = None
+    start = time.perf_counter()
+    for lesson in lessons:
+        agent.brain.learn_game(*lesson)
+    learning = (time.perf_counter() - start) / queries
+    agent.brain.index = index
+    start = time.perf_counter()
+    for lesson in lessons:
+        agent.brain.learn_game(*lesson)
+    upkeep = (time.perf_counter() - start) / queries - learning
+    print(f"Learning        {learning * 1e6:.1f}us per game, {upkeep * 1e6:+.1f}us keeping the index up to date")
+
+    start = time.perf_counter()
+    for lesson in lessons:
+        agent.brain.learn_game(*lesson)
+        agent.set_goal()
+    elapsed = (time.perf_counter() - start) / queries - learning - upkeep
+    table = agent.brain.reward_table
+    print(f"Indexed goal    {elapsed * 1e6:.1f}us per call, {legacy / elapsed:,.0f}x faster than the legacy goal")
+    print(f"Still correct   {table[agent.goal] == table[legacy_goal(agent.brain)]}")
+
+    start = time.perf_counter()
+    for depth in range(10):
+        agent.brain.best_histories(10, depth)
+    elapsed = (time.perf_counter() - start) / 10
+    same = all([reward for _, reward in agent.brain.best_histories(10, depth)] == brute_top(agent.brain, 10, depth) for depth in (1, 5, 9))
+    print(f"Top 10 by depth {elapsed * 1e6:.1f}us per depth, matches sorting the table: {same}")
+
+    history = lessons[0][0][:3]
+    start = time.perf_counter()
+    for _ in range(1000):
+        best = agent.brain.best_continuations(history, 3)
+    print(f"Continuations   {(time.perf_counter() - start) * 1000:.1f}us per call, best after {'-'.join(history)}: {best[0] if best else None}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Setting a goal from the reward index against scanning the reward table.")
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.games, args.store, args.queries, args.seed)
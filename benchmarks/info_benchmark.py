@@ -0,0 +1,79 @@
+from plugin.__init__ import CONFIG_ROUTE, IS_LOCAL, PORT
+from plugin.app import App
+from quart import request
+import argparse
+import asyncio
+import quart
+import time
+
+ROUTES = ["/.well-known/ai-plugin.json", "/info/openapi.yaml", "/info/logo.png", "/info/help"]
+
+def uncached_app():
+    """An app serving the info routes the way they were before the document cache, reading files per request."""
+    app = quart.Quart("Uncached Info")
+
+    def get_hostname():
+        if IS_LOCAL:
+            return f"http://localhost:{PORT}"
+        return f"https://{request.headers['Host']}"
+
+    @app.route("/.well-known/ai-plugin.json")
+    async def manifest():
+        hostname = get_hostname()
+        with open(f"{CONFIG_ROUTE}/ai-plugin.json") as file:
+            text = file.read()
+            text = text.replace("OPENAPI_YAML_ROUTE", f"{hostname}/info/openapi.yaml")
+            text = text.replace("LOGO_ROUTE", f"{hostname}/info/logo.png")
+            return quart.Response(text, mimetype="application/json")
+
+    @app.route("/info/logo.png")
+    async def logo():
+        return await quart.send_file(f"{CONFIG_ROUTE}/logo.png")
+
+    @app.route("/info/openapi.yaml")
+    async def openapi():
+        with open(f"{CONFIG_ROUTE}/openapi.yaml") as file:
+            return quart.Response(file.read().replace("PLUGIN_HOSTNAME", get_hostname()), mimetype="text/yaml")
+
+    @app.route("/info/help")
+    async def help():
+        return await quart.send_file(f"{CONFIG_ROUTE}//help.json")
+
+    return app
+
+async def requests_per_second(app, requests: int, concurrency: int, conditional: bool=False):
+    """Request every info route in turn from concurrent clients, returning the requests served per second."""
+    async with app.test_app():
+        client = app.test_client()
+        etags = {}
+        if conditional:
+            for route in ROUTES:
+                etags[route] = (await client.get(route)).headers["ETag"]
+
+        async def worker(count):
+            for i in range(count):
+                route = ROUTES[i % len(ROUTES)]
+                headers = {"If-None-Match": etags[route]} if conditional else None
+                response = await client.get(route, headers=headers)
+                await response.get_data()
+                if response.status_code not in (200, 304):
+                    raise RuntimeError(f"{route} answered {response.status_code}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        return requests // concurrency * concurrency / (time.perf_counter() - start)
+
+async def benchmark(requests: int, concurrency: int):
+    before = await requests_per_second(uncached_app(), requests, concurrency)
+    after = await requests_per_second(App(name="Info Benchmark").app, requests, concurrency)
+    not_modified = await requests_per_second(App(name="Info Benchmark").app, requests, concurrency, conditional=True)
+    print(f"uncached         {before:,.0f} requests/s")
+    print(f"cached           {after:,.0f} requests/s ({after / before:.2f}x)")
+    print(f"cached with 304  {not_modified:,.0f} requests/s ({not_modified / before:.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests per second of the info routes before and after caching.")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.requests, args.concurrency))
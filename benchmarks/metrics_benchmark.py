@@ -0,0 +1,81 @@
+from benchmarks.play_load_test import percentile
+from plugin.metrics import Histogram, timed
+from plugin.app import App
+import argparse
+import asyncio
+import random
+import time
+
+async def play_games(app, games: int, seed: int):
+    """Play seeded games one at a time through the /play routes, returning the latency of every request."""
+    rng = random.Random(seed)
+    client = app.test_client()
+    latencies = []
+    for _ in range(games):
+        start = time.perf_counter()
+        response = await client.post("/play/new")
+        latencies.append(time.perf_counter() - start)
+        status = await response.get_json()
+        while not status["gameStatus"]["isGameOver"]:
+            position = rng.choice(status["validMoves"])
+            start = time.perf_counter()
+            response = await client.post("/play/move", json={"gameId": status["gameId"], "position": position})
+            latencies.append(time.perf_counter() - start)
+            status = await response.get_json()
+    return latencies
+
+def observe_cost(observations: int):
+    """Get the cost of one histogram observation and of one timed call, in seconds."""
+    histogram = Histogram("benchmark_seconds", "Benchmark.")
+    start = time.perf_counter()
+    for _ in range(observations):
+        histogram.observe(0.0003)
+    observe = (time.perf_counter() - start) / observations
+
+    def noop():
+        pass
+    timed_noop = timed(histogram)(noop)
+    start = time.perf_counter()
+    for _ in range(observations):
+        noop()
+    plain = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(observations):
+        timed_noop()
+    return observe, (time.perf_counter() - start - plain) / observations
+
+async def benchmark(games: int, rounds: int, seed: int):
+    apps = {"off": App(name="Metrics Off", metrics=False).app, "on": App(name="Metrics On", metrics=True).app}
+    latencies = {name: [] for name in apps}
+    for app in apps.values():
+        await app.startup()
+    try:
+        #Rounds alternate between the apps so drift in the machine's speed hits both alike.
+        for round in range(rounds):
+            for name, app in apps.items():
+                latencies[name].extend(await play_games(app, games, seed + round))
+        scrape = await apps["on"].test_client().get("/info/metrics")
+        body = await scrape.get_data(as_text=True)
+    finally:
+        for app in apps.values():
+            await app.shutdown()
+
+    for name, values in latencies.items():
+        print(
+            f"metrics {name:<4} {len(values):,} requests  p50 {percentile(values, 0.5) * 1e6:7.1f} us"
+            f"  p99 {percentile(values, 0.99) * 1e6:7.1f} us  mean {sum(values) / len(values) * 1e6:7.1f} us"
+        )
+    off = sum(latencies["off"]) / len(latencies["off"])
+    on = sum(latencies["on"]) / len(latencies["on"])
+    print(f"Overhead {(on - off) / off:+.1%} of mean request latency")
+    observe, timed_call = observe_cost(200000)
+    print(f"Histogram observe {observe * 1e9:.0f} ns, timed call {timed_call * 1e9:.0f} ns")
+    print(f"Scrape: {len(body):,} bytes, {body.count(chr(10)):,} lines")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Request latency of the /play routes with metrics on and off.")
+    parser.add_argument("--games", type=int, default=200, help="Games per app per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.games, args.rounds, args.seed))
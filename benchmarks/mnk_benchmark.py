@@ -0,0 +1,59 @@
+from plugin.tictactoe.game import Board, BitBoard, MNKBoard
+from benchmarks.board_benchmark import time_board
+import argparse
+import random
+
+SIZES = [(3, 3, 3), (4, 4, 4), (5, 5, 4), (7, 7, 5), (9, 9, 5), (15, 15, 5)]
+
+class FullScanBoard(MNKBoard):
+    """An MNKBoard that also scans every line on the board after a move, the way Board does, for comparison."""
+    __slots__ = ("all_lines",)
+
+    def __init__(self, rows: int=3, columns: int=3, k: int=3):
+        super().__init__(rows, columns, k)
+        self.all_lines = sorted({mask for lines in self.lines for mask in lines})
+
+    def make_move(self, position: int):
+        super().make_move(position)
+        side = self.x if self.last_player == "X" else self.o
+        if any(side & mask == mask for mask in self.all_lines):
+            self.winner = self.last_player
+            self.game_over = True
+        else:
+            self.game_over = (self.x | self.o) == self.full
+
+    def check_if_last_move_blocked_win(self):
+        opponent = self.o if self.last_player == "X" else self.x
+        bit = 1 << self.last_move
+        return any(opponent & (mask ^ bit) == mask ^ bit for mask in self.all_lines if mask & bit)
+
+def random_games(size, count: int, seed: int):
+    """Build seeded move sequences on a board size so every board replays the exact same games."""
+    rng = random.Random(seed)
+    board = MNKBoard(*size)
+    games = []
+    for _ in range(count):
+        board.reset()
+        while not board.is_game_over():
+            board.make_move(rng.choice(board.get_valid_moves()))
+        games.append(board.moves)
+    return games
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per move cost of MNKBoard as the board grows, against scanning every line.")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = random_games((3, 3, 3), args.games, args.seed)
+    print(f"3x3 Board     {time_board(Board, games) * 1e6:7.3f} us/move")
+    print(f"3x3 BitBoard  {time_board(BitBoard, games) * 1e6:7.3f} us/move")
+    for size in SIZES:
+        games = random_games(size, args.games, args.seed)
+        incremental = time_board(lambda: MNKBoard(*size), games)
+        full_scan = time_board(lambda: FullScanBoard(*size), games)
+        lines = len({mask for position_lines in MNKBoard(*size).lines for mask in position_lines})
+        print(
+            f"{size[0]}x{size[1]} k={size[2]}  {incremental * 1e6:7.3f} us/move incremental, "
+            f"{full_scan * 1e6:8.3f} us/move scanning all {lines} lines ({full_scan / incremental:.1f}x)"
+        )
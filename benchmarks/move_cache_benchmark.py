@@ -0,0 +1,51 @@
+from benchmarks.play_load_test import percentile
+from benchmarks.swap_benchmark import train_brains
+from plugin.tictactoe.service import GameService
+from plugin.tictactoe.registry import BrainRegistry
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import Game
+import tempfile
+import argparse
+import asyncio
+import random
+import time
+
+async def play_games(service: GameService, games: int, seed: int):
+    """Play seeded games with random player moves one at a time, returning the latency of every move."""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(games):
+        status = service.new_game()
+        while not status["gameStatus"]["isGameOver"]:
+            position = rng.choice(status["validMoves"])
+            start = time.perf_counter()
+            status = await service.make_move(status["gameId"], position)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def summary(name: str, latencies):
+    print(
+        f"{name:<10} p50 {percentile(latencies, 0.5) * 1e6:8.1f} us  p99 {percentile(latencies, 0.99) * 1e6:8.1f} us"
+        f"  mean {sum(latencies) / len(latencies) * 1e6:8.1f} us"
+    )
+
+async def benchmark(games: int, epochs: int, seed: int, cache_size: int):
+    with tempfile.TemporaryDirectory() as directory:
+        registry = BrainRegistry(Agent(marker="O"))
+        await registry.load(train_brains(directory, epochs, seed)[0])
+
+    uncached = GameService(Game(), registry, cache_size=0)
+    summary("no cache", await play_games(uncached, games, seed))
+    service = GameService(Game(), registry, cache_size=cache_size)
+    summary("cold", await play_games(service, games, seed))
+    summary("warm", await play_games(service, games, seed))
+    print(service.move_cache.stats())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move latency of the service without the move cache, and with it cold and warm.")
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--epochs", type=int, default=20000, help="Self play games to train the served brain with")
+    parser.add_argument("--cache-size", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.games, args.epochs, args.seed, args.cache_size))
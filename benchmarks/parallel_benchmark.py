@@ -0,0 +1,20 @@
+from parallel_selfplay import parallel_self_play
+import argparse
+import time
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Games per second of parallel self play for 1 to N workers.")
+    parser.add_argument("--epochs", type=int, default=40000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sync-interval", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        start = time.perf_counter()
+        parallel_self_play(args.epochs, workers, args.sync_interval, args.seed, save=False)
+        rate = args.epochs / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"{workers:>3} workers: {rate:>10,.0f} games/s  {rate / baseline:5.2f}x")
@@ -0,0 +1,44 @@
+from plugin.app import App
+import argparse
+import asyncio
+import random
+import time
+
+async def play_game(client, rng: random.Random, latencies: list):
+    """Play one game through the /play routes with random player moves, recording move latencies."""
+    response = await client.post("/play/new")
+    status = await response.get_json()
+    game_id = status["gameId"]
+    while not status["gameStatus"]["isGameOver"]:
+        position = rng.choice(status["validMoves"])
+        start = time.perf_counter()
+        response = await client.post("/play/move", json={"gameId": game_id, "position": position})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(await response.get_data(as_text=True))
+        status = await response.get_json()
+
+def percentile(values: list, fraction: float):
+    """Get a percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def load_test(games: int, seed: int):
+    """Play every game at once against one app and report move latency."""
+    app = App(name="Load Test").app
+    rng = random.Random(seed)
+    latencies = []
+    async with app.test_app():
+        client = app.test_client()
+        start = time.perf_counter()
+        await asyncio.gather(*(play_game(client, rng, latencies) for _ in range(games)))
+        elapsed = time.perf_counter() - start
+    print(f"{games:,} concurrent games, {len(latencies):,} moves in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f} moves/s)")
+    print(f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move latency of the /play routes with many concurrent games.")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(load_test(args.games, args.seed))
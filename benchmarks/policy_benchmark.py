@@ -0,0 +1,92 @@
+from plugin.tictactoe.agent import Agent, get_best_move
+from plugin.tictactoe.policy import CompiledPolicy
+from plugin.tictactoe.game import BitBoard
+from simple_selfplay import play_training_game, random_weighted_move
+import argparse
+import random
+import time
+
+def train(epochs: int, seed: int, store: str):
+    """Train both agents with seeded self play."""
+    random.seed(seed)
+    board = BitBoard()
+    agents = [Agent(marker="X", store=store), Agent(marker="O", store=store)]
+    for _ in range(epochs):
+        play_training_game(board, *agents)
+    return agents
+
+def play_frozen(agents, choose, games: int, seed: int):
+    """
+    Play games between frozen agents, each move chosen by choose(agent, context, board_state).
+
+    :return: The moves per second and the moves of every game, to check policies play alike.
+    """
+    random.seed(seed)
+    board = BitBoard()
+    board.last_player = None
+    by_marker = {agent.marker: agent for agent in agents}
+    played = []
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        board.reset()
+        contexts = {agent.marker: agent.brain.root_context() for agent in agents}
+        board_state = "_" * 9
+        while not board.is_game_over():
+            marker = "O" if board.last_player == "X" else "X"
+            board.make_move(choose(by_marker[marker], contexts[marker], board_state))
+            board_state = board.get_board_state()
+            for agent in agents:
+                contexts[agent.marker] = agent.brain.extend_context(contexts[agent.marker], board_state, create=False)
+        moves += len(board.moves)
+        played.append(tuple(board.moves))
+    return moves / (time.perf_counter() - start), played
+
+def possible_moves(agent, context, board_state):
+    return agent._get_possible_moves(board_state, lambda board_states: agent.brain.context_rewards(context, board_states))
+
+def benchmark(epochs: int, games: int, seed: int, store: str):
+    agents = train(epochs, seed, store)
+    print(f"Brains          {len(agents[0].brain.store):,} and {len(agents[1].brain.store):,} histories after {epochs:,} self play games")
+    policies = {agent.marker: CompiledPolicy(agent) for agent in agents}
+    start = time.perf_counter()
+    for policy in policies.values():
+        policy.compile()
+    print(f"Compile         {time.perf_counter() - start:.2f}s for {sum(len(policy) for policy in policies.values()):,} histories")
+
+    pickers = {
+        "greedy": (
+            lambda agent, context, board_state: get_best_move(possible_moves(agent, context, board_state)),
+            lambda agent, context, board_state: policies[agent.marker].greedy_move(context, board_state),
+        ),
+        "weighted": (
+            lambda agent, context, board_state: random_weighted_move(possible_moves(agent, context, board_state)),
+            lambda agent, context, board_state: policies[agent.marker].weighted_move(context, board_state),
+        ),
+    }
+    for name, (ranked, compiled) in pickers.items():
+        ranked_rate, ranked_games = play_frozen(agents, ranked, games, seed)
+        compiled_rate, compiled_games = play_frozen(agents, compiled, games, seed)
+        print(
+            f"{name:<9}       {ranked_rate:>9,.0f} moves/s ranking, {compiled_rate:>9,.0f} moves/s compiled "
+            f"({compiled_rate / ranked_rate:.1f}x), same games: {ranked_games == compiled_games}"
+        )
+
+    #Learning drops only the entries whose next rewards changed, which are compiled again on their next move
+    board = BitBoard()
+    for _ in range(games // 10):
+        play_training_game(board, *agents)
+    dropped = sum(policy.dropped for policy in policies.values())
+    compiled = sum(policy.compiled for policy in policies.values())
+    rate, _ = play_frozen(agents, pickers["weighted"][1], games, seed)
+    recompiled = sum(policy.compiled for policy in policies.values()) - compiled
+    print(f"After {games // 10:,} more games  {dropped:,} entries dropped, {recompiled:,} compiled again, weighted {rate:,.0f} moves/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moves per second of compiled greedy and weighted policies against ranking every move.")
+    parser.add_argument("--epochs", type=int, default=20000, help="Self play games to train the brains with")
+    parser.add_argument("--games", type=int, default=20000, help="Frozen games played per policy")
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.epochs, args.games, args.seed, args.store)
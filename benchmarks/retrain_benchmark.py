@@ -0,0 +1,70 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from plugin.tictactoe.trajectory import TrajectoryWriter
+from simple_selfplay import play_training_game
+from retrain import replay, retrain
+import tempfile
+import argparse
+import random
+import time
+import os
+
+def self_play(games: int, seed: int, trajectory_log: str=None):
+    """Play seeded self play games, recording them if given a log, returning both agents and the time taken."""
+    random.seed(seed)
+    board = BitBoard()
+    agents = [Agent(marker="X"), Agent(marker="O")]
+    recorder = TrajectoryWriter(trajectory_log) if trajectory_log else None
+    start = time.perf_counter()
+    for _ in range(games):
+        play_training_game(board, *agents, recorder=recorder)
+    if recorder is not None:
+        recorder.close()
+    return agents, time.perf_counter() - start
+
+def benchmark(games: int, seed: int, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        trajectory_log = os.path.join(directory, "games.log")
+        #Runs alternate and the best of each is kept, since machine noise is larger than the cost of recording
+        plain = recorded = float("inf")
+        for _ in range(repeat):
+            plain = min(plain, self_play(games, seed)[1])
+            if os.path.exists(trajectory_log):
+                os.remove(trajectory_log)
+            played, elapsed = self_play(games, seed, trajectory_log)
+            recorded = min(recorded, elapsed)
+        size = os.path.getsize(trajectory_log)
+        print(f"Self play       {games:,} games in {plain:.2f}s, {recorded:.2f}s recording ({(recorded - plain) / plain:+.1%})")
+        print(f"Trajectory log  {size:,} bytes, {size / games:.1f} bytes per game")
+
+        agents = [Agent(marker="X"), Agent(marker="O")]
+        start = time.perf_counter()
+        replay(trajectory_log, agents, progress=False)
+        elapsed = time.perf_counter() - start
+        same = all(agent.brain.reward_table == original.brain.reward_table for agent, original in zip(agents, played))
+        print(f"Replay          {elapsed:.2f}s, {plain / elapsed:.1f}x faster than self play, bit exact brains: {same}")
+
+        agents = [Agent(marker="X"), Agent(marker="O")]
+        start = time.perf_counter()
+        retrain(trajectory_log, agents, progress=False)
+        elapsed = time.perf_counter() - start
+        difference = max(
+            abs(reward - original.brain.reward_table[key])
+            for agent, original in zip(agents, played) for key, reward in agent.brain.reward_table.items()
+        )
+        print(f"Bulk retrain    {elapsed:.2f}s, {plain / elapsed:.1f}x faster than self play, largest reward difference {difference:.1e}")
+
+        agents = [Agent(marker="X"), Agent(marker="O")]
+        for agent in agents:
+            agent.brain.falloff = 1.5
+        start = time.perf_counter()
+        retrain(trajectory_log, agents, {"win": 1, "loss": -1, "draw": 0, "block": 0.25, "blocked": -0.25}, progress=False)
+        print(f"Bulk retrain, other rewards and falloff 1.5  {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self play against rebuilding its brains from a trajectory log.")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.games, args.seed, args.repeat)
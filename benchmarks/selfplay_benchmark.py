@@ -0,0 +1,193 @@
+from plugin.tictactoe.agent import Agent, Brain
+from plugin.tictactoe.game import Board, BitBoard
+from simple_selfplay import play_training_game
+from functools import wraps
+import simple_selfplay
+import subprocess
+import platform
+import argparse
+import resource
+import cProfile
+import random
+import time
+import json
+import sys
+
+BOARDS = {"bitboard": BitBoard, "board": Board}
+
+
+class FunctionTimer:
+    """Time calls to functions of the training loop by wrapping them in place until restored."""
+
+    def __init__(self):
+        self.totals = {}
+        self._restore = []
+
+    def wrap(self, owner, attribute: str, name: str):
+        """Replace owner.attribute with a timed version reported under name."""
+        function = getattr(owner, attribute)
+        totals = self.totals
+        totals[name] = [0, 0.0]
+        perf_counter = time.perf_counter
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                total = totals[name]
+                total[0] += 1
+                total[1] += perf_counter() - start
+
+        setattr(owner, attribute, timed)
+        self._restore.append((owner, attribute, function))
+        return timed
+
+    def restore(self):
+        """Put back every wrapped function."""
+        for owner, attribute, function in reversed(self._restore):
+            setattr(owner, attribute, function)
+        self._restore.clear()
+
+    def report(self):
+        """Get the calls, total seconds and microseconds per call of every timed function."""
+        return {
+            name: {"calls": calls, "total_s": total, "per_call_us": total / calls * 1e6 if calls else 0.0}
+            for name, (calls, total) in self.totals.items()
+        }
+
+
+def peak_rss_mb():
+    """Get the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    """Get the commit being benchmarked, None outside of a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_selfplay(checkpoints, seed: int, board_name: str, store: str, canonical: bool, timer: FunctionTimer=None):
+    """
+    Play seeded self play games, recording throughput, table growth and peak RSS at every checkpoint.
+
+    :param checkpoints: Increasing epoch counts to record results at.
+    :param timer: A FunctionTimer whose wrapped functions are timed, it adds its own overhead to the throughput.
+    """
+    random.seed(seed)
+    board = BOARDS[board_name]()
+    agent1 = Agent(marker="X", store=store, canonical=canonical)
+    agent2 = Agent(marker="O", store=store, canonical=canonical)
+    move_picker = simple_selfplay.random_weighted_move
+    if timer is not None:
+        move_picker = timer.wrap(simple_selfplay, "random_weighted_move", "random_weighted_move")
+
+    results = []
+    epoch = 0
+    moves = 0
+    elapsed = 0.0
+    for checkpoint in checkpoints:
+        start = time.perf_counter()
+        while epoch < checkpoint:
+            play_training_game(board, agent1, agent2, move_picker)
+            moves += 9 - len(board.get_valid_moves())
+            epoch += 1
+        elapsed += time.perf_counter() - start
+        results.append({
+            "epochs": epoch,
+            "seconds": elapsed,
+            "games_per_sec": epoch / elapsed,
+            "moves_per_sec": moves / elapsed,
+            "table_size": {agent1.marker: len(agent1.brain.store), agent2.marker: len(agent2.brain.store)},
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return results
+
+
+def benchmark(args):
+    """Run the throughput pass, the timed pass and the optional profiled pass over the same seeded games."""
+    checkpoints = sorted(int(epochs) for epochs in args.epochs.split(","))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "board": args.board,
+            "store": args.store or "flat",
+            "canonical": args.canonical,
+        },
+    }
+
+    report["checkpoints"] = run_selfplay(checkpoints, args.seed, args.board, args.store, args.canonical)
+
+    #Wrapping and profiling add overhead to every call, so they get their own passes over the same games
+    timer = FunctionTimer()
+    timer.wrap(Brain, "_set_rewards", "Brain._set_rewards")
+    timer.wrap(Agent, "get_possible_moves_experimental", "Agent.get_possible_moves_experimental")
+    timer.wrap(BOARDS[args.board], "check_for_winner", f"{BOARDS[args.board].__name__}.check_for_winner")
+    try:
+        run_selfplay(checkpoints[-1:], args.seed, args.board, args.store, args.canonical, timer)
+    finally:
+        timer.restore()
+    report["functions"] = timer.report()
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        run_selfplay(checkpoints[-1:], args.seed, args.board, args.store, args.canonical)
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    return report
+
+
+def print_report(report, baseline=None):
+    """Print a report, with the change against a baseline report if given."""
+    def change(current, previous):
+        return f" ({current / previous:.2f}x)" if previous else ""
+
+    baseline_checkpoints = {c["epochs"]: c for c in baseline["checkpoints"]} if baseline else {}
+    baseline_functions = baseline["functions"] if baseline else {}
+    for checkpoint in report["checkpoints"]:
+        previous = baseline_checkpoints.get(checkpoint["epochs"], {})
+        sizes = " ".join(f"{marker}={size:,}" for marker, size in checkpoint["table_size"].items())
+        print(
+            f"{checkpoint['epochs']:>8,} epochs  {checkpoint['games_per_sec']:>9,.0f} games/s"
+            f"{change(checkpoint['games_per_sec'], previous.get('games_per_sec'))}"
+            f"  {checkpoint['moves_per_sec']:>9,.0f} moves/s  table {sizes}  peak RSS {checkpoint['peak_rss_mb']:.1f} MB"
+        )
+    for name, timing in report["functions"].items():
+        previous = baseline_functions.get(name, {})
+        print(
+            f"{name:<40} {timing['calls']:>10,} calls {timing['per_call_us']:>9.2f} us/call"
+            f"{change(timing['per_call_us'], previous.get('per_call_us'))}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seeded self play throughput, per function times, table growth and peak RSS.")
+    parser.add_argument("--epochs", default="1000,5000,20000", help="Comma separated epoch checkpoints")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=sorted(BOARDS), default="bitboard")
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--canonical", action="store_true")
+    parser.add_argument("--output", help="Write the report as JSON to compare between commits")
+    parser.add_argument("--compare", help="A JSON report from an earlier run to compare against")
+    parser.add_argument("--profile", help="Dump cProfile stats of the throughput pass, for snakeviz or flameprof")
+    args = parser.parse_args()
+
+    report = benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
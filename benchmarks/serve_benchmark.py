@@ -0,0 +1,99 @@
+from benchmarks.play_load_test import percentile
+import subprocess
+import tempfile
+import argparse
+import asyncio
+import random
+import signal
+import json
+import time
+import sys
+import os
+
+async def request(reader, writer, method: str, path: str, body=None):
+    """Send one HTTP/1.1 request on a kept alive connection and read the JSON response."""
+    data = b"" if body is None else json.dumps(body).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+    )
+    headers = await reader.readuntil(b"\r\n\r\n")
+    status = int(headers.split(b" ", 2)[1])
+    length = 0
+    for line in headers.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    payload = await reader.readexactly(length)
+    if status != 200:
+        raise RuntimeError(f"{method} {path} answered {status}: {payload[:200]}")
+    return json.loads(payload)
+
+async def client(port: int, seed: int, deadline: float, latencies: list):
+    """Play games with random moves over one connection until the deadline."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await request(reader, writer, "POST", "/play/new")
+            latencies.append(time.perf_counter() - start)
+            while not status["gameStatus"]["isGameOver"]:
+                start = time.perf_counter()
+                status = await request(reader, writer, "POST", "/play/move", {"gameId": status["gameId"], "position": rng.choice(status["validMoves"])})
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def wait_until_up(port: int, timeout: float=30):
+    """Wait for the server to answer its health check."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /info/health HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await reader.readuntil(b"\r\n\r\n")
+            writer.close()
+            return
+        except (OSError, asyncio.IncompleteReadError):
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"The server on port {port} did not come up")
+
+async def measure(name: str, arguments, port: int, connections: int, duration: float, seed: int):
+    """Start run_app.py with arguments, load it from many connections, then stop it with SIGINT."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen([sys.executable, "run_app.py", "--port", str(port)] + arguments, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_up(port)
+        latencies = []
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(client(port, seed + i, deadline, latencies) for i in range(connections)))
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_start = time.perf_counter()
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    print(
+        f"{name:<22} {len(latencies) / elapsed:8,.0f} requests/s  p50 {percentile(latencies, 0.5) * 1000:6.2f} ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:6.2f} ms  stopped in {time.perf_counter() - stop_start:.2f}s"
+    )
+
+async def benchmark(workers: int, connections: int, duration: float, port: int, seed: int):
+    await measure("development server", [], port, connections, duration, seed)
+    await measure("production, 1 worker", ["--production", "--workers", "1"], port + 1, connections, duration, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        session_db = os.path.join(directory, "sessions.db")
+        await measure(f"production, {workers} workers", ["--production", "--workers", str(workers), "--session-db", session_db], port + 2, connections, duration, seed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests per second of the /play routes under the development server and production workers.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per server")
+    parser.add_argument("--port", type=int, default=5100, help="First of three ports the servers listen on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(benchmark(max(args.workers, 2), args.connections, args.duration, args.port, args.seed))
@@ -0,0 +1,85 @@
+from benchmarks.play_load_test import percentile
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from simple_selfplay import play_training_game, save_agent
+from brain_tools import json_to_binary
+from plugin.app import App
+import tempfile
+import argparse
+import asyncio
+import random
+import time
+import os
+
+def train_brains(directory: str, epochs: int, seed: int):
+    """Train an O brain and write it as a JSON and a binary brain file, returning their paths."""
+    random.seed(seed)
+    board = BitBoard()
+    agent1 = Agent(marker="X")
+    agent2 = Agent(marker="O")
+    for _ in range(epochs):
+        play_training_game(board, agent1, agent2)
+    json_file = os.path.join(directory, "brain.json")
+    binary_file = os.path.join(directory, "brain.bin")
+    save_agent(agent2, json_file)
+    json_to_binary(json_file, binary_file)
+    return [json_file, binary_file]
+
+async def play_games(client, rng: random.Random, moves: list, deadline: float):
+    """Keep playing games with random player moves until the deadline, recording each move's start and latency."""
+    while time.perf_counter() < deadline:
+        status = await (await client.post("/play/new")).get_json()
+        while not status["gameStatus"]["isGameOver"]:
+            start = time.perf_counter()
+            response = await client.post("/play/move", json={"gameId": status["gameId"], "position": rng.choice(status["validMoves"])})
+            moves.append((start, time.perf_counter() - start))
+            if response.status_code != 200:
+                raise RuntimeError(await response.get_data(as_text=True))
+            status = await response.get_json()
+
+async def swap_brains(registry, paths, swaps: int, duration: float, windows: list):
+    """Swap brains evenly over the run, recording the time window of each swap."""
+    for i in range(swaps):
+        await asyncio.sleep(duration / (swaps + 1))
+        start = time.perf_counter()
+        await registry.load(paths[i % len(paths)])
+        windows.append((start, time.perf_counter()))
+
+def summary(latencies):
+    return (
+        f"{len(latencies):>6,} moves  p50 {percentile(latencies, 0.5) * 1000:6.2f} ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:6.2f} ms  max {max(latencies) * 1000:6.2f} ms"
+    )
+
+async def benchmark(clients: int, duration: float, swaps: int, epochs: int, seed: int, brain_format: str):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file, binary_file = train_brains(directory, epochs, seed)
+        paths = {"json": [json_file], "binary": [binary_file], "both": [json_file, binary_file]}[brain_format]
+        app = App(name="Swap Benchmark")
+        rng = random.Random(seed)
+        moves = []
+        windows = []
+        async with app.app.test_app():
+            client = app.app.test_client()
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(
+                swap_brains(app.registry, paths, swaps, duration, windows),
+                *(play_games(client, rng, moves, deadline) for _ in range(clients)),
+            )
+    #A move is affected by a swap if it was in flight at any point of the swap
+    during = [latency for start, latency in moves if any(start <= end and start + latency >= begin for begin, end in windows)]
+    outside = [latency for start, latency in moves if not any(start <= end and start + latency >= begin for begin, end in windows)]
+    print(f"{swaps} swaps taking {sum(end - begin for begin, end in windows) / len(windows) * 1000:.1f} ms on average, brain version {app.registry.version}")
+    print(f"during swaps   {summary(during)}")
+    print(f"outside swaps  {summary(outside)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move latency while brains are hot swapped under load.")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--swaps", type=int, default=10)
+    parser.add_argument("--epochs", type=int, default=20000, help="Self play games to train the swapped brains with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["json", "binary", "both"], default="both", help="Brain files to swap between")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.clients, args.duration, args.swaps, args.epochs, args.seed, args.format))
@@ -0,0 +1,67 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from simple_selfplay import play_training_game
+import argparse
+import random
+
+def greedy_move(agent: Agent, context, board: BitBoard, marker: str, rng: random.Random):
+    """Pick the best rewarded move of an agent without teaching it anything."""
+    moves = board.get_valid_moves()
+    board_state = board.get_board_state()
+    next_states = [board_state[:move] + marker + board_state[move + 1:] for move in moves]
+    rewards = agent.brain.context_rewards(context, next_states)
+    best = max(rewards)
+    return rng.choice([move for move, reward in zip(moves, rewards) if reward == best])
+
+def non_loss_rate(agent1: Agent, agent2: Agent, games: int, rng: random.Random):
+    """Play each agent greedily against a random player for half the games and return how often it did not lose."""
+    board = BitBoard()
+    not_lost = 0
+    for game in range(games):
+        agent = agent1 if game % 2 == 0 else agent2
+        marker = "X" if agent is agent1 else "O"
+        board.reset()
+        board.last_player = "O" # X always starts the evaluation games
+        context = agent.brain.root_context()
+        while not board.is_game_over():
+            mover = "O" if board.last_player == "X" else "X"
+            if mover == marker:
+                move = greedy_move(agent, context, board, marker, rng)
+            else:
+                move = rng.choice(board.get_valid_moves())
+            board.make_move(move)
+            context = agent.brain.extend_context(context, board.get_board_state(), create=False)
+        not_lost += board.get_winner() in (None, marker)
+    return not_lost / games
+
+def train_until(canonical: bool, target: float, chunk: int, max_games: int, evaluation_games: int, seed: int):
+    """Self play in chunks until the non loss rate against random reaches the target."""
+    random.seed(seed)
+    rng = random.Random(seed)
+    board = BitBoard()
+    agent1 = Agent(marker="X", canonical=canonical)
+    agent2 = Agent(marker="O", canonical=canonical)
+    played = 0
+    rate = 0
+    while played < max_games:
+        for _ in range(chunk):
+            play_training_game(board, agent1, agent2)
+        played += chunk
+        rate = non_loss_rate(agent1, agent2, evaluation_games, rng)
+        if rate >= target:
+            break
+    return played, rate, len(agent1.brain.store) + len(agent2.brain.store)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table size and games to convergence with and without symmetry canonicalization.")
+    parser.add_argument("--target", type=float, default=0.65, help="Non loss rate against a random player to stop at.")
+    parser.add_argument("--chunk", type=int, default=1000)
+    parser.add_argument("--max-games", type=int, default=100000)
+    parser.add_argument("--evaluation-games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for canonical in (False, True):
+        played, rate, size = train_until(canonical, args.target, args.chunk, args.max_games, args.evaluation_games, args.seed)
+        name = "canonical" if canonical else "raw"
+        print(f"{name:>9}: {played:>7,} games to {rate:.1%} non loss, {size:>8,} table entries")
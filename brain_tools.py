@@ -0,0 +1,31 @@
+from plugin.tictactoe.brainfile import write_brain_file, load_reward_store
+import argparse
+import json
+
+def json_to_binary(json_file: str, binary_file: str):
+    """Convert a flat JSON brain into a binary brain file."""
+    store = load_reward_store(json_file)
+    write_brain_file(binary_file, store.to_flat(), store.to_flat_counts())
+    return len(store)
+
+def binary_to_json(binary_file: str, json_file: str):
+    """Convert a binary brain file into a flat JSON brain."""
+    store = load_reward_store(binary_file)
+    with open(json_file, "w") as f:
+        json.dump(store.to_flat(), indent=4, fp=f)
+    count = len(store)
+    store.close()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert brains between the JSON and binary formats.")
+    parser.add_argument("command", choices=["to-binary", "to-json"])
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        count = json_to_binary(args.source, args.destination)
+    else:
+        count = binary_to_json(args.source, args.destination)
+    print(f"Converted {count} entries from {args.source} to {args.destination}")
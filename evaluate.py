@@ -0,0 +1,235 @@
+from plugin.tictactoe.agent import Agent, Brain
+from plugin.tictactoe.brainfile import is_brain_file, load_reward_store
+from plugin.tictactoe.checkpoint import load_checkpoint
+from plugin.tictactoe.policy import CompiledPolicy
+from plugin.tictactoe.pruning import is_fallback_file, load_fallback
+from plugin.tictactoe.solver import get_solver
+from plugin.tictactoe.game import Board
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import argparse
+import random
+import math
+import os
+
+BASELINES = ("random", "perfect")
+#Players loaded in this process. Loaded in the parent before the pool starts, forked workers inherit
+#them instead of parsing any brain again, and other start methods load them once in the initializer.
+_PLAYERS = {}
+#Compiled greedy policies of the brain players, by player and marker, the brains are frozen while evaluating.
+_POLICIES = {}
+
+
+def load_brain(path: str, canonical: bool=False):
+    """
+    Load a frozen brain from a JSON or binary brain file, or from a checkpoint snapshot and its delta log.
+
+    :param canonical: Whether the brain was trained with canonical keys.
+    """
+    if path.endswith(".snapshot.json"):
+        table, counts, _, fallback, _, _ = load_checkpoint(path, path[:-len(".snapshot.json")] + ".delta.jsonl")
+        brain = Brain(canonical=canonical)
+        brain.set_reward_table(table, counts, canonical_keys=True, fallback=fallback)
+        return brain
+    brain = Brain(load_reward_store(path), canonical)
+    brain.fallback = load_fallback(path)
+    return brain
+
+
+def load_players(specs, canonical: bool=False):
+    """Load every player of a list of specs into this process, a spec is a baseline name or a brain file."""
+    for spec in specs:
+        if spec in _PLAYERS:
+            continue
+        if spec == "random":
+            _PLAYERS[spec] = None
+        elif spec == "perfect":
+            _PLAYERS[spec] = get_solver()
+        else:
+            _PLAYERS[spec] = load_brain(spec, canonical)
+
+
+def choose_move(spec: str, marker: str, board: Board, history, rng: random.Random):
+    """
+    Choose a move for a player without teaching it anything.
+
+    :param spec: The player, a baseline name or a brain file.
+    :param marker: The marker the player is playing.
+    :param board: The board.
+    :param history: The board states of the game so far.
+    """
+    player = _PLAYERS[spec]
+    if spec == "random":
+        return rng.choice(board.get_valid_moves())
+    if spec == "perfect":
+        return rng.choice(player.get_best_moves(board.get_board_state(), marker))
+    policy = _POLICIES.get((spec, marker))
+    if policy is None:
+        agent = Agent(marker=marker)
+        agent.brain = player
+        policy = _POLICIES[(spec, marker)] = CompiledPolicy(agent)
+    #The same draw as get_best_move, which breaks ties with the global random
+    return policy.greedy_move(player.history_context(history), history[-1] if history else player.empty_state)
+
+
+def play_games(first: str, second: str, games: int, seed: str, offset: int=0):
+    """
+    Play games between two players, swapping who plays X and moves first every game.
+
+    :param first: The player whose results are counted.
+    :param second: The opponent.
+    :param games: The number of games to play.
+    :param seed: The seed of the games' random choices.
+    :param offset: The index of the first game, so split matches keep swapping sides.
+    :return: The wins, draws and losses of the first player.
+    """
+    rng = random.Random(seed)
+    random.seed(seed) # Greedy policies break ties with the global random
+    board = Board()
+    results = [0, 0, 0]
+    for game in range(offset, offset + games):
+        players = {"X": first, "O": second} if game % 2 == 0 else {"X": second, "O": first}
+        board.reset()
+        board.last_player = "O" # X always moves first
+        history = []
+        while not board.is_game_over():
+            marker = "O" if board.last_player == "X" else "X"
+            board.make_move(choose_move(players[marker], marker, board, history, rng))
+            history.append(board.get_board_state())
+        winner = board.get_winner()
+        if winner is None:
+            results[1] += 1
+        elif players[winner] == first:
+            results[0] += 1
+        else:
+            results[2] += 1
+    return results
+
+
+def wilson_interval(successes: int, trials: int, z: float=1.96):
+    """Get the Wilson score interval of a rate, 95% by default."""
+    if trials == 0:
+        return 0.0, 1.0
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class Evaluator:
+    """Play matches between players across a process pool."""
+
+    def __init__(self, specs, workers: int=None, canonical: bool=False, chunk: int=250):
+        """
+        Initialize the evaluator, loading every player once before the workers start.
+
+        :param specs: Every player that will play, baseline names or brain files.
+        :param workers: The number of processes, defaults to the number of cores.
+        :param canonical: Whether the brains were trained with canonical keys.
+        :param chunk: The number of games per task.
+        """
+        self.specs = list(specs)
+        self.workers = workers or os.cpu_count()
+        self.chunk = chunk
+        load_players(self.specs, canonical)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=load_players, initargs=(self.specs, canonical))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.pool.shutdown()
+
+    def submit_match(self, first: str, second: str, games: int, seed=0):
+        """Split a match into tasks, returning their futures."""
+        return [
+            self.pool.submit(play_games, first, second, min(self.chunk, games - offset), f"{seed}-{first}-{second}-{offset}", offset)
+            for offset in range(0, games, self.chunk)
+        ]
+
+    def match(self, first: str, second: str, games: int, seed=0):
+        """
+        Play a match between two players.
+
+        :return: The wins, draws and losses of the first player.
+        """
+        return collect(self.submit_match(first, second, games, seed))
+
+    def round_robin(self, games: int, seed=0):
+        """
+        Play a match between every pair of players, all pairs in parallel.
+
+        :return: A dictionary of (first, second) to the first player's wins, draws and losses.
+        """
+        futures = {pair: self.submit_match(*pair, games, seed) for pair in combinations(self.specs, 2)}
+        return {pair: collect(pair_futures) for pair, pair_futures in futures.items()}
+
+
+def collect(futures):
+    """Sum the wins, draws and losses of a match's tasks."""
+    results = [0, 0, 0]
+    for future in futures:
+        for i, count in enumerate(future.result()):
+            results[i] += count
+    return results
+
+
+def format_results(results):
+    """Format wins, draws and losses as rates with 95% confidence intervals."""
+    games = sum(results)
+    parts = []
+    for name, count in zip(("win", "draw", "loss"), results):
+        low, high = wilson_interval(count, games)
+        parts.append(f"{name} {count / games:6.1%} [{low:.1%}, {high:.1%}]")
+    return "  ".join(parts)
+
+
+def standings(pair_results):
+    """Get every player's points, a win is 1 and a draw 0.5, and games played from round robin results."""
+    table = {}
+    for (first, second), (wins, draws, losses) in pair_results.items():
+        for player, points in ((first, wins + draws / 2), (second, losses + draws / 2)):
+            total_points, total_games = table.get(player, (0.0, 0))
+            table[player] = (total_points + points, total_games + wins + draws + losses)
+    return sorted(table.items(), key=lambda item: item[1][0] / item[1][1], reverse=True)
+
+
+def find_brains(directory: str):
+    """Get the JSON and binary brain files and checkpoint snapshots in a directory, without the fallback files beside them."""
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    return [
+        path for path in paths
+        if os.path.isfile(path) and (path.endswith(".json") or is_brain_file(path)) and not is_fallback_file(path)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate brains against each other, a random player and perfect play.")
+    parser.add_argument("--games", type=int, default=2000, help="Games per match")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--canonical", action="store_true", help="The brains were trained with canonical keys")
+    commands = parser.add_subparsers(dest="command", required=True)
+    match_parser = commands.add_parser("match", help="Play one player against others")
+    match_parser.add_argument("player", help="A brain file, random or perfect")
+    match_parser.add_argument("opponents", nargs="*", default=list(BASELINES), help="Defaults to random and perfect")
+    tournament_parser = commands.add_parser("tournament", help="Round robin among the brains in a directory")
+    tournament_parser.add_argument("directory")
+    tournament_parser.add_argument("--baselines", action="store_true", help="Add the random and perfect players")
+    args = parser.parse_args()
+
+    if args.command == "match":
+        with Evaluator([args.player] + args.opponents, args.workers, args.canonical) as evaluator:
+            futures = {opponent: evaluator.submit_match(args.player, opponent, args.games, args.seed) for opponent in args.opponents}
+            for opponent, match_futures in futures.items():
+                print(f"vs {opponent}: {format_results(collect(match_futures))}")
+    else:
+        specs = find_brains(args.directory) + (list(BASELINES) if args.baselines else [])
+        with Evaluator(specs, args.workers, args.canonical) as evaluator:
+            pair_results = evaluator.round_robin(args.games, args.seed)
+        for (first, second), results in pair_results.items():
+            print(f"{first} vs {second}: {format_results(results)}")
+        print("Standings:")
+        for player, (points, games) in standings(pair_results):
+            print(f"  {points / games:6.1%} of points over {games:,} games  {player}")
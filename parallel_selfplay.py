@@ -0,0 +1,114 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.game import BitBoard
+from plugin.tictactoe.rewards import REWARD_STORES
+from simple_selfplay import load_agent, save_agent, play_training_game
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+import argparse
+import random
+import os
+
+def train_worker(tables, games: int, seed: str, store=None):
+    """
+    Play self play games against a private copy of both brains.
+
+    :param tables: The (rewards, counts) flat tables of the X and O brains.
+    :param games: The number of games to play.
+    :param seed: The seed of this worker's random moves.
+    :param store: The name of the reward store to train with.
+    :return: For each brain, the keys it updated as {key: (reward, updates)}.
+    """
+    random.seed(seed)
+    store_class = REWARD_STORES[store or "flat"]
+    agents = [
+        Agent(marker=marker, store=store_class.from_flat(dict(rewards), dict(counts)))
+        for marker, (rewards, counts) in zip("XO", tables)
+    ]
+    board = BitBoard()
+    for _ in range(games):
+        play_training_game(board, agents[0], agents[1])
+
+    changes = []
+    for agent, (_, counts) in zip(agents, tables):
+        rewards = agent.brain.store.to_flat()
+        changes.append({
+            key: (rewards[key], count - counts.get(key, 0))
+            for key, count in agent.brain.store.to_flat_counts().items()
+            if count != counts.get(key, 0)
+        })
+    return changes
+
+def merge_changes(store, changes):
+    """
+    Merge the changes of every worker into a reward store.
+
+    A key takes the mean of the workers' rewards weighted by how many times each worker updated it,
+    the same running average a single brain keeps, and its update count grows by all of them.
+
+    :param store: The reward store to merge into.
+    :param changes: The {key: (reward, updates)} changes of each worker.
+    """
+    totals = {}
+    for worker_changes in changes:
+        for key, (reward, updates) in worker_changes.items():
+            weight, weighted_reward = totals.get(key, (0, 0.0))
+            totals[key] = (weight + updates, weighted_reward + reward * updates)
+    for key, (weight, weighted_reward) in totals.items():
+        cursor = store.cursor(key)
+        store.set(cursor, weighted_reward / weight, store.get_count(cursor) + weight)
+
+def parallel_self_play(epochs: int, workers: int=None, sync_interval: int=1000, seed=0, load_brains: bool=False, store=None, save: bool=True):
+    """
+    Self play across a process pool, merging the workers' brains every sync interval.
+
+    Every round each worker plays up to sync_interval games from the same merged brains with its own
+    seed, so a run is reproducible for a given seed, worker count and sync interval.
+
+    :param epochs: The total number of games to play.
+    :param workers: The number of processes, defaults to the number of cores.
+    :param sync_interval: The number of games each worker plays between merges.
+    :param seed: The base seed, each worker and round derives its own from it.
+    :return: The trained agents.
+    """
+    workers = workers or os.cpu_count()
+    agent1 = Agent(marker="X", store=store)
+    agent2 = Agent(marker="O", store=store)
+    if load_brains:
+        agent1 = load_agent("brain1.json", "X", store)
+        agent2 = load_agent("brain2.json", "O", store)
+
+    remaining = epochs
+    round_index = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(total=epochs) as progress:
+        while remaining > 0:
+            tables = [(agent.brain.store.to_flat(), agent.brain.store.to_flat_counts()) for agent in (agent1, agent2)]
+            round_games = min(remaining, workers * sync_interval)
+            shares = [round_games // workers + (worker < round_games % workers) for worker in range(workers)]
+            futures = [
+                pool.submit(train_worker, tables, games, f"{seed}-{round_index}-{worker}", store)
+                for worker, games in enumerate(shares) if games > 0
+            ]
+            results = [future.result() for future in futures]
+            merge_changes(agent1.brain.store, [result[0] for result in results])
+            merge_changes(agent2.brain.store, [result[1] for result in results])
+            agent1.brain.invalidate()
+            agent2.brain.invalidate()
+            remaining -= round_games
+            round_index += 1
+            progress.update(round_games)
+
+    if save:
+        save_agent(agent1, "brain1.json")
+        save_agent(agent2, "brain2.json")
+    return agent1, agent2
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self play across processes with periodic brain merging.")
+    parser.add_argument("--epochs", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sync-interval", type=int, default=1000, help="Games each worker plays between merges.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--load", action="store_true", help="Continue from brain1.json and brain2.json.")
+    args = parser.parse_args()
+    parallel_self_play(args.epochs, args.workers, args.sync_interval, args.seed, args.load, args.store)
@@ -4,4 +4,19 @@ config = dotenv_values(".env")
 CORS_ON = config["CORS_ON"] == "True"
 CONFIG_ROUTE = config["CONFIG_ROUTE"]
 IS_LOCAL = config["IS_LOCAL"] == "True"
-PORT = config["PORT"]
\ No newline at end of file
+PORT = config["PORT"]
+SESSION_DB = config.get("SESSION_DB") # SQLite file for sessions shared by workers, in memory if unset
+SESSION_TTL = float(config.get("SESSION_TTL", 3600))
+MAX_SESSIONS = int(config.get("MAX_SESSIONS", 100000))
+BRAIN_FILE = config.get("BRAIN_FILE") # Brain the agent serves with, an untrained one if unset
+BRAIN_CANONICAL = config.get("BRAIN_CANONICAL") == "True"
+BRAIN_WATCH = config.get("BRAIN_WATCH") == "True" # Reload BRAIN_FILE whenever it changes
+AGENT_MODE = config.get("AGENT_MODE", "brain") # solver plays only perfect moves, brain plays the brain's best rewards
+SOLVER_FILE = config.get("SOLVER_FILE") # Solver tables written by Solver.save for the solver mode, solved at startup if unset
+ADMIN_TOKEN = config.get("ADMIN_TOKEN") # Bearer token of the /admin routes, which are off if unset
+METRICS = config.get("METRICS", "True") == "True" # Serve /info/metrics and time requests
+METRICS_INSTRUMENT = [name for name in config.get("METRICS_INSTRUMENT", "").split(",") if name] # Agent or Brain methods to time, such as Brain.context_rewards
+SERVE_MODE = config.get("SERVE_MODE", "development") # production serves with Hypercorn and WORKERS processes
+WORKERS = int(config.get("WORKERS", 1))
+BATCH_MAX_POSITIONS = int(config.get("BATCH_MAX_POSITIONS", 100000)) # Most positions in one /play/evaluate request
+BATCH_CHUNK = int(config.get("BATCH_CHUNK", 1024)) # Positions ranked per executor call, and per streamed flush
@@ -1,29 +1,121 @@
+from plugin.__init__ import AGENT_MODE, BRAIN_FILE, BRAIN_CANONICAL, BRAIN_WATCH, METRICS, METRICS_INSTRUMENT, SOLVER_FILE
+from plugin.metrics import ServerMetrics, instrument, uninstrument
+from plugin.routes.admin import admin_blueprint as admin
 from plugin.routes.info import info_blueprint as info
-from plugin.tictactoe.agent import Agent
+from plugin.routes.play import play_blueprint as play
+from plugin.tictactoe.agent import Agent, Brain
 from plugin.tictactoe.game import Game
+from plugin.tictactoe.registry import BrainRegistry
+from plugin.tictactoe.service import GameService
+from plugin.tictactoe.sessions import SessionStore
+from plugin.tictactoe.solver import get_solver
 from quart_cors import cors
+import hypercorn.asyncio
+import hypercorn.config
 import asyncio
 import signal
+import socket
 import quart
+import time
+import gc
+import os
 
 class App():
     """Define the app and all of its routes and components."""
 
-    def __init__(self, name=__name__, host="0.0.0.0", port=5000, cors_on=False):
-        """Initialize the app."""
+    def __init__(self, name=__name__, host="0.0.0.0", port=5000, cors_on=False, sessions: SessionStore=None, metrics: bool=METRICS,
+                 agent_mode: str=AGENT_MODE):
+        """
+        Initialize the app, keeping game sessions in the given store or in memory, and timing requests if metrics are on.
+        The agent plays the brain's best moves, or only perfect moves in the solver agent mode, whose solver is
+        loaded from SOLVER_FILE or solved here, before any workers fork.
+        """
         self.app = quart.Quart(name)
         if cors_on:
             self.app = cors(self.app, allow_origin="*")
         self.app.register_blueprint(info)
+        self.app.register_blueprint(play)
+        self.app.register_blueprint(admin)
         self.host = host
         self.port = port
-        self.agent: Agent = Agent(marker="O")
-        self.Game: Game = Game()
+        self.metrics = ServerMetrics() if metrics else None
+        self._instrumented = [] # The class, method name and timing wrapper of every method this app instrumented
+        solver = get_solver(SOLVER_FILE) if agent_mode == "solver" else None
+        self.agent: Agent = Agent(marker="O", solver=solver)
+        self.registry = BrainRegistry(self.agent, self.metrics)
+        self.Game: Game = Game(sessions)
+        service = GameService(self.Game, self.registry, metrics=self.metrics, mode=agent_mode)
+        self.app.extensions["brain_registry"] = self.registry
+        self.app.extensions["game_service"] = service
+        self.app.extensions["metrics"] = self.metrics
+        if self.metrics is not None:
+            self.metrics.collect_from(self.Game, service, self.registry)
+            self.app.before_request(self._start_timer)
+            self.app.after_request(self._record_request)
+            self._instrument(METRICS_INSTRUMENT)
+        self.app.before_serving(self._load_brain)
+        self.app.after_serving(self._stop_watching)
+        self.app.after_serving(self._uninstrument)
+        self._watch_task = None
+        self._shutdown_event = None
 
-    def _handle_sigint(self, sig, frame):
-        """Help shutdown the app."""
+    async def _start_timer(self):
+        """Note when the request started."""
+        quart.g.request_start = time.perf_counter()
+
+    async def _record_request(self, response):
+        """Count the request and record its latency by route, so game ids in paths do not become labels."""
+        start = quart.g.get("request_start")
+        if start is not None:
+            request = quart.request
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            self.metrics.request_seconds.observe(time.perf_counter() - start, route, request.method)
+            self.metrics.requests.inc(route, request.method, response.status_code)
+        return response
+
+    def _instrument(self, names):
+        """
+        Time Agent and Brain methods named like Brain.context_rewards into the method histogram.
+
+        The classes are patched for the whole process, so the methods are timed into the histogram of the
+        latest App that asked for them, until it stops serving.
+        """
+        owners = {"Agent": Agent, "Brain": Brain}
+        for name in names:
+            owner, _, attribute = name.strip().partition(".")
+            if owner not in owners or not hasattr(owners[owner], attribute):
+                raise ValueError(f"Cannot instrument {name}, expected an Agent or Brain method")
+            instrument(owners[owner], attribute, self.metrics.method_seconds)
+            self._instrumented.append((owners[owner], attribute, getattr(owners[owner], attribute)))
+
+    async def _uninstrument(self):
+        """Put back the methods this app instrumented, unless another app has instrumented them since."""
+        for owner, attribute, wrapper in self._instrumented:
+            if getattr(owner, attribute) is wrapper:
+                uninstrument(owner, attribute)
+        self._instrumented = []
+
+    async def _load_brain(self):
+        """Load the configured brain before serving unless serve already did, then keep watching it if asked to."""
+        if not BRAIN_FILE:
+            return
+        if BRAIN_WATCH:
+            self._watch_task = asyncio.create_task(self.registry.watch(BRAIN_FILE, BRAIN_CANONICAL))
+        elif self.registry.path != BRAIN_FILE:
+            await self.registry.load(BRAIN_FILE, BRAIN_CANONICAL)
+
+    async def _stop_watching(self):
+        """Stop watching the brain file."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+
+    def _handle_sigint(self, sig=None, frame=None):
+        """Help shutdown the app, letting a server started by serve finish its requests first."""
         print("Received SIGINT, shutting down...")
-        asyncio.create_task(self.app.shutdown())
+        if self._shutdown_event is not None:
+            self._shutdown_event.set()
+        else:
+            asyncio.create_task(self.app.shutdown())
 
     def _add_signal_handlers(self, loop):
         """Add signal handlers to the event loop."""
@@ -38,3 +130,79 @@ class App():
         loop = asyncio.get_event_loop()
         self._add_signal_handlers(loop)
         self.app.run(debug=True, host=self.host, port=self.port)
+
+    def serve(self, workers: int=1):
+        """
+        Serve the app in production with Hypercorn and debug off, in one or more worker processes.
+
+        The brain is loaded once here before the workers fork, so they share its memory copy on write, and a
+        binary brain's mapping is shared through the page cache. The workers accept connections from one socket
+        bound here. A game's moves may reach any worker, so several workers need a session store shared
+        between processes. Each worker keeps its own metrics and move cache.
+
+        :param workers: The number of worker processes, platforms without fork serve in this process.
+        """
+        if workers > 1 and not self.Game.boards.shared:
+            raise ValueError("Several workers need a session store shared between processes, set SESSION_DB")
+        if BRAIN_FILE:
+            self.registry.load_now(BRAIN_FILE, BRAIN_CANONICAL)
+        if workers <= 1 or not hasattr(os, "fork"):
+            asyncio.run(self._serve_worker(self._server_config([f"{self.host}:{self.port}"])))
+            return
+
+        listener = socket.create_server((self.host, int(self.port)), backlog=1024)
+        listener.set_inheritable(True)
+        config = self._server_config([f"fd://{listener.fileno()}"])
+        self.Game.boards.close()
+        gc.freeze() #Keep the collector from writing to the brain's objects, which would copy their pages
+        children = {self._fork_worker(config) for _ in range(workers)}
+        stopping = False
+
+        def stop(sig, frame):
+            nonlocal stopping
+            stopping = True
+            for pid in children:
+                os.kill(pid, signal.SIGTERM)
+
+        for signal_name in ("SIGINT", "SIGTERM"):
+            signal.signal(getattr(signal, signal_name), stop)
+        print(f"Serving on {self.host}:{self.port} with {workers} workers")
+        while children:
+            pid, _ = os.wait()
+            children.discard(pid)
+            if not stopping:
+                print(f"Worker {pid} exited, starting another")
+                time.sleep(1)
+                children.add(self._fork_worker(config))
+        listener.close()
+
+    def _fork_worker(self, config: hypercorn.config.Config):
+        """Fork a worker that serves until it is signalled, returning its pid."""
+        pid = os.fork()
+        if pid:
+            return pid
+        code = 0
+        try:
+            for signal_name in ("SIGINT", "SIGTERM"):
+                signal.signal(getattr(signal, signal_name), signal.SIG_DFL)
+            self.Game.boards.reopen()
+            asyncio.run(self._serve_worker(config))
+        except BaseException as e:
+            print(f"Worker {os.getpid()} failed: {e!r}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    async def _serve_worker(self, config: hypercorn.config.Config):
+        """Serve with Hypercorn until a signal asks for a graceful shutdown."""
+        self._shutdown_event = asyncio.Event()
+        self._add_signal_handlers(asyncio.get_running_loop())
+        await hypercorn.asyncio.serve(self.app, config, shutdown_trigger=self._shutdown_event.wait)
+
+    def _server_config(self, bind):
+        """Get the Hypercorn config of a production server."""
+        config = hypercorn.config.Config()
+        config.bind = bind
+        config.accesslog = None
+        config.graceful_timeout = 10
+        return config
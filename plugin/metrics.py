@@ -0,0 +1,211 @@
+from typing import Callable, Dict, Iterable, Tuple
+from contextlib import contextmanager
+from functools import wraps
+from bisect import bisect_left
+import threading
+import time
+
+#Latency buckets in seconds, from tens of microseconds for move selection up to seconds for brain loads.
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str=""):
+    """Format label names and values as {name="value",...}."""
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing count per label values."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float=1):
+        """Add to the count of the given label values."""
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        """Yield the exposition lines of the metric."""
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    """Counts of observations in cumulative buckets, with their sum, per label values."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]=(), buckets: Tuple[float, ...]=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple, list] = {} # Label values to bucket counts, then the sum and count at the end
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        """Record an observation for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.values.get(label_values)
+            if counts is None:
+                counts = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def samples(self):
+        """Yield the exposition lines of the metric, with cumulative bucket counts."""
+        for label_values, counts in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {counts[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {counts[-1]}"
+
+
+class Collected:
+    """A gauge or counter read from a callback when scraped, so it costs nothing between scrapes."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], float], kind: str="gauge"):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        yield f"{self.name} {self.collect()}"
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str]=()):
+        return self.register(Counter(name, help, tuple(labels)))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str]=(), buckets: Tuple[float, ...]=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, tuple(labels), buckets))
+
+    def collected(self, name: str, help: str, collect: Callable[[], float], kind: str="gauge"):
+        return self.register(Collected(name, help, collect, kind))
+
+    def render(self):
+        """Render every metric in the text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timer(histogram: Histogram, *label_values):
+    """Time the block into a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+
+def timed(histogram: Histogram, *label_values):
+    """Decorate a function to time every call into a histogram."""
+    def decorator(function):
+        perf_counter = time.perf_counter
+        observe = histogram.observe
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(perf_counter() - start, *label_values)
+        return wrapper
+    return decorator
+
+
+def instrument(owner, attribute: str, histogram: Histogram):
+    """
+    Time every call of a method or function in place, labelled by its name, for example
+    instrument(Brain, "_set_rewards", metrics.method_seconds).
+
+    Instrumenting something already instrumented replaces the old timing rather than timing it twice, so
+    the calls are only recorded in the latest histogram.
+
+    :return: The original, to put back with setattr or uninstrument.
+    """
+    original = getattr(owner, attribute)
+    original = getattr(original, "__instrumented__", original)
+    wrapper = timed(histogram, attribute)(original)
+    wrapper.__instrumented__ = original
+    setattr(owner, attribute, wrapper)
+    return original
+
+
+def uninstrument(owner, attribute: str):
+    """Stop timing a method or function instrumented by instrument, a no-op if it is not."""
+    original = getattr(getattr(owner, attribute), "__instrumented__", None)
+    if original is not None:
+        setattr(owner, attribute, original)
+
+
+class ServerMetrics:
+    """The metrics of the plugin server."""
+
+    def __init__(self):
+        """Declare the server's metrics."""
+        self.registry = MetricsRegistry()
+        metrics = self.registry
+        self.requests = metrics.counter("tictactoe_requests_total", "Requests served.", ("route", "method", "status"))
+        self.request_seconds = metrics.histogram("tictactoe_request_seconds", "Request latency.", ("route", "method"))
+        self.decision_seconds = metrics.histogram("tictactoe_agent_decision_seconds", "Time the agent took to rank its moves on a move cache miss.")
+        self.brain_load_seconds = metrics.histogram("tictactoe_brain_load_seconds", "Time to load, validate and warm a brain.")
+        self.method_seconds = metrics.histogram("tictactoe_method_seconds", "Time spent in instrumented methods.", ("method",))
+
+    def collect_from(self, game=None, service=None, registry=None):
+        """
+        Read session, cache and brain figures from the server's components whenever the metrics are scraped.
+
+        :param game: The Game, for session counts.
+        :param service: The GameService, for move cache counts.
+        :param registry: The BrainRegistry, for the serving brain's size and version.
+        """
+        metrics = self.registry
+        if game is not None:
+            sessions = game.boards
+            metrics.collected("tictactoe_sessions_live", "Live game sessions.", lambda: len(sessions))
+            metrics.collected("tictactoe_sessions_evicted_total", "Sessions evicted to stay under the cap.", lambda: sessions.evicted, "counter")
+            metrics.collected("tictactoe_sessions_expired_total", "Sessions expired after their TTL.", lambda: sessions.expired, "counter")
+        if service is not None:
+            cache = service.move_cache
+            metrics.collected("tictactoe_move_cache_hits_total", "Move cache hits.", lambda: cache.hits, "counter")
+            metrics.collected("tictactoe_move_cache_misses_total", "Move cache misses.", lambda: cache.misses, "counter")
+            metrics.collected("tictactoe_move_cache_evictions_total", "Move cache evictions.", lambda: cache.evictions, "counter")
+            metrics.collected("tictactoe_move_cache_size", "Histories in the move cache.", lambda: len(cache.entries))
+        if registry is not None:
+            metrics.collected("tictactoe_brain_entries", "Reward entries of the serving brain.", lambda: len(registry.agent.brain.store))
+            metrics.collected("tictactoe_brain_version", "Brains swapped in since start.", lambda: registry.version)
+
+    def render(self):
+        """Render every metric in the text exposition format."""
+        return self.registry.render()
@@ -0,0 +1,43 @@
+from quart import Blueprint, request
+from plugin.__init__ import ADMIN_TOKEN
+from plugin.tictactoe.registry import BrainError
+import hmac
+import quart
+
+
+admin_blueprint = Blueprint("admin", __name__)
+
+
+def is_authorized():
+    """Check the request's bearer token against ADMIN_TOKEN, every request fails without one."""
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {ADMIN_TOKEN}")
+
+
+@admin_blueprint.route("/admin/brain", methods=["GET"])
+async def brain_status():
+    """A function to get the version of the brain the agent is serving with and how its move cache is doing."""
+    if not is_authorized():
+        return {"error": "Unauthorized"}, 401
+    status = quart.current_app.extensions["brain_registry"].status()
+    status["moveCache"] = quart.current_app.extensions["game_service"].move_cache.stats()
+    return status
+
+
+@admin_blueprint.route("/admin/brain", methods=["POST"])
+async def load_brain():
+    """A function to load a brain file and swap it in without dropping live games."""
+    if not is_authorized():
+        return {"error": "Unauthorized"}, 401
+    data = await request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return {"error": "The request body must be a JSON object"}, 400
+    path = data.get("path")
+    if not isinstance(path, str):
+        return {"error": "path must be a brain file"}, 400
+    registry = quart.current_app.extensions["brain_registry"]
+    try:
+        return await registry.load(path, bool(data.get("canonical", False)), bool(data.get("warm", True)))
+    except BrainError as e:
+        return {"error": str(e)}, 422
@@ -0,0 +1,100 @@
+from email.utils import formatdate, parsedate_to_datetime
+from collections import OrderedDict
+from typing import Callable, Tuple
+from quart import Response, request
+import aiofiles.os
+import aiofiles
+import hashlib
+import time
+
+
+class CachedDocument:
+    """A rendered document held in memory with the validators for conditional requests."""
+    __slots__ = ("body", "mimetype", "mtime", "etag", "last_modified", "checked")
+
+    def __init__(self, body: bytes, mimetype: str, mtime: float):
+        self.body = body
+        self.mimetype = mimetype
+        self.mtime = mtime
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = formatdate(int(mtime), usegmt=True)
+        self.checked = time.monotonic()
+
+    def is_not_modified(self):
+        """Check if the current request already has this document, from its If-None-Match or If-Modified-Since."""
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or self.etag in (tag.strip() for tag in if_none_match.split(","))
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(self.mtime)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class DocumentCache:
+    """
+    Serve files rendered once per hostname from memory.
+
+    A cached document is rerendered once its file's mtime changes. The mtime is checked at most every
+    check_interval seconds so polled routes do not stat the file on every request, and files are read
+    and checked without blocking the event loop. The hostname comes from the request's Host header, so
+    the cache keeps only the max_documents most recently used documents rather than one per Host a
+    client sends.
+    """
+
+    def __init__(self, check_interval: float=1.0, max_documents: int=64):
+        """
+        Initialize the cache.
+
+        :param check_interval: Seconds between checks of a file's mtime, 0 to check on every request.
+        :param max_documents: The most documents kept, the least recently used is dropped past it.
+        """
+        self.check_interval = check_interval
+        self.max_documents = max_documents
+        self.documents: "OrderedDict[Tuple[str, str], CachedDocument]" = OrderedDict()
+
+    async def get(self, filename: str, mimetype: str, hostname: str="", render: Callable[[str], str]=None):
+        """
+        Get a document, reading and rendering it if it is not cached or its file changed.
+
+        :param filename: The file to serve.
+        :param mimetype: The mimetype to serve it with.
+        :param hostname: The hostname the document is rendered for, part of the cache key.
+        :param render: A function to render the file's text with, None to serve the raw bytes.
+        """
+        key = (filename, hostname)
+        document = self.documents.get(key)
+        now = time.monotonic()
+        if document is not None:
+            self.documents.move_to_end(key)
+            if now - document.checked < self.check_interval:
+                return document
+        mtime = (await aiofiles.os.stat(filename)).st_mtime
+        if document is not None and document.mtime == mtime:
+            document.checked = now
+            return document
+        async with aiofiles.open(filename, "rb") as file:
+            body = await file.read()
+        if render is not None:
+            body = render(body.decode("utf-8")).encode("utf-8")
+        document = CachedDocument(body, mimetype, mtime)
+        self.documents[key] = document
+        self.documents.move_to_end(key)
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+        return document
+
+    async def respond(self, filename: str, mimetype: str, hostname: str="", render: Callable[[str], str]=None):
+        """Answer the current request with a document, or 304 Not Modified if the client already has it."""
+        document = await self.get(filename, mimetype, hostname, render)
+        headers = {"ETag": document.etag, "Last-Modified": document.last_modified, "Cache-Control": "no-cache"}
+        if document.is_not_modified():
+            return Response(b"", status=304, headers=headers)
+        return Response(document.body, mimetype=document.mimetype, headers=headers)
+
+    def clear(self):
+        """Forget every cached document."""
+        self.documents.clear()
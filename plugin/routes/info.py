@@ -1,5 +1,6 @@
 from quart import Blueprint, request
 from plugin.__init__ import CORS_ON, CONFIG_ROUTE, IS_LOCAL, PORT
+from plugin.routes.cache import DocumentCache
 from quart_cors import cors
 import quart
 
@@ -7,6 +8,15 @@ import quart
 info_blueprint = Blueprint("info", __name__)
 if CORS_ON:
     info_blueprint = cors(info_blueprint, allow_origin="*")
+#The plugin metadata is polled constantly, so it is rendered once per hostname and served from memory.
+document_cache = DocumentCache()
+
+
+def get_hostname():
+    """Get the hostname the plugin is served from for the current request."""
+    if IS_LOCAL:
+        return f"http://localhost:{PORT}"
+    return f"https://{request.headers['Host']}"
 
 
 @info_blueprint.route("/info/health", methods=["GET"])
@@ -18,42 +28,30 @@ async def health():
 @info_blueprint.route("/.well-known/ai-plugin.json", methods=["GET"])
 async def manifest():
     """A function for stores and applications to get the manifest of the plugin."""
-    host = request.headers["Host"]
     filename = f"{CONFIG_ROUTE}/ai-plugin.json"
-    hostname = f"https://{host}"
-
-    if IS_LOCAL:
-        hostname = f"http://localhost:{PORT}"
-    
+    hostname = get_hostname()
     yaml_route = f"{hostname}/info/openapi.yaml"
     logo_route = f"{hostname}/info/logo.png"
-    with open(filename) as file:
-        text = file.read()
+
+    def render(text):
         text = text.replace("OPENAPI_YAML_ROUTE", yaml_route)
-        text = text.replace("LOGO_ROUTE", logo_route)
-        return quart.Response(text, mimetype="application/json")
+        return text.replace("LOGO_ROUTE", logo_route)
+
+    return await document_cache.respond(filename, "application/json", hostname, render)
 
 
 @info_blueprint.route("/info/logo.png", methods=["GET"])
 async def logo():
     """A function to return the logo of the plugin for any store."""
-    return await quart.send_file(f"{CONFIG_ROUTE}/logo.png")
+    return await document_cache.respond(f"{CONFIG_ROUTE}/logo.png", "image/png")
 
 
 @info_blueprint.route("/info/openapi.yaml", methods=["GET"])
 async def openapi():
     """OpenAPI documentation for the plugin consumers."""
-    host = request.headers["Host"]
     filename = f"{CONFIG_ROUTE}/openapi.yaml"
-    hostname = f"https://{host}"
-
-    if IS_LOCAL:
-        hostname = f"http://localhost:{PORT}"
-    
-    with open(filename) as file:
-        text = file.read()
-        text = text.replace("PLUGIN_HOSTNAME", hostname)
-        return quart.Response(text, mimetype="text/yaml")
+    hostname = get_hostname()
+    return await document_cache.respond(filename, "text/yaml", hostname, lambda text: text.replace("PLUGIN_HOSTNAME", hostname))
 
 
 @info_blueprint.route("/info/help", methods=["GET"])
@@ -62,4 +60,13 @@ async def help():
     A function to return the help page for the plugin. You should only add information about
     the functionality that users can use.
     """
-    return await quart.send_file(f"{CONFIG_ROUTE}//help.json")
\ No newline at end of file
+    return await document_cache.respond(f"{CONFIG_ROUTE}/help.json", "application/json")
+
+
+@info_blueprint.route("/info/metrics", methods=["GET"])
+async def metrics():
+    """A function to scrape the plugin's metrics in the Prometheus text format."""
+    server_metrics = quart.current_app.extensions.get("metrics")
+    if server_metrics is None:
+        return "Metrics are off", 404
+    return server_metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -1,7 +1,9 @@
-from quart import Blueprint, request
-from plugin.__init__ import CORS_ON, CONFIG_ROUTE, IS_LOCAL, PORT
+from quart import Blueprint, Response, request
+from plugin.__init__ import BATCH_CHUNK, BATCH_MAX_POSITIONS, CORS_ON, CONFIG_ROUTE, IS_LOCAL, PORT
+from plugin.tictactoe.service import GameError
 from quart_cors import cors
 import quart
+import json
 
 
 play_blueprint = Blueprint("play", __name__)
@@ -12,10 +14,53 @@ if CORS_ON:
 @play_blueprint.route("/play/new", methods=["POST"])
 async def play():
     """A function to play the game."""
-    return "OK"
+    service = quart.current_app.extensions["game_service"]
+    return service.new_game()
 
 
 @play_blueprint.route("/play/move", methods=["POST"])
 async def move():
     """A function to make a move."""
-    return "OK"
\ No newline at end of file
+    service = quart.current_app.extensions["game_service"]
+    data = await request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return {"error": "The request body must be a JSON object"}, 400
+    try:
+        return await service.make_move(data.get("gameId"), data.get("position"))
+    except GameError as e:
+        return {"error": str(e)}, e.status
+
+
+@play_blueprint.route("/play/evaluate", methods=["POST"])
+async def evaluate():
+    """
+    A function to rank the agent's moves after many histories or board states at once. Answers with one
+    JSON document, or streams one JSON line per position when asked for application/x-ndjson or with
+    "stream": true, so large batches start arriving before they are done.
+    """
+    service = quart.current_app.extensions["game_service"]
+    data = await request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return {"error": "The request body must be a JSON object"}, 400
+    try:
+        histories = service.check_positions(data.get("positions"), BATCH_MAX_POSITIONS)
+    except GameError as e:
+        return {"error": str(e)}, e.status
+    results = service.evaluate(histories, BATCH_CHUNK)
+    if not (data.get("stream") or request.accept_mimetypes.best == "application/x-ndjson"):
+        return {"results": [result async for result in results]}
+
+    async def lines():
+        index = 0
+        buffer = []
+        async for result in results:
+            result["index"] = index
+            buffer.append(json.dumps(result))
+            index += 1
+            if len(buffer) >= BATCH_CHUNK:
+                yield ("\n".join(buffer) + "\n").encode()
+                buffer = []
+        if buffer:
+            yield ("\n".join(buffer) + "\n").encode()
+
+    return Response(lines(), mimetype="application/x-ndjson")
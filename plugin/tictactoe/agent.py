@@ -1,16 +1,229 @@
+from plugin.tictactoe.pruning import prune_table, trim_fallback
+from plugin.tictactoe.rewardindex import RewardIndex
+from plugin.tictactoe.rewards import FlatRewardStore, REWARD_STORES
+from plugin.tictactoe.symmetry import ALL_SYMMETRIES, canonical_extend, canonical_state, canonicalize_table
+from functools import lru_cache
+import random
+
+
+def get_best_moves(possible_moves):
+    """Get the indexes of every best move, ranked by reward and then by perfect play value when the agent has a solver."""
+    best_move = []
+    best_rewards = []
+    for move in possible_moves.keys():
+        reward = (possible_moves[move]["reward"], possible_moves[move].get("value", 0))
+        if len(best_move) == 0:
+            best_move.append(move)
+            best_rewards.append(reward)
+            continue
+        if reward > best_rewards[0]:
+            best_move = [move]
+            best_rewards = [reward]
+        elif reward == best_rewards[0]:
+            best_move.append(move)
+            best_rewards.append(reward)
+    return [possible_moves[move]["index"] for move in best_move]
+
+
+@lru_cache(maxsize=65536)
+def next_moves(board_state: str, marker: str):
+    """
+    Get the moves from a board state and the board states they lead to, cached since batches repeat them.
+
+    :return: The positions of the empty cells and the board state after the marker moves to each.
+    """
+    positions = tuple(i for i, cell in enumerate(board_state) if cell == "_")
+    return positions, tuple(board_state[:i] + marker + board_state[i + 1:] for i in positions)
+
+
+def get_best_move(possible_moves):
+    """Get the best move, breaking ties by perfect play values when the agent has a solver, then at random."""
+    return random.choice(get_best_moves(possible_moves))
+
+
 class Brain:
 
-    def __init__(self):
-        self.reward_table = {}
+    def __init__(self, store=None, canonical=False, learning_rate=0.5, cells=9, budget=None):
+        """
+        Initialize the brain.
+
+        :param store: The reward store, a store instance or one of the REWARD_STORES names. Defaults to a flat table.
+        :param canonical: Key histories by their canonical rotation or reflection so symmetric games share rewards.
+        :param learning_rate: How far each reward moves a history's reward towards it. 0.5 is the original
+            halving update, None keeps the mean of every reward the history has seen using its update count.
+        :param cells: The number of positions on the board, 9 unless the brain plays a larger MNKBoard.
+        :param budget: The most histories and fallback board states the brain keeps, it is pruned after a game
+            that goes past it, see prune. None keeps every history.
+        """
+        if canonical and cells != 9:
+            raise ValueError("Only a 3x3 brain can be canonical")
+        if store is None:
+            store = FlatRewardStore()
+        elif isinstance(store, str):
+            if store not in REWARD_STORES:
+                raise ValueError(
+                    f"Unknown reward store {store}, expected one of {', '.join(REWARD_STORES)}. "
+                    "Mapped stores are loaded from a binary brain file with load_reward_store"
+                )
+            store = REWARD_STORES[store]()
+        self.store = store
+        self.canonical = canonical
+        self.empty_state = "_" * cells
         self.past_moves = []
+        self._path = [self.root_context()] # Contexts of every prefix of past_moves, including the empty one
+        self._path_moves = self.past_moves # The past_moves list the path was built for
         self.falloff = 2 # How much to reduce the reward by each move
+        self.learning_rate = learning_rate
+        self.version = 0 # Changes whenever the rewards do, so caches of them know to start over
+        self.total_change = 0.0 # Absolute reward change and update count since take_mean_change
+        self.total_updates = 0
+        self.index = None # The RewardIndex of the best rewards, built by the first query that needs it
+        self.listeners = [] # Told the cursors of every reward change through rewards_changed, None for all
+        self.budget = budget
+        self.min_depth = 3 # Histories of fewer board states are never pruned
+        self.epoch = 0 # Games learned, the clock of last_update
+        self.last_update = None # Cursor to the epoch it was last updated in, only tracked with a budget
+        self.fallback = {} # Board state to the mean reward and weight of the pruned histories ending in it
+        self.pruned = 0
+        if budget is not None:
+            self._track_updates()
+
+    @property
+    def reward_table(self):
+        """A copy of the rewards as a flat table of "-" joined history keys, so writing to it changes nothing."""
+        return self.store.to_flat()
+
+    @reward_table.setter
+    def reward_table(self, table):
+        self.set_reward_table(table)
+
+    def set_reward_table(self, table, counts=None, canonical_keys=False, fallback=None):
+        """
+        Replace the rewards with a flat table, keeping the type of the store.
+
+        :param table: The flat reward table with "-" joined history keys.
+        :param counts: The update counts of the keys, if known.
+        :param canonical_keys: The keys of a canonical brain's table are canonical already, so they are used as is.
+        :param fallback: The fallback rewards of the histories pruned from the table, see prune.
+        """
+        if self.canonical and not canonical_keys:
+            self.store = type(self.store).from_flat(*canonicalize_table(table, counts))
+        else:
+            self.store = type(self.store).from_flat(table, counts)
+        self._path = self._build_path(self.past_moves)
+        self.fallback = dict(fallback) if fallback else {}
+        if self.budget is not None:
+            self._track_updates()
+        self.invalidate()
+
+    def prune(self, target=None):
+        """
+        Drop the least updated and longest unvisited deep histories, then rebuild the store compactly.
+
+        A dropped history's reward is folded into the fallback reward of its last board state, which is read
+        instead of 0 for histories the brain no longer has. See prune_table for which histories go. Fallback
+        board states count against the target alongside the histories, and they take at most a quarter of it,
+        the least weighted going first, so on large boards with many distinct states the fallback can not
+        outgrow the budget.
+
+        :param target: The most histories and fallback board states to keep, 80% of the budget by default so
+            pruning is not needed again for a while.
+        :return: The number of histories dropped.
+        """
+        if target is None:
+            target = int(self.budget * 0.8)
+        store = self.store
+        table = store.to_flat()
+        counts = store.to_flat_counts()
+        last_update = self.last_update or {}
+        epochs = {key: last_update.get(store.cursor(key), 0) for key in table}
+        fallback = self.fallback
+        kept_table = table
+        #Dropping histories can add fallback states, which take room from the histories, so repeat until both fit
+        while len(kept_table) + len(fallback) > target:
+            kept = len(kept_table)
+            kept_table, counts, totals = prune_table(kept_table, counts, epochs, target - len(fallback), self.min_depth)
+            for board_state, (total, weight) in totals.items():
+                mean, old_weight = fallback.get(board_state, (0.0, 0))
+                fallback[board_state] = ((mean * old_weight + total) / (old_weight + weight), old_weight + weight)
+            trim_fallback(fallback, target // 4)
+            if len(kept_table) == kept:
+                break # Only histories too short to prune are left
+        self.store = type(store).from_flat(kept_table, counts)
+        self._path = self._build_path(self.past_moves)
+        if self.last_update is not None:
+            self.last_update = {self.store.cursor(key): epochs[key] for key in kept_table}
+        dropped = len(table) - len(kept_table)
+        self.pruned += dropped
+        self.invalidate()
+        return dropped
+
+    def _track_updates(self):
+        """Start tracking when every history in the store was last updated, as of now."""
+        store = self.store
+        self.last_update = {store.cursor(key): self.epoch for key in store.to_flat()}
+
+    def invalidate(self):
+        """Start caches of the rewards and the reward index over, after the store was changed directly."""
+        self.index = None
+        self.version += 1
+        for listener in self.listeners:
+            listener.rewards_changed(None)
+
+    def root_context(self):
+        """
+        Get the context of an empty history.
+
+        A context is the store cursor of a history and, for canonical brains, the symmetries still tied
+        over it. Contexts never change, so one can be shared by anything reading the brain.
+        """
+        return (self.store.root, ALL_SYMMETRIES if self.canonical else None)
+
+    def extend_context(self, context, board_state, create=True):
+        """
+        Get the context of a history extended by one board state.
+
+        :param context: The context of the history.
+        :param board_state: The next board state.
+        :param create: Create the history in the store if it is missing, rather than only finding it.
+        """
+        cursor, symmetries = context
+        if symmetries is not None:
+            board_state, symmetries = canonical_extend(symmetries, board_state)
+        if create:
+            return (self.store.child(cursor, board_state), symmetries)
+        return (self.store.find(cursor, board_state), symmetries)
+
+    def context_rewards(self, context, board_states):
+        """
+        Get the rewards of a history extended by each of the given board states.
+
+        :param context: The context of the history.
+        :param board_states: The candidate next board states.
+        :return: The list of rewards in the same order, 0 for unseen histories.
+        """
+        cursor, symmetries = context
+        if symmetries is not None:
+            board_states = [canonical_state(symmetries, board_state) for board_state in board_states]
+        if not self.fallback:
+            return self.store.child_rewards(cursor, board_states)
+        #Histories the brain pruned fall back to the reward of their last board state
+        store = self.store
+        fallback = self.fallback
+        rewards = []
+        for board_state in board_states:
+            reward = store.get(store.find(cursor, board_state), None)
+            rewards.append(fallback.get(board_state, (0,))[0] if reward is None else reward)
+        return rewards
 
     def add_move(self, board_state):
         """
         Add a move to the reward table.
 
-        :param board_state: The board state as a stirng of 9 characters.
+        :param board_state: The board state as a string of one marker per position.
         """
+        path = self._current_path()
+        path.append(self.extend_context(path[-1], board_state))
         self.past_moves.append(board_state)
         self._set_rewards(self.past_moves)
 
@@ -31,7 +244,33 @@ class Brain:
         self._set_rewards(self.past_moves, rewards)
         if reset:
             self.past_moves = []
+            self._path = [self.root_context()]
+            self._path_moves = self.past_moves
+            self.epoch += 1
+            if self.budget is not None and len(self.last_update) + len(self.fallback) > self.budget:
+                self.prune()
     
+    def learn_game(self, board_states, move_rewards, reward):
+        """
+        Learn a whole game at once. This is the same as add_move for every board state, followed by
+        caclulate_reward(move_reward, False) for every move reward that is not None, and ending with
+        caclulate_reward(reward).
+
+        :param board_states: The board states of the game in order.
+        :param move_rewards: The reward for each move, None if the move was not rewarded.
+        :param reward: The reward for the outcome of the game.
+        """
+        path = self._current_path()
+        past_moves = self.past_moves
+        for board_state, move_reward in zip(board_states, move_rewards):
+            path.append(self.extend_context(path[-1], board_state))
+            past_moves.append(board_state)
+            self._set_rewards(past_moves)
+            if move_reward is not None:
+                length = len(past_moves)
+                self._set_rewards(past_moves, [move_reward / (self.falloff ** (length - 1 - i)) for i in range(length)])
+        self.caclulate_reward(reward)
+
     def get_current_board_state(self):
         """
         Get the current board state.
@@ -39,45 +278,48 @@ class Brain:
         :return: The current board state.
         """
         if len(self.past_moves) == 0:
-            return "_" * 9
+            return self.empty_state
         return self.past_moves[-1]
 
-    def get_board_state_rewards(self):
+    def get_board_state_rewards_experimental(self):
         """
-        Get the rewards for the current board state based on the past moves.
+        Get the rewards of the past moves extended by one more move, read through the store without copying it.
 
-        :return: The dictionary of rewards for the current board state.
+        :return: A dictionary of every board state one move on from the current one, for either marker, to its
+            reward, 0 for unseen histories.
         """
-        current_level = self.reward_table
-        for key in self.past_moves:
-            if key not in current_level:
-                return {}
-            current_level = current_level[key]
-        return current_level
-    
-    def get_board_state_rewards_experimental(self):
-        """
-        Unlike the nested state reward table, this one is flat.
+        board_state = self.get_current_board_state()
+        board_states = [
+            board_state[:i] + marker + board_state[i + 1:]
+            for i, x in enumerate(board_state) if x == "_" for marker in "XO"
+        ]
+        return dict(zip(board_states, self.get_next_state_rewards(board_states)))
+
+    def get_next_state_rewards(self, board_states):
         """
-        return self.reward_table
-    
-    def _set_nested_rewards(self, keys, rewards=0):
+        Get the rewards of the past moves extended by each of the given board states.
+
+        :param board_states: The candidate next board states.
+        :return: The list of rewards in the same order, 0 for unseen histories.
         """
-        Set a value in a nested dictionary given a list of keys.
+        return self.context_rewards(self._current_path()[-1], board_states)
 
-        :param keys: A list of keys to traverse the nested dictionary.
-        :param value: The value to set at the final key.
+    def current_context(self):
+        """Get the context of the past moves."""
+        return self._current_path()[-1]
+
+    def history_context(self, history):
         """
-        current_level = self.reward_table
-        for k, key in enumerate(keys):  # Go to the second last key
-            if key not in current_level:
-                current_level[key] = {}
-            if rewards != 0:
-                current_level[key]["reward"] = (current_level[key].get("reward", rewards[k]) + rewards[k])/2
-            else:
-                current_level[key]["reward"] = current_level[key].get("reward", 0)
-            current_level = current_level[key]
+        Get the context of a history without creating anything in the store or touching past_moves,
+        so any number of threads can read one brain at once.
 
+        :param history: The board states of a game so far.
+        """
+        context = self.root_context()
+        for board_state in history:
+            context = self.extend_context(context, board_state, create=False)
+        return context
+    
     def _set_rewards(self, keys, rewards=[0]):
         """
         A function to set the rewards of a given board state.
@@ -87,35 +329,110 @@ class Brain:
         """
         if rewards == [0]:
             rewards = rewards*len(keys)
-        key = "-".join(keys)
-        for i in range(len(keys)):
-            key = "-".join(keys[:-i])
-            try:
-                if key not in self.reward_table:
-                    self.reward_table[key] = rewards[i]
-                else:
-                    self.reward_table[key] = (self.reward_table[key] + rewards[i])/2
-            except:
-                print("------------------")
-                print(key)
-                print(self.reward_table)
-                print(rewards)
-                print("------------------")
-                raise Exception("Error")
+        path = self._current_path() if keys is self.past_moves else self._build_path(keys)
+        length = len(keys)
+        #Mirrors "-".join(keys[:-i]), which is the empty history for i = 0
+        cursors = [path[length - i if i else 0][0] for i in range(length)]
+        self.total_change += self.store.update_many(cursors, rewards, self.learning_rate)
+        self.total_updates += length
+        self.version += 1
+        if self.index is not None:
+            self.index.push_many(cursors, [0, *range(length - 1, 0, -1)])
+        for listener in self.listeners:
+            listener.rewards_changed(cursors)
+        if self.last_update is not None:
+            self.last_update.update(dict.fromkeys(cursors, self.epoch))
+
+    def best_histories(self, k=1, depth=None):
+        """
+        Get the histories with the best rewards from the reward index, building it on first use.
+
+        :param k: The number of histories.
+        :param depth: Only histories of this many board states, any depth if None.
+        :return: Up to k ("-" joined history key, reward) pairs, best first.
+        """
+        if self.index is None:
+            self.index = RewardIndex(self.store)
+        return [(self.store.key(cursor), reward) for cursor, reward in self.index.top(k, depth)]
+
+    def best_continuations(self, history, k=1):
+        """
+        Get the best known next board states of a history, looking up only the moves that can follow it.
+
+        :param history: The board states of a game so far.
+        :param k: The number of board states.
+        :return: Up to k (board state, reward) pairs, best first, for the next states the brain has seen.
+        """
+        context = self.history_context(history)
+        last = history[-1] if history else self.empty_state
+        x, o = last.count("X"), last.count("O")
+        markers = ("X", "O") if x == o else ("O",) if x > o else ("X",)
+        continuations = []
+        for position, cell in enumerate(last):
+            if cell != "_":
+                continue
+            for marker in markers:
+                state = last[:position] + marker + last[position + 1:]
+                reward = self.store.get(self.extend_context(context, state, create=False)[0], None)
+                if reward is not None:
+                    continuations.append((state, reward))
+        continuations.sort(key=lambda continuation: continuation[1], reverse=True)
+        return continuations[:k]
+
+    def take_mean_change(self):
+        """
+        Get the mean absolute change of a reward update since the last call and start over,
+        which falls towards 0 as the brain settles.
+
+        :return: The mean absolute change, None if nothing was updated.
+        """
+        mean = self.total_change / self.total_updates if self.total_updates else None
+        self.total_change = 0.0
+        self.total_updates = 0
+        return mean
+
+    def _current_path(self):
+        """Get the contexts of the past moves, rebuilding them if past_moves was replaced."""
+        if self._path_moves is not self.past_moves or len(self._path) != len(self.past_moves) + 1:
+            self._path = self._build_path(self.past_moves)
+            self._path_moves = self.past_moves
+        return self._path
+
+    def _build_path(self, keys):
+        """Get the contexts of every prefix of a list of board states."""
+        path = [self.root_context()]
+        for key in keys:
+            path.append(self.extend_context(path[-1], key))
+        return path
 
 
 class Agent:
 
-    def __init__(self, marker: str, brain_file=None):
-        self.brain = Brain()
+    def __init__(self, marker: str, brain_file=None, store=None, canonical=False, solver=None, learning_rate=0.5, cells=9,
+                 budget=None):
+        """
+        Initialize the agent.
+
+        :param marker: The marker the agent plays.
+        :param store: The reward store of the brain, see Brain.
+        :param canonical: Key the brain by canonical histories, see Brain.
+        :param solver: A Solver for perfect play, its move values are added to the possible moves as a tie breaker.
+        :param learning_rate: The update rule of the brain, see Brain.
+        :param cells: The number of positions on the board, see Brain.
+        :param budget: The most histories and fallback board states the brain keeps, see Brain.
+        """
+        if solver is not None and cells != 9:
+            raise ValueError("The solver only plays 3x3 boards")
+        self.brain = Brain(store, canonical, learning_rate, cells, budget)
         self.marker = marker
         self.goal = ""
+        self.solver = solver
 
     def add_move(self, board_state):
         """
         Add a move to the agent.
 
-        :param board_state: The board state as a string of 9 characters.
+        :param board_state: The board state as a string of one marker per position.
         """
         self.brain.add_move(board_state)
     
@@ -129,29 +446,101 @@ class Agent:
     
     def set_goal(self):
         """
-        From the reward table, set one of the best keys as the goal.
-        
-        :param goal: The goal to set for the agent.
+        From the reward table, set one of the best keys as the goal, using the brain's reward index
+        instead of scanning the table.
         """
-        rewards = self.brain.reward_table.copy()
-        keys = list(rewards.keys())
-        values = list(rewards.values())
-
-        #Get the best reward
-        best_reward = max(values)
-        best_reward_index = values.index(best_reward)
-        best_reward_key = keys[best_reward_index]
-        self.goal = best_reward_key
+        best = self.brain.best_histories(1)
+        if not best:
+            raise ValueError("The brain has no rewards to set a goal from")
+        self.goal = best[0][0]
 
     
     def get_possible_moves(self):
         """
-        Get the possible moves for a given board.
+        Get the possible moves after the past moves, the same as get_possible_moves_experimental now that the
+        reward table is always flat.
+
+        :return: A dictionary of the next board states to their move index and reward.
+        """
+        return self.get_possible_moves_experimental()
+    
+    def get_possible_moves_experimental(self):
+        """
+        Unlike the nested state reward table, this one is flat.
+
+        :return: A dictionary of the next board states to their move index and reward.
+        """
+        return self._get_possible_moves(self.brain.get_current_board_state(), self.brain.get_next_state_rewards)
+
+    def get_possible_moves_for(self, history):
+        """
+        Get the possible moves after a game history, the same as get_possible_moves_experimental with the
+        history as the past moves. The brain is only read, so concurrent games can share one agent.
+
+        :param history: The board states of the game so far.
+        :return: A dictionary of the next board states to their move index and reward.
+        """
+        board_state = history[-1] if history else self.brain.empty_state
+        context = self.brain.history_context(history)
+        return self._get_possible_moves(board_state, lambda board_states: self.brain.context_rewards(context, board_states))
 
-        :param board: The board to get the possible moves for.
-        :return: A list of possible moves.
+    def rank_moves_many(self, histories):
+        """
+        Rank the moves after many game histories in one pass, reading the brain only, so the results match
+        get_possible_moves_for and get_best_moves for each history.
+
+        The histories are walked as one prefix tree, so a prefix shared by several of them is looked up in the
+        brain once and a repeated history is ranked once, sharing its result.
+
+        :param histories: The board states of each game so far.
+        :return: For each history, its moves as (position, reward) pairs best first, ties in position order,
+            and the positions of every best move.
+        """
+        brain = self.brain
+        marker = self.marker
+        solver = self.solver
+        contexts = {(): brain.root_context()}
+        ranked_histories = {}
+        results = []
+        for history in histories:
+            key = tuple(history)
+            result = ranked_histories.get(key)
+            if result is None:
+                context = contexts.get(key)
+                if context is None:
+                    depth = len(key) - 1
+                    while key[:depth] not in contexts:
+                        depth -= 1
+                    context = contexts[key[:depth]]
+                    for i in range(depth, len(key)):
+                        context = brain.extend_context(context, key[i], create=False)
+                        contexts[key[:i + 1]] = context
+                board_state = key[-1] if key else brain.empty_state
+                positions, next_states = next_moves(board_state, marker)
+                rewards = brain.context_rewards(context, next_states)
+                if solver is None:
+                    values = [0] * len(positions)
+                else:
+                    #Perfect play values break ties between equally rewarded moves, as in get_best_moves
+                    try:
+                        move_values = solver.get_move_values(board_state, marker)
+                    except ValueError:
+                        move_values = {}
+                    values = [move_values.get(position, 0) for position in positions]
+                order = sorted(zip([-reward for reward in rewards], [-value for value in values], positions))
+                ranked = [(position, -reward) for reward, _, position in order]
+                best = [position for reward, value, position in order if (reward, value) == order[0][:2]]
+                result = ranked_histories[key] = (ranked, best)
+            results.append(result)
+        return results
+
+    def _get_possible_moves(self, board_state, get_rewards):
+        """
+        Get the possible moves from a board state.
+
+        :param board_state: The current board state.
+        :param get_rewards: A function from the next board states to their rewards.
         """
-        board_state = self.brain.get_current_board_state()
         moves = [i for i, x in enumerate(board_state) if x == "_"] #Moves in board class style.
         #Create board state combinations based on the possible moves
         board_state_combinations = []
@@ -162,49 +551,41 @@ class Agent:
 
         #Dictionary of moves and rewards
         move_dict = {}
-        rewards = self.brain.get_board_state_rewards()
-        for move, combo in zip(moves, board_state_combinations):
+        rewards = get_rewards(board_state_combinations)
+        for move, combo, reward in zip(moves, board_state_combinations, rewards):
             move_dict[combo] = { 
                 "index": move, 
-                "reward": rewards.get(combo, {}).get("reward", 0)
+                "reward": reward
             }
+
+        #Perfect play values to break ties between equally rewarded moves
+        if self.solver is not None:
+            try:
+                move_values = self.solver.get_move_values(board_state, self.marker)
+            except ValueError:
+                move_values = {}
+            for move_info in move_dict.values():
+                move_info["value"] = move_values.get(move_info["index"], 0)
         return move_dict
-    
-    def get_possible_moves_experimental(self):
+
+    def get_perfect_move(self):
         """
-        Unlike the nested state reward table, this one is flat.
+        Get a move from the solver alone, a random one of the perfect moves for the current board state.
+
+        :return: The index of the move.
         """
-        board_state = self.brain.get_current_board_state()
-        temporal_state = "-".join(self.brain.past_moves)
-        moves = [i for i, x in enumerate(board_state) if x == "_"] #Moves in board class style.
-        #Create board state combinations based on the possible moves
-        board_state_combinations = []
-        
-        for move in moves:
-            board_combo = self._set_board_combo(board_state, move, self.marker)
-            board_state_combinations.append(board_combo)
+        return random.choice(self.get_perfect_moves_for(self.brain.past_moves))
 
-        #Dictionary of moves and rewards
-        move_dict = {}
-        rewards = self.brain.get_board_state_rewards_experimental()
-        for move, combo in zip(moves, board_state_combinations):
-            if temporal_state == "":
-                temporal_key = combo
-            else:
-                temporal_key = f"{temporal_state}-{combo}"
-            try:
-                move_dict[temporal_key] = { 
-                    "index": move, 
-                    "reward": rewards.get(temporal_key, 0)
-                }
-            except:
-                print("------------------")
-                print(temporal_key)
-                print(rewards)
-                print("------------------")
-                raise Exception("Error")
+    def get_perfect_moves_for(self, history):
+        """
+        Get every perfect move after a game history from the solver alone. Neither the brain nor past_moves
+        is read, so concurrent games can share one agent.
 
-        return move_dict
+        :param history: The board states of the game so far.
+        :return: The positions of every move that keeps the value of the position for the agent.
+        """
+        board_state = history[-1] if history else self.brain.empty_state
+        return self.solver.get_best_moves(board_state, self.marker)
 
 
     def _set_board_combo(self, board, move, marker):
@@ -0,0 +1,216 @@
+from plugin.tictactoe.game import STATE_STRINGS, STATE_INDEX
+from plugin.tictactoe.rewards import REWARD_STORES
+from typing import Dict, List
+from bisect import bisect_left
+import struct
+import mmap
+import json
+
+#File layout, all little endian except the keys:
+#  header   magic, version, key width in states, entry count
+#  keys     count sorted keys of width big endian uint16 codes, padded with 0 codes
+#  rewards  count float32 rewards, aligned to 4 bytes
+#  counts   count uint32 update counts
+MAGIC = b"TTTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+STATE_CODES = tuple(struct.pack(">H", index + 1) for index in range(len(STATE_STRINGS))) # 0 is padding
+STATE_DECODE = {code: state for code, state in zip(STATE_CODES, STATE_STRINGS)}
+
+
+def encode_key(key: str):
+    """Encode a "-" joined history key as its unpadded binary key."""
+    if key == "":
+        return b""
+    try:
+        return b"".join(STATE_CODES[STATE_INDEX[state]] for state in key.split("-"))
+    except KeyError:
+        raise ValueError(f"Key {key!r} is not a history of 3x3 board states") from None
+
+
+def decode_key(key: bytes):
+    """Decode a padded or unpadded binary key to its "-" joined history key."""
+    return "-".join(STATE_DECODE[key[i:i + 2]] for i in range(0, len(key), 2) if key[i:i + 2] != b"\0\0")
+
+
+def write_brain_file(path: str, table: Dict[str, float], counts: Dict[str, int]=None):
+    """
+    Write a flat reward table as a binary brain file.
+
+    :param path: The file to write.
+    :param table: The flat reward table with "-" joined history keys.
+    :param counts: The update counts of the keys, if known.
+    """
+    counts = counts or {}
+    encoded = sorted((encode_key(key), reward, counts.get(key, 0)) for key, reward in table.items())
+    width = max((len(key) // 2 for key, _, _ in encoded), default=0)
+    key_bytes = width * 2
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, len(encoded)))
+        f.write(b"".join(key.ljust(key_bytes, b"\0") for key, _, _ in encoded))
+        f.write(b"\0" * (-len(encoded) * key_bytes % 4))
+        f.write(struct.pack(f"<{len(encoded)}f", *(reward for _, reward, _ in encoded)))
+        f.write(struct.pack(f"<{len(encoded)}I", *(min(count, 0xFFFFFFFF) for _, _, count in encoded)))
+
+
+def is_brain_file(path: str):
+    """Check if a file is a binary brain file rather than a JSON one."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _KeyView:
+    """A sequence over the padded keys of a mapped brain file, for bisect."""
+
+    def __init__(self, data: mmap.mmap, offset: int, width: int, count: int):
+        self.data = data
+        self.offset = offset
+        self.width = width
+        self.count = count
+
+    def __getitem__(self, index: int):
+        start = self.offset + index * self.width
+        return self.data[start:start + self.width]
+
+    def __len__(self):
+        return self.count
+
+
+class MappedRewardStore:
+    """
+    A read only reward store served straight from a memory mapped binary brain file.
+
+    Lookups binary search the sorted keys in the mapping, so nothing is parsed at load and every
+    process mapping the same file shares its pages. The brain is frozen, so updating it raises, load it
+    into one of the REWARD_STORES to train it.
+
+    A cursor into this store is the unpadded binary key of a history.
+    """
+    root = b""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} brain file")
+        key_bytes = self.width * 2
+        self.keys = _KeyView(self.data, HEADER.size, key_bytes, self.count)
+        rewards_offset = HEADER.size + self.count * key_bytes
+        rewards_offset += -rewards_offset % 4
+        self._view = memoryview(self.data)
+        self.rewards = self._view[rewards_offset:rewards_offset + self.count * 4].cast("f")
+        counts_offset = rewards_offset + self.count * 4
+        self.counts = self._view[counts_offset:counts_offset + self.count * 4].cast("I")
+
+    @classmethod
+    def from_flat(cls, table: Dict[str, float], counts: Dict[str, int]=None):
+        raise TypeError("A mapped brain is read only, use write_brain_file to build one")
+
+    def to_flat(self):
+        """Decode the whole file as a flat reward table."""
+        return {decode_key(self.keys[i]): float(self.rewards[i]) for i in range(self.count)}
+
+    def to_flat_counts(self):
+        """Decode the whole file as a flat table of update counts."""
+        return {decode_key(self.keys[i]): self.counts[i] for i in range(self.count)}
+
+    def close(self):
+        """Release the mapping."""
+        self.rewards.release()
+        self.counts.release()
+        self._view.release()
+        self.data.close()
+
+    def _index(self, cursor: bytes):
+        """Get the entry index of a cursor, None if it is not in the file."""
+        if cursor is None or len(cursor) > self.keys.width:
+            return None
+        key = cursor.ljust(self.keys.width, b"\0")
+        index = bisect_left(self.keys, key)
+        if index < self.count and self.keys[index] == key:
+            return index
+        return None
+
+    def cursor(self, key: str):
+        """Get the cursor of a "-" joined history key."""
+        return encode_key(key)
+
+    def key(self, cursor: bytes):
+        """Get the "-" joined history key of a cursor."""
+        return decode_key(cursor)
+
+    def parent(self, cursor: bytes):
+        """Get the cursor of a history without its last board state."""
+        return cursor[:-2]
+
+    def child(self, cursor: bytes, board_state: str):
+        """Get the cursor of a history extended by one board state."""
+        index = STATE_INDEX.get(board_state)
+        if cursor is None or index is None:
+            return None
+        return cursor + STATE_CODES[index]
+
+    def find(self, cursor: bytes, board_state: str):
+        """Get the cursor of an extended history, the same as child since nothing is ever created."""
+        return self.child(cursor, board_state)
+
+    def get(self, cursor: bytes, default=0):
+        """Get the reward of a history."""
+        index = self._index(cursor)
+        return default if index is None else self.rewards[index]
+
+    def get_count(self, cursor: bytes):
+        """Get how many times a history was updated when the file was written."""
+        index = self._index(cursor)
+        return 0 if index is None else self.counts[index]
+
+    def update(self, cursor: bytes, reward: float, rate: float=0.5):
+        raise TypeError("A mapped brain is read only, load it into a flat or trie store to train it")
+
+    def update_many(self, cursors: List[bytes], rewards: List[float], rate: float=0.5):
+        raise TypeError("A mapped brain is read only, load it into a flat or trie store to train it")
+
+    def set(self, cursor: bytes, reward: float, count: int):
+        raise TypeError("A mapped brain is read only")
+
+    def track_changes(self):
+        """Nothing to track, a mapped brain never changes."""
+
+    def take_changes(self):
+        """Get the changes since the last call, always none."""
+        return {}
+
+    def child_rewards(self, cursor: bytes, board_states: List[str]):
+        """Get the rewards of a history extended by each of the board states."""
+        return [self.get(self.child(cursor, state)) for state in board_states]
+
+    def __len__(self):
+        return self.count
+
+
+def load_reward_store(path: str, store=None):
+    """
+    Load a brain from a JSON or binary brain file.
+
+    Binary files are memory mapped unless another store is asked for, JSON files are parsed into
+    the asked store, a flat one by default.
+
+    :param path: The brain file.
+    :param store: The name of one of the REWARD_STORES to load into, or "mapped" for a binary file.
+    """
+    if store is not None and store != "mapped" and store not in REWARD_STORES:
+        raise ValueError(f"Unknown reward store {store}, expected mapped or one of {', '.join(REWARD_STORES)}")
+    if is_brain_file(path):
+        mapped = MappedRewardStore(path)
+        if store is None or store == "mapped":
+            return mapped
+        converted = REWARD_STORES[store].from_flat(mapped.to_flat(), mapped.to_flat_counts())
+        mapped.close()
+        return converted
+    if store == "mapped":
+        raise ValueError(f"{path} is a JSON brain, only binary brain files can be mapped, see write_brain_file")
+    with open(path, "r") as f:
+        table = json.load(f)
+    return REWARD_STORES[store or "flat"].from_flat(table)
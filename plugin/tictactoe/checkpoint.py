@@ -0,0 +1,220 @@
+from plugin.tictactoe.agent import Brain
+import time
+import json
+import os
+
+#A checkpoint is a full snapshot plus an append only log of the entries changed since it:
+#  <name>.snapshot.json  {"epoch": n, "rewards": {key: reward}, "counts": {key: count},
+#                         "fallback": {board state: [mean reward, weight]},
+#                         "brain_epoch": n, "last_update": {key: brain epoch}}, replaced atomically
+#  <name>.delta.jsonl    one {"epoch": n, "changes": {key: [reward, count]}, "brain_epoch": n,
+#                         "last_update": {key: brain epoch}} line per checkpoint after the snapshot
+#Deltas hold absolute values, so replaying them in order over the snapshot rebuilds the brain, and lines
+#from before the snapshot's epoch are skipped if a crash left them behind. The fallback of a budgeted brain
+#only changes when it prunes, which replaces its store and so always writes a snapshot. brain_epoch is the
+#brain's own game count and last_update the brain epoch each history was last updated in, which a budgeted
+#brain prunes by, empty for a brain without a budget.
+
+
+def _write_atomic(path: str, data: dict):
+    """Write JSON to a temporary file, flush it to disk, then rename it over path."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(json.dumps(data)) # One write, json.dump writes every small chunk separately
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Checkpointer:
+    """
+    Periodically checkpoint a brain during training.
+
+    Every checkpoint appends the entries changed since the last one to the delta log, and every
+    snapshot_every checkpoints a full snapshot replaces the old one and the log starts over, so a
+    checkpoint costs the size of what changed rather than the size of the brain.
+    """
+
+    def __init__(self, brain: Brain, directory: str, name: str, every_epochs: int=None, every_seconds: float=None,
+                 snapshot_every: int=20):
+        """
+        Initialize the checkpointer and start tracking changes to the brain.
+
+        :param brain: The brain to checkpoint, its store must support track_changes.
+        :param directory: The directory of the checkpoint files.
+        :param name: The name of the checkpoint files, one per brain.
+        :param every_epochs: Checkpoint after this many epochs.
+        :param every_seconds: Checkpoint after this many seconds, whichever interval comes first.
+        :param snapshot_every: Write a full snapshot instead of a delta every this many checkpoints.
+        """
+        self.brain = brain
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot.json")
+        self.delta_path = os.path.join(directory, f"{name}.delta.jsonl")
+        self.every_epochs = every_epochs
+        self.every_seconds = every_seconds
+        self.snapshot_every = snapshot_every
+        self.checkpoints = 0
+        self.last_epoch = 0
+        self.last_time = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self.store = brain.store # The store whose changes are tracked
+        brain.store.track_changes()
+
+    def resume(self, epoch: int=None):
+        """
+        Load the brain from the snapshot and delta log, if there is a checkpoint.
+
+        :param epoch: Resume at the checkpoint of this epoch rather than the last one, see resume_together.
+        :return: The epoch of the checkpoint resumed from, 0 without one.
+        """
+        loaded = load_checkpoint(self.snapshot_path, self.delta_path, epoch)
+        reached = loaded[2]
+        if epoch is not None and reached != epoch:
+            raise ValueError(f"{self.snapshot_path} has no checkpoint at epoch {epoch} to resume from, it stops at {reached}")
+        return self._restore(*loaded)
+
+    def _restore(self, table, counts, epoch: int, fallback, brain_epoch: int, last_update):
+        """Set the brain to a loaded checkpoint and start a fresh snapshot of it."""
+        if epoch:
+            brain = self.brain
+            brain.epoch = brain_epoch
+            #The keys are the store's own, canonical already for a canonical brain, so folding them again would
+            #only round the rewards
+            brain.set_reward_table(table, counts, canonical_keys=True, fallback=fallback)
+            if brain.last_update is not None:
+                store = brain.store
+                brain.last_update.update((store.cursor(key), updated) for key, updated in last_update.items())
+            self.store = brain.store
+            brain.store.track_changes()
+            #Start from a fresh snapshot so nothing is appended after a line torn by the crash
+            self.snapshot(epoch)
+        self.last_epoch = epoch
+        return epoch
+
+    def is_due(self, epoch: int):
+        """Check if a checkpoint is due after the given epoch."""
+        if self.every_epochs is not None and epoch - self.last_epoch >= self.every_epochs:
+            return True
+        return self.every_seconds is not None and time.monotonic() - self.last_time >= self.every_seconds
+
+    def maybe_checkpoint(self, epoch: int):
+        """Checkpoint if one is due, returning whether it did."""
+        if not self.is_due(epoch):
+            return False
+        self.checkpoint(epoch)
+        return True
+
+    def checkpoint(self, epoch: int):
+        """
+        Write a checkpoint of the brain after the given epoch.
+
+        :param epoch: How many epochs the brain has been trained for.
+        """
+        brain = self.brain
+        changes = brain.store.take_changes()
+        self.checkpoints += 1
+        replaced = self.brain.store is not self.store
+        if replaced:
+            #The brain replaced its store, when pruning for one, so a delta would miss what was dropped
+            self.store = self.brain.store
+            self.store.track_changes()
+        if replaced or self.checkpoints % self.snapshot_every == 0 or not os.path.exists(self.snapshot_path):
+            self.snapshot(epoch)
+        else:
+            last_update = {}
+            if brain.last_update is not None:
+                store = brain.store
+                last_update = {key: brain.last_update[store.cursor(key)] for key in changes}
+            delta = {"epoch": epoch, "changes": changes, "brain_epoch": brain.epoch, "last_update": last_update}
+            with open(self.delta_path, "a") as f:
+                f.write(json.dumps(delta) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.last_epoch = epoch
+        self.last_time = time.monotonic()
+
+    def snapshot(self, epoch: int):
+        """Atomically replace the snapshot with the whole brain, then start a new delta log."""
+        brain = self.brain
+        store = brain.store
+        last_update = {store.key(cursor): updated for cursor, updated in (brain.last_update or {}).items()}
+        _write_atomic(self.snapshot_path, {
+            "epoch": epoch, "rewards": store.to_flat(), "counts": store.to_flat_counts(), "fallback": brain.fallback,
+            "brain_epoch": brain.epoch, "last_update": last_update,
+        })
+        #The snapshot holds every change, a crash before the log is emptied only leaves lines that resume skips
+        open(self.delta_path, "w").close()
+
+
+def resume_together(checkpointers):
+    """
+    Resume brains trained together, such as the two players of self play, from the same epoch.
+
+    Checkpointers that checkpoint together can still stop at different epochs if a crash lands between
+    their writes. Any brain past the earliest of them is resumed at that epoch from its delta log, so no
+    brain learns the games played again after resuming twice.
+
+    :param checkpointers: The checkpointers of the brains.
+    :return: The epoch every brain was resumed at, 0 without checkpoints.
+    """
+    loaded = [load_checkpoint(checkpointer.snapshot_path, checkpointer.delta_path) for checkpointer in checkpointers]
+    epoch = min((reached for _, _, reached, *_ in loaded), default=0)
+    for checkpointer, checkpoint in zip(checkpointers, loaded):
+        if checkpoint[2] != epoch:
+            checkpoint = load_checkpoint(checkpointer.snapshot_path, checkpointer.delta_path, epoch)
+        reached = checkpoint[2]
+        if reached != epoch:
+            raise ValueError(
+                f"{checkpointer.snapshot_path} has no checkpoint at epoch {epoch}, where the other brains stop, "
+                f"it stops at epoch {reached}"
+            )
+        checkpointer._restore(*checkpoint)
+    return epoch
+
+
+def load_checkpoint(snapshot_path: str, delta_path: str, epoch: int=None):
+    """
+    Rebuild a brain's reward table by replaying a delta log over its snapshot.
+
+    A last log line torn by a crash is ignored.
+
+    :param epoch: Stop replaying at this epoch, at the last checkpoint if None. A snapshot after it can not be
+        rewound, so the epoch returned is then the snapshot's.
+    :return: The reward table, its update counts, the epoch of the last checkpoint, 0 if there is none, the
+        fallback rewards of a budgeted brain, the brain's epoch and the brain epoch each key was last updated in.
+    """
+    target = epoch
+    table = {}
+    counts = {}
+    fallback = {}
+    last_update = {}
+    epoch = 0
+    brain_epoch = None
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "r") as f:
+            snapshot = json.load(f)
+        table = snapshot["rewards"]
+        counts = snapshot["counts"]
+        epoch = snapshot["epoch"]
+        fallback = {board_state: (mean, weight) for board_state, (mean, weight) in snapshot.get("fallback", {}).items()}
+        brain_epoch = snapshot.get("brain_epoch")
+        last_update = snapshot.get("last_update", {})
+    if os.path.exists(delta_path):
+        with open(delta_path, "r") as f:
+            for line in f:
+                try:
+                    delta = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if delta["epoch"] <= epoch:
+                    continue
+                if target is not None and delta["epoch"] > target:
+                    break
+                for key, (reward, count) in delta["changes"].items():
+                    table[key] = reward
+                    counts[key] = count
+                last_update.update(delta.get("last_update", {}))
+                epoch = delta["epoch"]
+                brain_epoch = delta.get("brain_epoch")
+    #Checkpoints written before the brain's epoch was saved count it with the training epoch
+    return table, counts, epoch, fallback, epoch if brain_epoch is None else brain_epoch, last_update
@@ -1,14 +1,38 @@
-from typing import Dict
+from functools import lru_cache
+from itertools import product
+
+WINNING_COMBINATIONS = [
+    [0, 1, 2], [3, 4, 5], [6, 7, 8], # Rows
+    [0, 3, 6], [1, 4, 7], [2, 5, 8], # Columns
+    [0, 4, 8], [2, 4, 6] # Diagonals
+]
+
+#Bitboard tables. A side is a 9 bit integer where bit i is set if the side holds position i.
+FULL_MASK = 0b111111111
+POSITION_BITS = tuple(1 << i for i in range(9))
+WIN_MASKS = tuple(sum(POSITION_BITS[i] for i in combo) for combo in WINNING_COMBINATIONS)
+#Empty positions for every occupancy mask, in board class order.
+VALID_MOVES = tuple(tuple(i for i in range(9) if not occupied & POSITION_BITS[i]) for occupied in range(512))
+#1 if the side holds a full winning line.
+WINNING_SIDES = bytes(any(side & mask == mask for mask in WIN_MASKS) for side in range(512))
+#For each position, 1 if the opponent side holds the rest of a line through that position.
+BLOCKING_SIDES = tuple(
+    bytes(any(side & (mask ^ bit) == mask ^ bit for mask in WIN_MASKS if mask & bit) for side in range(512))
+    for bit in POSITION_BITS
+)
+#Base 3 value of a side, 0 is empty, 1 is X and 2 is O (so O sides are doubled).
+BASE3_VALUES = tuple(sum(3 ** i for i in range(9) if side & POSITION_BITS[i]) for side in range(512))
+#Board state strings indexed by base 3 value, and the reverse lookup.
+STATE_STRINGS = tuple("".join(reversed(cells)) for cells in product("_XO", repeat=9))
+STATE_INDEX = {state: index for index, state in enumerate(STATE_STRINGS)}
+
+
 class Board:
 
     def __init__(self):
         """Initialize the board."""
         self.board = ["_" for _ in range(9)]
-        self.winning_combinations = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8], # Rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8], # Columns
-            [0, 4, 8], [2, 4, 6] # Diagonals
-        ]
+        self.winning_combinations = [combo.copy() for combo in WINNING_COMBINATIONS]
         self.winner = None
         self.game_over = False
         self.last_player = None
@@ -93,11 +117,306 @@ class Board:
         self.game_over = False
 
 
-class Game:
+class BitBoard:
+    """
+    A drop in replacement for Board that stores each side as a 9 bit integer.
+
+    Wins, valid moves, blocked wins and state strings are all table lookups instead of loops over
+    the winning combinations, which makes it the faster choice for self play.
+    """
+    __slots__ = ("x", "o", "winner", "game_over", "last_player", "last_move", "moves")
+    winning_combinations = WINNING_COMBINATIONS
+    cells = 9
 
     def __init__(self):
-        """Initialize the game environment."""
-        self.boards: Dict[str, Board] = {}
+        """Initialize the board."""
+        self.x = 0
+        self.o = 0
+        self.winner = None
+        self.game_over = False
+        self.last_player = None
+        self.last_move = None
+        self.moves = [] # Positions played since the last reset
+
+    @property
+    def board(self):
+        """The board as a list of 9 markers, matching Board.board."""
+        return list(self.get_board_state())
+
+    def print_board(self):
+        """Print the board in a nice format where the index of the move is the position if the position is empty."""
+        board = self.board
+        print("-------------")
+        for i in range(3):
+            a = i * 3 if board[i * 3] == "_" else board[i * 3]
+            b = i * 3 + 1 if board[i * 3 + 1] == "_" else board[i * 3 + 1]
+            c = i * 3 + 2 if board[i * 3 + 2] == "_" else board[i * 3 + 2]
+            print("|", a, "|", b, "|", c, "|")
+            print("-------------")
+
+    def make_move(self, position: int):
+        """
+        Make a move on the board.
+
+        :param position: The position to make the move.
+        """
+        self.last_move = position
+        player = "O" if self.last_player == "X" else "X"
+        if not 0 <= position < 9:
+            raise Exception("Invalid move")
+        bit = POSITION_BITS[position]
+        if (self.x | self.o) & bit:
+            raise Exception("Invalid move")
+        if player == "X":
+            self.x |= bit
+        else:
+            self.o |= bit
+        self.last_player = player
+        self.moves.append(position)
+        self.check_for_winner()
+
+    def check_for_winner(self):
+        """Check if there is a winner."""
+        if WINNING_SIDES[self.x]:
+            self.winner = "X"
+            self.game_over = True
+        elif WINNING_SIDES[self.o]:
+            self.winner = "O"
+            self.game_over = True
+        else:
+            self.game_over = self.x | self.o == FULL_MASK
+
+    def check_if_last_move_blocked_win(self):
+        """Check if the last move blocked a win."""
+        opponent = self.o if self.last_player == "X" else self.x
+        return BLOCKING_SIDES[self.last_move][opponent] == 1
+
+    def get_valid_moves(self):
+        """Get the valid moves."""
+        return list(VALID_MOVES[self.x | self.o])
+
+    def get_state_index(self):
+        """Get the board state as a base 3 integer."""
+        return BASE3_VALUES[self.x] + 2 * BASE3_VALUES[self.o]
+
+    def get_board_state(self):
+        """Get the board state."""
+        return STATE_STRINGS[BASE3_VALUES[self.x] + 2 * BASE3_VALUES[self.o]]
+
+    def get_history(self):
+        """Get the board states after each move since the last reset, as an agent's past moves."""
+        #Markers alternate, so they can be worked back from the last player
+        marker = self.last_player
+        markers = []
+        for _ in self.moves:
+            markers.append(marker)
+            marker = "O" if marker == "X" else "X"
+        x = o = 0
+        history = []
+        for position, marker in zip(self.moves, reversed(markers)):
+            if marker == "X":
+                x |= POSITION_BITS[position]
+            else:
+                o |= POSITION_BITS[position]
+            history.append(STATE_STRINGS[BASE3_VALUES[x] + 2 * BASE3_VALUES[o]])
+        return history
+
+    def get_winner(self):
+        """Get the winner."""
+        return self.winner
+
+    def is_game_over(self):
+        """Check if the game is over."""
+        return self.game_over
+
+    def reset(self):
+        """Reset the board."""
+        self.x = 0
+        self.o = 0
+        self.winner = None
+        self.game_over = False
+        self.moves = []
+
+
+@lru_cache(maxsize=None)
+def mnk_lines(rows: int, columns: int, k: int):
+    """
+    Get the win lines of an m,n,k board through each position, as bitmasks.
+
+    :param rows: The number of rows.
+    :param columns: The number of columns.
+    :param k: The number in a row that wins.
+    :return: For each position, the masks of every k long line through it.
+    """
+    if not 0 < k <= max(rows, columns):
+        raise ValueError(f"No {k} in a row fits on a {rows}x{columns} board")
+    lines = [[] for _ in range(rows * columns)]
+    for row in range(rows):
+        for column in range(columns):
+            for row_step, column_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + row_step * (k - 1)
+                end_column = column + column_step * (k - 1)
+                if end_row >= rows or not 0 <= end_column < columns:
+                    continue
+                positions = [(row + row_step * i) * columns + column + column_step * i for i in range(k)]
+                mask = sum(1 << position for position in positions)
+                for position in positions:
+                    lines[position].append(mask)
+    return tuple(tuple(position_lines) for position_lines in lines)
+
+
+class MNKBoard:
+    """
+    A board of any number of rows and columns, won by k in a row, with the interface of BitBoard.
+
+    Each side is a bitset of rows * columns bits and the board state string is kept up to date move
+    by move. Only the lines through the last move can be completed or blocked by it, so wins and
+    blocked wins are checked against those lines alone rather than every line on the board.
+    MNKBoard(3, 3, 3) plays exactly like BitBoard.
+    """
+    __slots__ = ("rows", "columns", "k", "cells", "lines", "full", "x", "o", "state", "winner", "game_over",
+                 "last_player", "last_move", "moves")
+
+    def __init__(self, rows: int=3, columns: int=3, k: int=3):
+        """
+        Initialize the board.
+
+        :param rows: The number of rows.
+        :param columns: The number of columns.
+        :param k: The number in a row that wins.
+        """
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.cells = rows * columns
+        self.lines = mnk_lines(rows, columns, k)
+        self.full = (1 << self.cells) - 1
+        self.last_player = None
+        self.last_move = None
+        self.reset()
+
+    @property
+    def board(self):
+        """The board as a list of markers, matching Board.board."""
+        return list(self.get_board_state())
+
+    def print_board(self):
+        """Print the board in a nice format where the index of the move is the position if the position is empty."""
+        board = self.board
+        width = len(str(self.cells - 1))
+        rule = "-" * ((width + 3) * self.columns + 1)
+        print(rule)
+        for row in range(self.rows):
+            cells = [board[i] if board[i] != "_" else str(i) for i in range(row * self.columns, (row + 1) * self.columns)]
+            print("| " + " | ".join(cell.rjust(width) for cell in cells) + " |")
+            print(rule)
+
+    def make_move(self, position: int):
+        """
+        Make a move on the board.
+
+        :param position: The position to make the move.
+        """
+        self.last_move = position
+        player = "O" if self.last_player == "X" else "X"
+        if not 0 <= position < self.cells:
+            raise Exception("Invalid move")
+        bit = 1 << position
+        if (self.x | self.o) & bit:
+            raise Exception("Invalid move")
+        if player == "X":
+            self.x |= bit
+            side = self.x
+            self.state[position] = 88 # X
+        else:
+            self.o |= bit
+            side = self.o
+            self.state[position] = 79 # O
+        self.last_player = player
+        self.moves.append(position)
+        for mask in self.lines[position]:
+            if side & mask == mask:
+                self.winner = player
+                self.game_over = True
+                return
+        self.game_over = len(self.moves) == self.cells
+
+    def check_for_winner(self):
+        """Check if there is a winner, looking only at the lines through the last move."""
+        if not self.moves:
+            return
+        side = self.x if self.last_player == "X" else self.o
+        if any(side & mask == mask for mask in self.lines[self.last_move]):
+            self.winner = self.last_player
+            self.game_over = True
+        else:
+            self.game_over = (self.x | self.o) == self.full
+
+    def check_if_last_move_blocked_win(self):
+        """Check if the last move blocked a win."""
+        opponent = self.o if self.last_player == "X" else self.x
+        bit = 1 << self.last_move
+        for mask in self.lines[self.last_move]:
+            rest = mask ^ bit
+            if opponent & rest == rest:
+                return True
+        return False
+
+    def get_valid_moves(self):
+        """Get the valid moves."""
+        free = self.full & ~(self.x | self.o)
+        moves = []
+        while free:
+            bit = free & -free
+            moves.append(bit.bit_length() - 1)
+            free ^= bit
+        return moves
+
+    def get_board_state(self):
+        """Get the board state, a string with one marker for each position, row by row."""
+        return self.state.decode()
+
+    def get_history(self):
+        """Get the board states after each move since the last reset, as an agent's past moves."""
+        marker = "X" if len(self.moves) % 2 == (self.last_player == "X") else "O"
+        state = bytearray(b"_" * self.cells)
+        history = []
+        for position in self.moves:
+            state[position] = ord(marker)
+            history.append(state.decode())
+            marker = "O" if marker == "X" else "X"
+        return history
+
+    def get_winner(self):
+        """Get the winner."""
+        return self.winner
+
+    def is_game_over(self):
+        """Check if the game is over."""
+        return self.game_over
+
+    def reset(self):
+        """Reset the board."""
+        self.x = 0
+        self.o = 0
+        self.state = bytearray(b"_" * self.cells)
+        self.winner = None
+        self.game_over = False
+        self.moves = []
+
+
+class Game:
+
+    def __init__(self, sessions=None):
+        """
+        Initialize the game environment.
+
+        :param sessions: The SessionStore that keeps the boards of live games, an in memory one by default.
+        """
+        if sessions is None:
+            from plugin.tictactoe.sessions import MemorySessionStore
+            sessions = MemorySessionStore()
+        self.boards = sessions
         
     def new_game(self, game_id: str):
         """
@@ -105,7 +424,7 @@ class Game:
 
         :param game_id: The id of the game.
         """
-        self.boards[game_id] = Board()
+        self.boards[game_id] = BitBoard()
     
     def make_move(self, game_id: str, position: int):
         """
@@ -115,11 +434,13 @@ class Game:
         :param position: The position to make the move.
         :param player: The player making the move.
         """
-        self.boards[game_id].make_move(position)
-        if self.boards[game_id].is_game_over():
-            winner = self.boards[game_id].winner
+        board = self.boards[game_id]
+        board.make_move(position)
+        if board.is_game_over():
+            winner = board.winner
             self.boards.pop(game_id)
             return winner
+        self.boards[game_id] = board
         return -1
     
     def get_visual_board(self, game_id: str):
@@ -128,10 +449,20 @@ class Game:
 
         :param game_id: The id of the game.
         """
-        board = ""
+        return self.render_board(self.boards[game_id])
+
+    @staticmethod
+    def render_board(board):
+        """
+        Get the visual board of a board, which can be one no longer in the game.
+
+        :param board: The board to render.
+        """
+        cells = board.board
+        visual = ""
         for i in range(3):
-            a = i * 3 if self.boards[game_id].board[i * 3] == "_" else self.boards[game_id].board[i * 3]
-            b = i * 3 + 1 if self.boards[game_id].board[i * 3 + 1] == "_" else self.boards[game_id].board[i * 3 + 1]
-            c = i * 3 + 2 if self.boards[game_id].board[i * 3 + 2] == "_" else self.boards[game_id].board[i * 3 + 2]
-            board += f"| {a} | {b} | {c} |\n"
-        return board
\ No newline at end of file
+            a = i * 3 if cells[i * 3] == "_" else cells[i * 3]
+            b = i * 3 + 1 if cells[i * 3 + 1] == "_" else cells[i * 3 + 1]
+            c = i * 3 + 2 if cells[i * 3 + 2] == "_" else cells[i * 3 + 2]
+            visual += f"| {a} | {b} | {c} |\n"
+        return visual
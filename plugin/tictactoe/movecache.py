@@ -0,0 +1,83 @@
+from plugin.tictactoe.agent import Agent
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+
+class MoveCache:
+    """
+    A bounded least recently used cache of the agent's ranked moves for each game history.
+
+    Entries belong to one agent and one version of its brain. Asking with another agent, after a brain
+    swap, or after the brain's rewards changed empties the cache first. The cache is not thread safe,
+    the service only uses it from the event loop.
+    """
+
+    def __init__(self, maxsize: int=100000):
+        """
+        Initialize the cache.
+
+        :param maxsize: The most histories kept.
+        """
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Tuple[str, ...], Tuple[Dict, List[int]]]" = OrderedDict()
+        self.agent = None
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check(self, agent: Agent):
+        """Start over if the agent or its brain changed since the entries were cached."""
+        if agent is not self.agent or agent.brain.version != self.version:
+            if self.entries:
+                self.entries.clear()
+                self.invalidations += 1
+            self.agent = agent
+            self.version = agent.brain.version
+
+    def get(self, agent: Agent, history: List[str]):
+        """
+        Get the cached moves of a history.
+
+        :return: The move rewards and the indexes of the best moves, None if they are not cached.
+        """
+        self._check(agent)
+        key = tuple(history)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, agent: Agent, version: int, history: List[str], rewards: Dict, best_moves: List[int]):
+        """
+        Cache the move rewards and best moves of a history, evicting the least recently used history if full.
+
+        :param version: The version of the agent's brain the moves were ranked with, they are dropped if it changed since.
+        """
+        self._check(agent)
+        if self.maxsize <= 0 or version != self.version:
+            return
+        self.entries[tuple(history)] = (rewards, best_moves)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Empty the cache."""
+        self.entries.clear()
+        self.agent = None
+        self.version = None
+
+    def stats(self):
+        """Get the size, hits, misses, evictions and invalidations of the cache."""
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
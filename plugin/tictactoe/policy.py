@@ -0,0 +1,150 @@
+from plugin.tictactoe.agent import Agent, next_moves
+from itertools import accumulate
+from bisect import bisect
+from typing import List
+import random
+import math
+
+
+class CompiledPolicy:
+    """
+    An agent's move choices compiled into tables, so choosing a move is one lookup and one draw instead of
+    ranking and weighing every possible move.
+
+    Every history gets an entry of its moves, the cumulative weights random_weighted_move gives them and the
+    moves tied for best by get_best_moves. A weighted move is a binary search of the cumulative weights and
+    a greedy move one choice among the best moves. They draw the same random numbers as random.choices and
+    random.choice, so with the same seed the policy plays the moves the agent would. Greedy moves match
+    exactly. The weights use math.exp where random_weighted_move uses numpy's, which can differ in the last
+    bit, so a weighted draw can only differ if it lands within rounding of a boundary between two moves.
+
+    Entries are compiled when first needed, or all at once by compile. The policy listens to the brain and
+    drops the entries of the histories whose next rewards changed, which are compiled again when next
+    needed, so it stays right while the brain learns but pays off when the brain is frozen.
+    """
+
+    def __init__(self, agent: Agent):
+        """
+        Start an empty policy for an agent.
+
+        :param agent: The agent whose marker, brain and solver the policy plays with.
+        """
+        self.agent = agent
+        self.brain = agent.brain
+        self.entries = {} # Context cursor to the symmetries of the context to the entry
+        self.unseen = {} # Board state to the entry of every history without a reward, so without rewarded next moves either
+        self.compiled = 0
+        self.dropped = 0
+        self.brain.listeners.append(self)
+
+    def close(self):
+        """Stop listening to the brain."""
+        self.brain.listeners.remove(self)
+
+    def compile(self):
+        """Compile the entry of every history in the brain."""
+        brain = self.brain
+        histories = [key.split("-") if key else [] for key in brain.reward_table]
+        self.compile_many(
+            [brain.history_context(history) for history in histories],
+            [history[-1] if history else brain.empty_state for history in histories],
+        )
+
+    def compile_many(self, contexts, board_states: List[str]):
+        """
+        Compile the entries of histories.
+
+        :param contexts: The contexts of the histories.
+        :param board_states: The last board state of each history.
+        :return: The entries, in order.
+        """
+        agent = self.agent
+        brain = self.brain
+        exp = math.exp
+        moves = [next_moves(board_state, agent.marker) for board_state in board_states]
+        rewards = [brain.context_rewards(context, next_states) for context, (_, next_states) in zip(contexts, moves)]
+        #The weights of random_weighted_move, min max normalized rewards through modified_sigmoid
+        weights = []
+        for state_rewards in rewards:
+            if not state_rewards:
+                weights.append(())
+                continue
+            low = min(state_rewards)
+            spread = max(state_rewards) - low
+            if spread > 0:
+                weights.append([1 / (1 + exp(-(reward - low) / spread)) + 0.01 for reward in state_rewards])
+            else:
+                weights.append([1 / (1 + exp(0)) + 0.01] * len(state_rewards)) # Every reward normalizes to 0
+
+        get = brain.store.get
+        entries = []
+        for context, board_state, (positions, _), state_rewards, state_weights in zip(contexts, board_states, moves, rewards, weights):
+            cumulative = tuple(accumulate(state_weights))
+            if agent.solver is None:
+                scores = state_rewards
+            else:
+                try:
+                    move_values = agent.solver.get_move_values(board_state, agent.marker)
+                except ValueError:
+                    move_values = {}
+                scores = [(reward, move_values.get(position, 0)) for position, reward in zip(positions, state_rewards)]
+            best_score = max(scores, default=None)
+            best = tuple(position for position, score in zip(positions, scores) if score == best_score)
+            entry = (positions, cumulative, cumulative[-1] + 0.0 if cumulative else 0.0, best)
+            cursor, symmetries = context
+            if get(cursor, None) is None:
+                self.unseen[board_state] = entry
+            else:
+                self.entries.setdefault(cursor, {})[symmetries] = entry
+            self.compiled += 1
+            entries.append(entry)
+        return entries
+
+    def entry(self, context, board_state: str):
+        """
+        Get the entry of a history, compiling it if needed.
+
+        :param context: The context of the history.
+        :param board_state: The last board state of the history.
+        :return: The moves, their cumulative weights, the total weight and the best moves.
+        """
+        cursor, symmetries = context
+        entry = self.entries.get(cursor, {}).get(symmetries)
+        if entry is None:
+            #Every prefix of a rewarded history is rewarded, so a history without a reward has no rewarded next
+            #moves and its entry only depends on its board state
+            if self.brain.store.get(cursor, None) is None:
+                entry = self.unseen.get(board_state)
+            if entry is None:
+                entry = self.compile_many([context], [board_state])[0]
+        return entry
+
+    def weighted_move(self, context, board_state: str, rng=random):
+        """Get a move drawn by reward, the same as random_weighted_move on the agent's possible moves."""
+        positions, cumulative, total, _ = self.entry(context, board_state)
+        return positions[bisect(cumulative, rng.random() * total, 0, len(positions) - 1)]
+
+    def greedy_move(self, context, board_state: str, rng=random):
+        """Get one of the best moves at random, the same as get_best_move on the agent's possible moves."""
+        return rng.choice(self.entry(context, board_state)[3])
+
+    def rewards_changed(self, cursors):
+        """
+        Drop the entries of the histories whose next rewards changed.
+
+        :param cursors: The cursors whose rewards changed, None if they all may have.
+        """
+        if cursors is None:
+            self.dropped += sum(len(entries) for entries in self.entries.values())
+            self.entries.clear()
+            self.unseen.clear() # Pruning changes the fallback rewards of histories without one
+            return
+        parent = self.brain.store.parent
+        entries = self.entries
+        for cursor in cursors:
+            dropped = entries.pop(parent(cursor), None)
+            if dropped is not None:
+                self.dropped += len(dropped)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
@@ -0,0 +1,97 @@
+from typing import Dict, Tuple
+import json
+import os
+
+
+def history_depth(key: str):
+    """Get the number of board states in a "-" joined history key."""
+    return key.count("-") + 1 if key else 0
+
+
+def prune_table(table: Dict[str, float], counts: Dict[str, int], epochs: Dict[str, int], target: int, min_depth: int=3):
+    """
+    Choose the histories of a flat reward table to drop so it holds at most target of them.
+
+    The least updated histories go first and, among equally updated ones, those updated longest ago.
+    Histories shorter than min_depth are always kept, and a dropped history takes every longer history
+    through it along, so every prefix of a kept history is kept. A history is updated along with all of its
+    prefixes, so a prefix is never less updated or more stale than the histories through it and this
+    rarely drops more than asked.
+
+    :param table: The flat reward table.
+    :param counts: The update count of each history.
+    :param epochs: The epoch each history was last updated in.
+    :param target: The most histories to keep, though never fewer than those shorter than min_depth.
+    :param min_depth: The number of board states a history needs before it can be dropped.
+    :return: The kept table and counts, and for each last board state of the dropped histories the
+        count weighted sum of their rewards and the sum of their weights.
+    """
+    excess = len(table) - target
+    dropped = set()
+    if excess > 0:
+        candidates = [key for key in table if history_depth(key) >= min_depth]
+        #Ties go by key rather than by the store's order, which differs once a store is rebuilt, so a brain
+        #resumed from a checkpoint prunes the same histories as the brain that wrote it
+        candidates.sort(key=lambda key: (counts.get(key, 0), epochs.get(key, 0), key))
+        dropped.update(candidates[:excess])
+    kept_table = {}
+    kept_counts = {}
+    totals: Dict[str, Tuple[float, int]] = {}
+    for key in sorted(table): # A history sorts after its prefixes
+        parent, _, state = key.rpartition("-")
+        if key and parent in dropped:
+            dropped.add(key)
+        if key not in dropped:
+            kept_table[key] = table[key]
+            kept_counts[key] = counts.get(key, 0)
+            continue
+        weight = max(counts.get(key, 0), 1)
+        total, weights = totals.get(state, (0.0, 0))
+        totals[state] = (total + table[key] * weight, weights + weight)
+    return kept_table, kept_counts, totals
+
+
+def trim_fallback(fallback: Dict[str, Tuple[float, int]], limit: int):
+    """
+    Keep only the limit board states of a fallback with the most weight behind them, in place.
+
+    :return: The number of board states dropped.
+    """
+    excess = len(fallback) - limit
+    if excess <= 0:
+        return 0
+    for board_state, _ in sorted(fallback.items(), key=lambda item: (item[1][1], item[0]))[:excess]:
+        del fallback[board_state]
+    return excess
+
+
+def fallback_path(brain_file: str):
+    """
+    Get the path of the file that keeps the fallback rewards of a brain file, next to it. It only depends on
+    the file's name without its extension, so a brain converted between JSON and binary keeps its fallback.
+    """
+    return os.path.splitext(brain_file)[0] + ".fallback.json"
+
+
+def is_fallback_file(path: str):
+    """Check if a file keeps the fallback rewards of a brain file rather than being a brain itself."""
+    return path.endswith(".fallback.json")
+
+
+def save_fallback(brain_file: str, fallback: Dict[str, Tuple[float, int]]):
+    """Write the fallback rewards of a brain next to its brain file, or remove a stale one if there are none."""
+    path = fallback_path(brain_file)
+    if fallback:
+        with open(path, "w") as f:
+            json.dump(fallback, f)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def load_fallback(brain_file: str):
+    """Read the fallback rewards kept next to a brain file, empty if it has none."""
+    path = fallback_path(brain_file)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {board_state: (mean, weight) for board_state, (mean, weight) in json.load(f).items()}
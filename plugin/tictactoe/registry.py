@@ -0,0 +1,155 @@
+from plugin.tictactoe.agent import Agent
+from plugin.tictactoe.brainfile import MappedRewardStore, load_reward_store
+from plugin.tictactoe.pruning import load_fallback
+from plugin.tictactoe.symmetry import canonicalize_table
+import asyncio
+import math
+import mmap
+import time
+import os
+
+
+class BrainError(Exception):
+    """A brain that could not be loaded or failed validation."""
+
+
+class BrainRegistry:
+    """
+    Hold the agent that serves games and swap in newly trained brains while the app runs.
+
+    The serving agent is published as a single reference. Requests read it once and keep that agent
+    for the rest of the request, so a swap never changes a move in flight and reading it takes no lock.
+    New brains are loaded, validated and warmed in the default executor before the swap, and loads run
+    one at a time. Listeners, such as the GameService, warm their own caches of a new agent in the executor
+    through warm_agent and are given what they warmed through agent_swapped once the agent serves.
+    """
+
+    def __init__(self, agent: Agent, metrics=None):
+        """
+        Initialize the registry.
+
+        :param agent: The agent to serve until a brain is loaded.
+        :param metrics: The ServerMetrics brain load times are recorded in, None to not record them.
+        """
+        self.agent = agent
+        self.version = 0
+        self.path = None
+        self.loaded_at = time.time()
+        self._load_lock = asyncio.Lock()
+        self._watched_mtime = None
+        self.metrics = metrics
+        self.listeners = [] # Warmed for each new agent through warm_agent, then told of the swap through agent_swapped
+
+    def get(self):
+        """Get the serving agent, read it once per request."""
+        return self.agent
+
+    async def load(self, path: str, canonical: bool=False, warm: bool=True):
+        """
+        Load a brain file and swap it in, keeping the serving agent if anything fails.
+
+        :param path: A JSON or binary brain file.
+        :param canonical: Whether the brain was trained with canonical keys.
+        :param warm: Touch the brain and let the listeners warm their caches before the swap, so the first
+            requests do not pay for page faults or rank the openings of every game.
+        :return: The status of the registry after the swap.
+        """
+        async with self._load_lock:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            agent, warmed = await loop.run_in_executor(None, self._prepare, path, canonical, warm)
+            if self.metrics is not None:
+                self.metrics.brain_load_seconds.observe(time.perf_counter() - start)
+            return self._swap(agent, path, warmed)
+
+    def load_now(self, path: str, canonical: bool=False, warm: bool=True):
+        """
+        Load a brain file and swap it in on this thread, for loading before the app serves, such as in a
+        server's parent process so forked workers share it. A watch of the same file starts from this load.
+
+        :return: The status of the registry after the swap.
+        """
+        agent, warmed = self._prepare(path, canonical, warm)
+        self._watched_mtime = os.stat(path).st_mtime
+        return self._swap(agent, path, warmed)
+
+    def _swap(self, agent: Agent, path: str, warmed):
+        """Publish a prepared agent, then give each listener what it warmed for it."""
+        self.agent = agent
+        self.version += 1
+        self.path = path
+        self.loaded_at = time.time()
+        for listener, state in zip(self.listeners, warmed):
+            listener.agent_swapped(agent, state)
+        return self.status()
+
+    def _prepare(self, path: str, canonical: bool, warm: bool):
+        """
+        Load, validate and warm a brain in the executor.
+
+        :return: The agent and what each listener warmed for it, None for every listener when not warming.
+        """
+        try:
+            store = load_reward_store(path)
+        except (OSError, ValueError, KeyError) as e:
+            raise BrainError(f"Could not load {path}: {e}") from e
+        if canonical and not isinstance(store, MappedRewardStore):
+            store = type(store).from_flat(*canonicalize_table(store.to_flat(), store.to_flat_counts()))
+        agent = Agent(marker=self.agent.marker, store=store, canonical=canonical, solver=self.agent.solver)
+        agent.brain.fallback = load_fallback(path)
+        self.validate(agent)
+        if not warm:
+            return agent, [None] * len(self.listeners)
+        self.warm(agent)
+        return agent, [listener.warm_agent(agent) for listener in self.listeners]
+
+    @staticmethod
+    def validate(agent: Agent):
+        """Check that a brain has rewards and answers a first move with finite rewards, raising BrainError if not."""
+        if len(agent.brain.store) == 0:
+            raise BrainError("The brain has no rewards")
+        try:
+            moves = agent.get_possible_moves_experimental()
+        except (AttributeError, TypeError, ValueError) as e:
+            raise BrainError(f"The brain could not rate a first move: {e}") from e
+        if len(moves) != 9 or not all(math.isfinite(move["reward"]) for move in moves.values()):
+            raise BrainError("The brain does not give a reward for every first move")
+
+    @staticmethod
+    def warm(agent: Agent):
+        """Read the whole brain once, faulting in every page of a mapped brain."""
+        store = agent.brain.store
+        if isinstance(store, MappedRewardStore):
+            data = store.data
+            for offset in range(0, len(data), mmap.PAGESIZE):
+                data[offset]
+        agent.get_possible_moves_experimental()
+
+    async def watch(self, path: str, canonical: bool=False, interval: float=2.0):
+        """
+        Reload a brain file whenever its mtime changes, until cancelled.
+
+        A brain that fails to load is reported and skipped, the serving agent stays.
+        """
+        while True:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._watched_mtime:
+                self._watched_mtime = mtime
+                try:
+                    await self.load(path, canonical)
+                    print(f"Loaded brain {path} as version {self.version}")
+                except BrainError as e:
+                    print(f"Kept brain version {self.version}: {e}")
+            await asyncio.sleep(interval)
+
+    def status(self):
+        """Get the version, file and load time of the serving brain."""
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loadedAt": self.loaded_at,
+            "entries": len(self.agent.brain.store),
+        }
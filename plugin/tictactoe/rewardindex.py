@@ -0,0 +1,100 @@
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import List
+
+DEPTHS = 10 # Histories hold the empty board and up to 9 moves
+
+
+class RewardIndex:
+    """
+    The best rewards of a reward store at every history depth, kept up to date as rewards change.
+
+    Every depth has a max heap of (reward, sequence, cursor) entries. Changed histories are only noted,
+    since a game updates the same few histories many times, and the next query pushes each of them once
+    as a new entry rather than finding and fixing the old one. Entries whose reward no longer matches the
+    store are dropped when they reach the top, so queries take logarithmic time in the changes since the
+    last one. The heaps are rebuilt from the store once they hold twice the entries of the last build.
+    Ties go to the history that reached the reward first, which for a fresh index is the order of the
+    flat table.
+    """
+
+    def __init__(self, store):
+        """
+        Build the index of a store.
+
+        :param store: The reward store, whose every change must be reported through push_many.
+        """
+        self.store = store
+        self.build()
+
+    def build(self):
+        """Rebuild the heaps from every reward in the store."""
+        self.sequence = count()
+        self.heaps = [[] for _ in range(DEPTHS)]
+        store = self.store
+        for key, reward in store.to_flat().items():
+            depth = key.count("-") + 1 if key else 0
+            self.heaps[depth].append((-reward, next(self.sequence), store.cursor(key)))
+        for heap in self.heaps:
+            heapify(heap)
+        self.entries = sum(len(heap) for heap in self.heaps)
+        self.changed = {} # Cursors of the histories changed since the last query, to their depths
+        self.limit = 2 * self.entries + 1024 # Entries at which to rebuild, so rebuilds are rare as the store grows
+
+    def push_many(self, cursors: List, depths: List[int]):
+        """
+        Note histories that were just updated, to index their rewards at the next query.
+
+        :param cursors: The cursors of the histories.
+        :param depths: The number of board states in each history.
+        """
+        self.changed.update(zip(cursors, depths))
+
+    def _push_changed(self):
+        """Push the current rewards of the changed histories, or rebuild if that would make the heaps too large."""
+        changed = self.changed
+        if not changed:
+            return
+        if self.entries + len(changed) > self.limit:
+            self.build()
+            return
+        get = self.store.get
+        heaps = self.heaps
+        sequence = self.sequence
+        for cursor, depth in changed.items():
+            heappush(heaps[depth], (-get(cursor), next(sequence), cursor))
+        self.entries += len(changed)
+        self.changed = {}
+
+    def top(self, k: int=1, depth: int=None):
+        """
+        Get the best histories.
+
+        :param k: The number of histories.
+        :param depth: Only histories of this many board states, any depth if None.
+        :return: Up to k (cursor, reward) pairs, best first.
+        """
+        self._push_changed()
+        depths = range(DEPTHS) if depth is None else [depth]
+        best = []
+        for d in depths:
+            best.extend(self._top(self.heaps[d], k))
+        best.sort()
+        return [(cursor, -negative) for negative, _, cursor in best[:k]]
+
+    def _top(self, heap, k: int):
+        """Get the k best live entries of a heap, dropping the stale and duplicate entries above them."""
+        get = self.store.get
+        found = []
+        seen = set()
+        while heap and len(found) < k:
+            entry = heappop(heap)
+            negative, _, cursor = entry
+            if cursor in seen or get(cursor, None) != -negative:
+                self.entries -= 1
+                continue
+            seen.add(cursor)
+            found.append(entry)
+        for entry in found:
+            heappush(heap, entry)
+        return found
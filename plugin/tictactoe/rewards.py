@@ -0,0 +1,366 @@
+from typing import Dict, List, Set
+from array import array
+
+UNSET = float("nan")
+
+
+class FlatRewardStore:
+    """
+    The original flat reward table. Every history prefix is a key made of the board states joined by "-".
+
+    Update counts are a second dict of the same keys rather than an array beside the rewards, since the
+    table is the flat brain format itself, handed out as is by to_flat, and an array would need a dict of
+    key to index anyway. TrieRewardStore keeps rewards and counts in parallel arrays.
+
+    A cursor into this store is the key of a history prefix, the empty string being the empty history.
+    """
+    root = ""
+
+    def __init__(self, table: Dict[str, float]=None, counts: Dict[str, int]=None):
+        self.table = {} if table is None else table
+        self.counts = {} if counts is None else counts # How many times each key has been updated
+        self.changed: Set[str] = None # Cursors changed since take_changes, None when changes are not tracked
+
+    @classmethod
+    def from_flat(cls, table: Dict[str, float], counts: Dict[str, int]=None):
+        """Wrap a flat reward table and its update counts, both are used as is."""
+        return cls(table, counts)
+
+    def to_flat(self):
+        """Get the flat reward table."""
+        return self.table
+
+    def to_flat_counts(self):
+        """Get the update counts of the flat reward table."""
+        return self.counts
+
+    def cursor(self, key: str):
+        """Get the cursor of a "-" joined history key."""
+        return key
+
+    def key(self, cursor: str):
+        """Get the "-" joined history key of a cursor."""
+        return cursor
+
+    def parent(self, cursor: str):
+        """Get the cursor of a history without its last board state."""
+        return cursor.rpartition("-")[0]
+
+    def child(self, cursor: str, board_state: str):
+        """
+        Get the cursor of a history extended by one board state.
+
+        :param cursor: The cursor of the history.
+        :param board_state: The board state to extend the history with.
+        """
+        return board_state if cursor == "" else f"{cursor}-{board_state}"
+
+    def find(self, cursor: str, board_state: str):
+        """Get the cursor of an extended history, the flat store has no structure to miss so this is child."""
+        return self.child(cursor, board_state)
+
+    def get(self, cursor: str, default=0):
+        """Get the reward of a history prefix."""
+        return self.table.get(cursor, default)
+
+    def get_count(self, cursor: str):
+        """Get how many times a history prefix has been updated."""
+        return self.counts.get(cursor, 0)
+
+    def update(self, cursor: str, reward: float, rate: float=0.5):
+        """
+        Move the reward of a history prefix towards a new reward, a new prefix takes the reward as is.
+
+        :param cursor: The cursor of the history prefix.
+        :param reward: The new reward.
+        :param rate: How far to move towards the new reward, None for the mean of every reward so far.
+        :return: How much the reward changed, from 0 for a new prefix.
+        """
+        table = self.table
+        counts = self.counts
+        count = counts.get(cursor, 0)
+        old = table.get(cursor)
+        if old is None:
+            new = reward
+            old = 0
+        elif rate == 0.5:
+            new = (old + reward) / 2 # The original update, kept exact
+        elif rate is None:
+            new = old + (reward - old) / (max(count, 1) + 1)
+        else:
+            new = old + rate * (reward - old)
+        table[cursor] = new
+        counts[cursor] = count + 1
+        if self.changed is not None:
+            self.changed.add(cursor)
+        return new - old
+
+    def update_many(self, cursors: List[str], rewards: List[float], rate: float=0.5):
+        """
+        Update history prefixes in order, the same as calling update on each without the overhead of a call each.
+
+        :return: The sum of the absolute changes.
+        """
+        table = self.table
+        counts = self.counts
+        total = 0.0
+        for cursor, reward in zip(cursors, rewards):
+            old = table.get(cursor)
+            if old is None:
+                new = reward
+                old = 0
+            elif rate == 0.5:
+                new = (old + reward) / 2
+            elif rate is None:
+                new = old + (reward - old) / (max(counts.get(cursor, 0), 1) + 1)
+            else:
+                new = old + rate * (reward - old)
+            table[cursor] = new
+            counts[cursor] = counts.get(cursor, 0) + 1
+            total += abs(new - old)
+        if self.changed is not None:
+            self.changed.update(cursors)
+        return total
+
+    def set(self, cursor: str, reward: float, count: int):
+        """Overwrite the reward and update count of a history prefix."""
+        self.table[cursor] = reward
+        self.counts[cursor] = count
+        if self.changed is not None:
+            self.changed.add(cursor)
+
+    def track_changes(self):
+        """Start recording which history prefixes change, for take_changes."""
+        if self.changed is None:
+            self.changed = set()
+
+    def take_changes(self):
+        """
+        Get the history prefixes changed since the last call and start over.
+
+        :return: A dictionary of "-" joined history key to its reward and update count.
+        """
+        changed, self.changed = self.changed or (), set()
+        return {cursor: (self.table[cursor], self.counts[cursor]) for cursor in changed}
+
+    def child_rewards(self, cursor: str, board_states: List[str]):
+        """Get the rewards of a history extended by each of the board states."""
+        table = self.table
+        if cursor == "":
+            return [table.get(state, 0) for state in board_states]
+        return [table.get(f"{cursor}-{state}", 0) for state in board_states]
+
+    def __len__(self):
+        return len(self.table)
+
+
+class TrieRewardStore:
+    """
+    A prefix trie of histories. Nodes are integers and the rewards live in an array indexed by node,
+    so extending a history or reading the rewards of its next states never builds a key string.
+
+    A cursor into this store is a node, node 0 being the empty history.
+    """
+    root = 0
+
+    def __init__(self):
+        self.children: List[Dict[str, int]] = [None]
+        self.values = array("d", [UNSET])
+        self.counts = array("L", [0]) # How many times each node has been updated
+        self.parents = array("L", [0]) # The parent and last board state of each node, to rebuild keys
+        self.states: List[str] = [""]
+        self.changed: Set[int] = None # Nodes changed since take_changes, None when changes are not tracked
+
+    @classmethod
+    def from_flat(cls, table: Dict[str, float], counts: Dict[str, int]=None):
+        """
+        Import a flat reward table.
+
+        :param table: The flat reward table with "-" joined history keys.
+        :param counts: The update counts of the keys, if known.
+        """
+        store = cls()
+        counts = counts or {}
+        for key, reward in table.items():
+            node = store.cursor(key)
+            store.values[node] = reward
+            store.counts[node] = counts.get(key, 0)
+        return store
+
+    def to_flat(self):
+        """Export the trie as a flat reward table."""
+        return {key: self.values[node] for key, node in self.walk()}
+
+    def to_flat_counts(self):
+        """Export the update counts as a flat table of the same keys as to_flat."""
+        return {key: self.counts[node] for key, node in self.walk()}
+
+    def walk(self):
+        """Yield the "-" joined history key and node of every node that has a reward."""
+        stack = [(self.root, "")]
+        while stack:
+            node, key = stack.pop()
+            if self.values[node] == self.values[node]:
+                yield key, node
+            children = self.children[node]
+            if children is None:
+                continue
+            for board_state, child in children.items():
+                stack.append((child, board_state if key == "" else f"{key}-{board_state}"))
+
+    def cursor(self, key: str):
+        """Get the node of a "-" joined history key, creating it if needed."""
+        node = self.root
+        if key != "":
+            for board_state in key.split("-"):
+                node = self.child(node, board_state)
+        return node
+
+    def key(self, node: int):
+        """Get the "-" joined history key of a node."""
+        states = []
+        while node != self.root:
+            states.append(self.states[node])
+            node = self.parents[node]
+        return "-".join(reversed(states))
+
+    def parent(self, node: int):
+        """Get the node of a history without its last board state."""
+        return self.parents[node]
+
+    def child(self, node: int, board_state: str):
+        """
+        Get the node of a history extended by one board state, creating it if needed.
+
+        :param node: The node of the history.
+        :param board_state: The board state to extend the history with.
+        """
+        children = self.children[node]
+        if children is None:
+            children = self.children[node] = {}
+        child = children.get(board_state)
+        if child is None:
+            child = children[board_state] = len(self.values)
+            self.children.append(None)
+            self.values.append(UNSET)
+            self.counts.append(0)
+            self.parents.append(node)
+            self.states.append(board_state)
+        return child
+
+    def find(self, node: int, board_state: str):
+        """Get the node of an extended history without creating it, None if it has never been seen."""
+        if node is None:
+            return None
+        children = self.children[node]
+        if children is None:
+            return None
+        return children.get(board_state)
+
+    def get(self, node: int, default=0):
+        """Get the reward of a node."""
+        if node is None:
+            return default
+        reward = self.values[node]
+        return reward if reward == reward else default
+
+    def get_count(self, node: int):
+        """Get how many times a node has been updated."""
+        return 0 if node is None else self.counts[node]
+
+    def update(self, node: int, reward: float, rate: float=0.5):
+        """
+        Move the reward of a node towards a new reward, a node without a reward takes the reward as is.
+
+        :param node: The node of the history.
+        :param reward: The new reward.
+        :param rate: How far to move towards the new reward, None for the mean of every reward so far.
+        :return: How much the reward changed, from 0 for a node without a reward.
+        """
+        values = self.values
+        old = values[node]
+        count = self.counts[node]
+        if old != old:
+            new = reward
+            old = 0
+        elif rate == 0.5:
+            new = (old + reward) / 2 # The original update, kept exact
+        elif rate is None:
+            new = old + (reward - old) / (max(count, 1) + 1)
+        else:
+            new = old + rate * (reward - old)
+        values[node] = new
+        self.counts[node] = count + 1
+        if self.changed is not None:
+            self.changed.add(node)
+        return new - old
+
+    def update_many(self, nodes: List[int], rewards: List[float], rate: float=0.5):
+        """
+        Update nodes in order, the same as calling update on each without the overhead of a call each.
+
+        :return: The sum of the absolute changes.
+        """
+        values = self.values
+        counts = self.counts
+        total = 0.0
+        for node, reward in zip(nodes, rewards):
+            old = values[node]
+            if old != old:
+                new = reward
+                old = 0
+            elif rate == 0.5:
+                new = (old + reward) / 2
+            elif rate is None:
+                new = old + (reward - old) / (max(counts[node], 1) + 1)
+            else:
+                new = old + rate * (reward - old)
+            values[node] = new
+            counts[node] += 1
+            total += abs(new - old)
+        if self.changed is not None:
+            self.changed.update(nodes)
+        return total
+
+    def set(self, node: int, reward: float, count: int):
+        """Overwrite the reward and update count of a node."""
+        self.values[node] = reward
+        self.counts[node] = count
+        if self.changed is not None:
+            self.changed.add(node)
+
+    def track_changes(self):
+        """Start recording which nodes change, for take_changes."""
+        if self.changed is None:
+            self.changed = set()
+
+    def take_changes(self):
+        """
+        Get the nodes changed since the last call and start over.
+
+        :return: A dictionary of "-" joined history key to its reward and update count.
+        """
+        changed, self.changed = self.changed or (), set()
+        return {self.key(node): (self.values[node], self.counts[node]) for node in changed}
+
+    def child_rewards(self, node: int, board_states: List[str]):
+        """Get the rewards of a node's children for each of the board states."""
+        children = self.children[node] if node is not None else None
+        if not children:
+            return [0] * len(board_states)
+        values = self.values
+        rewards = []
+        for state in board_states:
+            child = children.get(state)
+            reward = UNSET if child is None else values[child]
+            rewards.append(reward if reward == reward else 0)
+        return rewards
+
+    def __len__(self):
+        return sum(1 for reward in self.values if reward == reward)
+
+
+REWARD_STORES = {
+    "flat": FlatRewardStore,
+    "trie": TrieRewardStore,
+}
@@ -0,0 +1,245 @@
+from plugin.tictactoe.agent import Agent, get_best_moves
+from plugin.tictactoe.movecache import MoveCache
+from plugin.tictactoe.registry import BrainRegistry
+from plugin.tictactoe.game import BitBoard, Game
+from typing import List
+import asyncio
+import random
+import time
+import uuid
+
+AGENT_MODES = ("brain", "solver")
+
+class GameError(Exception):
+    """An error in a game request, carrying the HTTP status it should be answered with."""
+
+    def __init__(self, message: str, status: int=400):
+        super().__init__(message)
+        self.status = status
+
+
+class GameService:
+    """
+    Serve games between players and the agent.
+
+    Game state only changes on the event loop, and game ids hash onto a fixed set of locks so concurrent
+    requests for the same game id run one after another without keeping a lock per game, which would leak
+    for games that are abandoned and expire from the session store. Those locks only hold within a process,
+    so a move is made on a copy of the board and written back with SessionStore.replace, which fails if a
+    request in another worker moved first and the move is answered with 409 Conflict to try again. The agent's move selection runs in the
+    default executor and only reads the brain with the game's history, so every game shares one agent
+    without locking it. The agent is read from the registry once per move, so a brain swapped in mid move
+    only plays the next one. Ranked moves are cached by history, so a repeated history skips the executor,
+    and the openings of a newly swapped in brain are ranked into the cache before it serves.
+
+    In the solver mode the agent only plays moves its solver rates perfect, so it never loses, and the brain's
+    rewards are still reported with each move.
+    """
+
+    def __init__(self, game: Game, registry: BrainRegistry, lock_stripes: int=256, cache_size: int=100000, metrics=None,
+                 mode: str="brain", warm_moves: int=2):
+        """
+        Initialize the service.
+
+        :param game: The games being served.
+        :param registry: The registry of the agent playing them.
+        :param lock_stripes: How many locks game ids are spread over.
+        :param cache_size: The most histories whose ranked moves are cached, 0 to not cache.
+        :param metrics: The ServerMetrics the agent's decision time is recorded in, None to not record it.
+        :param mode: brain to play the moves the brain rewards most, solver to play the solver's perfect moves.
+        :param warm_moves: How many of the agent's first moves in a game are cached for a swapped in brain.
+        """
+        if mode not in AGENT_MODES:
+            raise ValueError(f"Unknown agent mode {mode}, expected one of {', '.join(AGENT_MODES)}")
+        if mode == "solver" and registry.get().solver is None:
+            raise ValueError("The solver mode needs an agent with a solver")
+        self.game = game
+        self.registry = registry
+        self.locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        self.move_cache = MoveCache(cache_size)
+        self.metrics = metrics
+        self.mode = mode
+        self.warm_moves = warm_moves
+        registry.listeners.append(self)
+
+    def new_game(self):
+        """
+        Create a new game, the player moves first.
+
+        :return: The response for the new game.
+        """
+        game_id = uuid.uuid4().hex
+        self.game.new_game(game_id)
+        return self._status(game_id, self.game.boards[game_id], None, None, -1)
+
+    async def make_move(self, game_id: str, position: int):
+        """
+        Make the player's move and answer with the agent's.
+
+        :param game_id: The id of the game.
+        :param position: The position the player moves to.
+        :return: The response with the agent's move and the game status.
+        """
+        if not isinstance(game_id, str):
+            raise GameError("gameId must be a string")
+        async with self.locks[hash(game_id) % len(self.locks)]:
+            board, session_version = self.game.boards.get_versioned(game_id)
+            if board is None:
+                raise GameError(f"Game {game_id} does not exist, is over or has expired", 404)
+            #bool is an int, but true and false are not positions
+            if not isinstance(position, int) or isinstance(position, bool) or position not in board.get_valid_moves():
+                raise GameError(f"Position {position} is not a valid move")
+
+            winner = self._move(board, position)
+            agent_position = None
+            rewards = None
+            if winner == -1:
+                agent = self.registry.get()
+                history = board.get_history()
+                cached = self.move_cache.get(agent, history)
+                if cached is None:
+                    version = agent.brain.version
+                    loop = asyncio.get_running_loop()
+                    cached = await loop.run_in_executor(None, self._rank_moves, agent, history)
+                    self.move_cache.put(agent, version, history, *cached)
+                rewards, best_moves = cached
+                agent_position = random.choice(best_moves)
+                winner = self._move(board, agent_position)
+            if not self.game.boards.replace(game_id, session_version, board if winner == -1 else None):
+                raise GameError(f"Game {game_id} was moved by another request at the same time, try again", 409)
+            return self._status(game_id, board, agent_position, rewards, winner)
+
+    def check_positions(self, positions, limit: int):
+        """
+        Check the positions of an evaluation request and get their histories.
+
+        :param positions: A list of histories, each a list of board states, or of single board states,
+            which are taken as a history of that one state.
+        :param limit: The most positions in one request.
+        :return: The histories.
+        """
+        if not isinstance(positions, list):
+            raise GameError("positions must be a list of histories or board states")
+        if len(positions) > limit:
+            raise GameError(f"At most {limit} positions can be evaluated at once", 413)
+        cells = len(self.registry.get().brain.empty_state)
+        histories = []
+        for index, position in enumerate(positions):
+            history = [position] if isinstance(position, str) else position
+            if not isinstance(history, list) or not all(
+                isinstance(state, str) and len(state) == cells and not state.strip("_XO") for state in history
+            ):
+                raise GameError(f"Position {index} is not a board state or a list of board states")
+            histories.append(history)
+        return histories
+
+    async def evaluate(self, histories: List[List[str]], chunk: int=1024):
+        """
+        Rank the agent's moves after many histories, a chunk at a time in the default executor.
+
+        Every chunk is ranked by the agent that was serving when evaluation started, so a brain swapped in
+        part way through a batch does not change its results.
+
+        :param histories: The histories, see check_positions.
+        :param chunk: The most histories ranked in one executor call.
+        :return: An async generator of one result per history, in order, with its moves ranked best first
+            and its best moves, the solver's in the solver mode.
+        """
+        agent = self.registry.get()
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(histories), chunk):
+            ranked = await loop.run_in_executor(None, agent.rank_moves_many, histories[start:start + chunk])
+            for history, (moves, best_moves) in zip(histories[start:start + chunk], ranked):
+                if self.mode == "solver":
+                    try:
+                        best_moves = agent.get_perfect_moves_for(history)
+                    except ValueError:
+                        pass #The solver has no moves for positions a game cannot reach, keep the brain's
+                yield {
+                    "moves": [{"position": position, "reward": reward} for position, reward in moves],
+                    "bestMoves": best_moves,
+                }
+
+    def _move(self, board, position: int):
+        """
+        Make a move on the copy of a game's board read from the session store.
+
+        :return: The winner or -1 as Game.make_move does.
+        """
+        board.make_move(position)
+        return board.get_winner() if board.is_game_over() else -1
+
+    def warm_agent(self, agent: Agent):
+        """
+        Rank the agent's first warm_moves moves of every game, following only its best moves, for agent_swapped
+        to cache. Runs in the registry's executor before the agent serves, reading the brain only.
+
+        :return: The version of the agent's brain and each history with its move rewards and best moves.
+        """
+        version = agent.brain.version
+        ranked = []
+        games = [[]] # The positions of each game so far, before the player's move
+        for _ in range(self.warm_moves):
+            next_games = []
+            for played in games:
+                for position in self._replay(played).get_valid_moves():
+                    board = self._replay(played + [position])
+                    if board.is_game_over():
+                        continue
+                    history = board.get_history()
+                    rewards, best_moves = self._ranked_moves(agent, history)
+                    ranked.append((history, rewards, best_moves))
+                    for best_move in best_moves:
+                        if not self._replay(played + [position, best_move]).is_game_over():
+                            next_games.append(played + [position, best_move])
+            games = next_games
+        return version, ranked
+
+    def agent_swapped(self, agent: Agent, warmed):
+        """Cache the moves warm_agent ranked for an agent that now serves, on the event loop."""
+        if warmed is None:
+            return
+        version, ranked = warmed
+        for history, rewards, best_moves in ranked:
+            self.move_cache.put(agent, version, history, rewards, best_moves)
+
+    @staticmethod
+    def _replay(positions: List[int]):
+        """Get the board of a game with the player moving first."""
+        board = BitBoard()
+        for position in positions:
+            board.make_move(position)
+        return board
+
+    def _rank_moves(self, agent: Agent, history: List[str]):
+        """Get the agent's move rewards and best moves for a history, run in the executor."""
+        start = time.perf_counter()
+        rewards, best_moves = self._ranked_moves(agent, history)
+        if self.metrics is not None:
+            self.metrics.decision_seconds.observe(time.perf_counter() - start)
+        return rewards, best_moves
+
+    def _ranked_moves(self, agent: Agent, history: List[str]):
+        """Get the agent's move rewards and best moves for a history, without recording the decision time."""
+        moves = agent.get_possible_moves_for(history)
+        rewards = {str(move["index"]): {"position": move["index"], "reward": move["reward"]} for move in moves.values()}
+        if self.mode == "solver":
+            best_moves = agent.get_perfect_moves_for(history)
+        else:
+            best_moves = get_best_moves(moves)
+        return rewards, best_moves
+
+    def _status(self, game_id: str, board, position, rewards, winner):
+        """Build the response for a game after a move."""
+        is_game_over = winner != -1
+        return {
+            "gameId": game_id,
+            "position": position,
+            "rewards": rewards or {},
+            "validMoves": [] if is_game_over else board.get_valid_moves(),
+            "gameStatus": {
+                "board": self.game.render_board(board),
+                "winner": winner if is_game_over else None,
+                "isGameOver": is_game_over,
+            },
+        }
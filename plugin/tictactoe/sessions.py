@@ -0,0 +1,309 @@
+from plugin.tictactoe.game import BitBoard
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import threading
+import sqlite3
+import time
+
+PLAYER_CODES = {None: 0, "X": 1, "O": 2}
+PLAYERS = (None, "X", "O")
+
+
+def pack_board(board: BitBoard):
+    """
+    Pack a board into a single integer of at most 42 bits.
+
+    Bits 0-1 hold the player before the first move, bits 2-5 the number of moves and every 4 bits
+    after that one move, so the board is rebuilt by replaying its moves.
+    """
+    if board.moves:
+        #Markers alternate, so the first mover is the last player after an odd number of moves
+        first_player_is_o = (len(board.moves) % 2 == 1) == (board.last_player == "O")
+        before = "X" if first_player_is_o else None
+    else:
+        before = board.last_player
+    packed = PLAYER_CODES[before] | len(board.moves) << 2
+    for i, position in enumerate(board.moves):
+        packed |= position << (6 + 4 * i)
+    return packed
+
+
+def unpack_board(packed: int):
+    """Rebuild a board packed by pack_board."""
+    board = BitBoard()
+    board.last_player = PLAYERS[packed & 3]
+    for i in range(packed >> 2 & 15):
+        board.make_move(packed >> (6 + 4 * i) & 15)
+    return board
+
+
+class SessionStore(ABC):
+    """
+    The interface of a game session store, a mapping of game ids to boards that forgets games.
+
+    A session expires once it has not been read or written for ttl seconds, and once max_sessions are live
+    the least recently used session is evicted to make room. Boards are stored packed, so reading a session
+    gives a fresh board that has to be written back for its changes to stick. Testing whether a session is
+    in the store does not count as using it.
+    """
+    shared = False # Whether separate processes see the same sessions
+
+    def __init__(self, ttl: float=3600, max_sessions: int=100000):
+        """
+        Initialize the store.
+
+        :param ttl: Seconds a session lives without being used, None to never expire.
+        :param max_sessions: The most sessions kept, None for no cap.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.evicted = 0
+        self.expired = 0
+
+    @abstractmethod
+    def get(self, game_id: str, default=None):
+        """Get the board of a session, refreshing it, or default if it is missing or expired."""
+
+    @abstractmethod
+    def put(self, game_id: str, board: BitBoard):
+        """Write the board of a session, refreshing it and evicting old sessions if the store is full."""
+
+    @abstractmethod
+    def delete(self, game_id: str):
+        """Forget a session, returning whether it existed."""
+
+    @abstractmethod
+    def get_versioned(self, game_id: str):
+        """
+        Get the board of a session like get, with a version to write it back through replace.
+
+        :return: The board and its version, or None and None if the session is missing or expired.
+        """
+
+    @abstractmethod
+    def replace(self, game_id: str, version, board: BitBoard=None):
+        """
+        Write the board of a session only if the session is still at the version read with it, as one
+        atomic step, so a move made at the same time by another request or process is never overwritten.
+
+        :param version: The version get_versioned gave with the board.
+        :param board: The new board, None to forget the session.
+        :return: Whether the session was still at the version and was written.
+        """
+
+    @abstractmethod
+    def expire(self):
+        """Forget every expired session."""
+
+    @abstractmethod
+    def __len__(self):
+        """Get the number of sessions in the store, which may include expired ones not yet removed."""
+
+    def close(self):
+        """Release the store's resources."""
+
+    def reopen(self):
+        """Acquire the store's resources again, such as in a worker process forked after close."""
+
+    def stats(self):
+        """Get the live, evicted and expired session counters."""
+        return {"live": len(self), "evicted": self.evicted, "expired": self.expired}
+
+    def __getitem__(self, game_id: str):
+        board = self.get(game_id)
+        if board is None:
+            raise KeyError(game_id)
+        return board
+
+    def __setitem__(self, game_id: str, board: BitBoard):
+        self.put(game_id, board)
+
+    @abstractmethod
+    def __contains__(self, game_id: str):
+        """Get whether a session is live, without refreshing it."""
+
+    def pop(self, game_id: str, default=None):
+        """Remove a session and return its board, or default if it is missing."""
+        board = self.get(game_id)
+        if board is None:
+            return default
+        self.delete(game_id)
+        return board
+
+
+class MemorySessionStore(SessionStore):
+    """
+    An in process session store. Sessions are kept in least recently used order, which is also the order
+    they expire in, so expiry and eviction only ever look at the oldest sessions.
+    """
+
+    def __init__(self, ttl: float=3600, max_sessions: int=100000):
+        super().__init__(ttl, max_sessions)
+        self.sessions = OrderedDict() # Game id to (packed board, last used time)
+
+    def get(self, game_id: str, default=None):
+        session = self.sessions.get(game_id)
+        if session is None:
+            return default
+        now = time.monotonic()
+        if self.ttl is not None and now - session[1] > self.ttl:
+            del self.sessions[game_id]
+            self.expired += 1
+            return default
+        self.sessions[game_id] = (session[0], now)
+        self.sessions.move_to_end(game_id)
+        return unpack_board(session[0])
+
+    def put(self, game_id: str, board: BitBoard):
+        now = time.monotonic()
+        self.sessions[game_id] = (pack_board(board), now)
+        self.sessions.move_to_end(game_id)
+        self._expire(now)
+        if self.max_sessions is not None:
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, game_id: str):
+        return self.sessions.pop(game_id, None) is not None
+
+    def get_versioned(self, game_id: str):
+        #A move always changes the packed board, so it is its own version
+        board = self.get(game_id)
+        return (None, None) if board is None else (board, self.sessions[game_id][0])
+
+    def replace(self, game_id: str, version, board: BitBoard=None):
+        session = self.sessions.get(game_id)
+        if session is None or session[0] != version:
+            return False
+        if board is None:
+            del self.sessions[game_id]
+        else:
+            self.put(game_id, board)
+        return True
+
+    def __contains__(self, game_id: str):
+        session = self.sessions.get(game_id)
+        return session is not None and (self.ttl is None or time.monotonic() - session[1] <= self.ttl)
+
+    def expire(self):
+        self._expire(time.monotonic())
+
+    def _expire(self, now: float):
+        """Drop expired sessions from the least recently used end."""
+        if self.ttl is None:
+            return
+        sessions = self.sessions
+        while sessions:
+            game_id, (_, last_used) = next(iter(sessions.items()))
+            if now - last_used <= self.ttl:
+                break
+            del sessions[game_id]
+            self.expired += 1
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    A session store in a SQLite database, so every server worker pointed at the same file shares sessions.
+
+    Last used times are wall clock times since they are compared across processes. The evicted and expired
+    counters only count what this process removed. A connection must not cross a fork, so close the
+    store before forking and reopen it in each child.
+    """
+    shared = True
+
+    def __init__(self, path: str="sessions.db", ttl: float=3600, max_sessions: int=100000):
+        super().__init__(ttl, max_sessions)
+        self.path = path
+        self._lock = threading.Lock()
+        self.reopen()
+
+    def reopen(self):
+        """Open a new database connection, creating the sessions table if needed."""
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (game_id TEXT PRIMARY KEY, board INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+
+    def get(self, game_id: str, default=None):
+        packed = self._get_packed(game_id)
+        return default if packed is None else unpack_board(packed)
+
+    def get_versioned(self, game_id: str):
+        #A move always changes the packed board, so it is its own version
+        packed = self._get_packed(game_id)
+        return (None, None) if packed is None else (unpack_board(packed), packed)
+
+    def _get_packed(self, game_id: str):
+        """Get the packed board of a session, refreshing it, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute("SELECT board, last_used FROM sessions WHERE game_id = ?", (game_id,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+                self.expired += 1
+                return None
+            self.connection.execute("UPDATE sessions SET last_used = ? WHERE game_id = ?", (now, game_id))
+        return row[0]
+
+    def replace(self, game_id: str, version, board: BitBoard=None):
+        #One conditional statement, which SQLite runs atomically across every connection to the file
+        with self._lock:
+            if board is None:
+                cursor = self.connection.execute("DELETE FROM sessions WHERE game_id = ? AND board = ?", (game_id, version))
+            else:
+                cursor = self.connection.execute(
+                    "UPDATE sessions SET board = ?, last_used = ? WHERE game_id = ? AND board = ?",
+                    (pack_board(board), time.time(), game_id, version)
+                )
+            return cursor.rowcount > 0
+
+    def put(self, game_id: str, board: BitBoard):
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sessions (game_id, board, last_used) VALUES (?, ?, ?)",
+                (game_id, pack_board(board), now)
+            )
+            self._expire(now)
+            if self.max_sessions is not None:
+                excess = self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+                if excess > 0:
+                    self.connection.execute(
+                        "DELETE FROM sessions WHERE game_id IN (SELECT game_id FROM sessions ORDER BY last_used LIMIT ?)",
+                        (excess,)
+                    )
+                    self.evicted += excess
+
+    def delete(self, game_id: str):
+        with self._lock:
+            return self.connection.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,)).rowcount > 0
+
+    def __contains__(self, game_id: str):
+        with self._lock:
+            row = self.connection.execute("SELECT last_used FROM sessions WHERE game_id = ?", (game_id,)).fetchone()
+        return row is not None and (self.ttl is None or time.time() - row[0] <= self.ttl)
+
+    def expire(self):
+        with self._lock:
+            self._expire(time.time())
+
+    def _expire(self, now: float):
+        """Drop expired sessions, the caller holds the lock."""
+        if self.ttl is not None:
+            self.expired += self.connection.execute("DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,)).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
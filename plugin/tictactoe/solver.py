@@ -0,0 +1,131 @@
+from plugin.tictactoe.game import (
+    BASE3_VALUES, FULL_MASK, POSITION_BITS, STATE_INDEX, STATE_STRINGS, VALID_MOVES, WINNING_SIDES
+)
+from functools import lru_cache
+from array import array
+
+STATES = len(STATE_STRINGS)
+MOVERS = {"X": 0, "O": 1}
+UNSOLVED = -128 # Unreachable positions keep this value
+
+
+class Solver:
+    """
+    Perfect play for every reachable position, solved once by memoized negamax.
+
+    Positions are indexed by mover and base 3 board state, each holding the value for the player to
+    move (1 win, 0 draw, -1 loss) and a bitmask of the moves that keep that value. Both players are
+    solved as the first mover since a Board can start with either marker.
+    """
+
+    def __init__(self, values: array=None, best_moves: array=None):
+        """
+        Initialize the solver, solving the game unless precomputed tables are given.
+
+        :param values: The int8 values of every position.
+        :param best_moves: The uint16 optimal move masks of every position.
+        """
+        if values is None or best_moves is None:
+            values, best_moves = self._solve()
+        self.values = values
+        self.best_moves = best_moves
+
+    @staticmethod
+    def _solve():
+        """Solve every position reachable from an empty board with either player starting."""
+        values = array("b", [UNSOLVED]) * (2 * STATES)
+        best_moves = array("H", [0]) * (2 * STATES)
+
+        def negamax(x, o, mover):
+            index = mover * STATES + BASE3_VALUES[x] + 2 * BASE3_VALUES[o]
+            if values[index] != UNSOLVED:
+                return values[index]
+            if WINNING_SIDES[o if mover == 0 else x]:
+                value = -1
+                mask = 0
+            elif x | o == FULL_MASK:
+                value = 0
+                mask = 0
+            else:
+                value = -2
+                mask = 0
+                for move in VALID_MOVES[x | o]:
+                    bit = POSITION_BITS[move]
+                    child = -negamax(x | bit, o, 1) if mover == 0 else -negamax(x, o | bit, 0)
+                    if child > value:
+                        value = child
+                        mask = bit
+                    elif child == value:
+                        mask |= bit
+            values[index] = value
+            best_moves[index] = mask
+            return value
+
+        negamax(0, 0, 0)
+        negamax(0, 0, 1)
+        return values, best_moves
+
+    @classmethod
+    def load(cls, path: str):
+        """Load precomputed tables written by save."""
+        values = array("b")
+        best_moves = array("H")
+        with open(path, "rb") as f:
+            values.fromfile(f, 2 * STATES)
+            best_moves.fromfile(f, 2 * STATES)
+        return cls(values, best_moves)
+
+    def save(self, path: str):
+        """Save the tables so a server can load them instead of solving."""
+        with open(path, "wb") as f:
+            self.values.tofile(f)
+            self.best_moves.tofile(f)
+
+    def _index(self, board_state: str, mover: str):
+        """Get the table index of a position, raising ValueError for positions that cannot be reached."""
+        index = MOVERS[mover] * STATES + STATE_INDEX[board_state]
+        if self.values[index] == UNSOLVED:
+            raise ValueError(f"{board_state} with {mover} to move is not a reachable position")
+        return index
+
+    def value(self, board_state: str, mover: str):
+        """
+        Get the value of a position for the player to move.
+
+        :param board_state: The board state as a string of 9 characters.
+        :param mover: The marker of the player to move.
+        :return: 1 if the mover wins with perfect play, 0 for a draw and -1 for a loss.
+        """
+        return self.values[self._index(board_state, mover)]
+
+    def get_best_moves(self, board_state: str, mover: str):
+        """Get every move that keeps the value of the position for the player to move."""
+        mask = self.best_moves[self._index(board_state, mover)]
+        return [move for move in range(9) if mask & POSITION_BITS[move]]
+
+    def is_best_move(self, board_state: str, mover: str, move: int):
+        """Check if a move keeps the value of the position, for grading moves during training."""
+        return bool(self.best_moves[self._index(board_state, mover)] & POSITION_BITS[move])
+
+    def get_move_values(self, board_state: str, mover: str):
+        """
+        Get the value of every valid move for the player making it.
+
+        :return: A dictionary of move index to 1 for a win, 0 for a draw and -1 for a loss with perfect play.
+        """
+        opponent = "O" if mover == "X" else "X"
+        self._index(board_state, mover)
+        move_values = {}
+        for move, cell in enumerate(board_state):
+            if cell == "_":
+                next_state = board_state[:move] + mover + board_state[move + 1:]
+                move_values[move] = -self.values[MOVERS[opponent] * STATES + STATE_INDEX[next_state]]
+        return move_values
+
+
+@lru_cache(maxsize=None)
+def get_solver(path: str=None):
+    """Get the shared solver, loading its tables from path if given or solving the game once otherwise."""
+    if path is None:
+        return Solver()
+    return Solver.load(path)
@@ -0,0 +1,109 @@
+from plugin.tictactoe.game import BASE3_VALUES, POSITION_BITS, STATE_STRINGS, STATE_INDEX
+from typing import Dict, Tuple
+
+#The 8 rotations and reflections of the board, a transformed board takes position i from position p[i].
+_ROTATION = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+_REFLECTION = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+
+def _compose(first, second):
+    """The permutation of applying first then second."""
+    return tuple(first[second[i]] for i in range(9))
+
+_rotations = [tuple(range(9))]
+for _ in range(3):
+    _rotations.append(_compose(_rotations[-1], _ROTATION))
+PERMUTATIONS = tuple(_rotations + [_compose(rotation, _REFLECTION) for rotation in _rotations])
+ALL_SYMMETRIES = tuple(range(len(PERMUTATIONS)))
+#Where a position ends up on the transformed board, the inverse of each permutation.
+MOVE_IMAGES = tuple(tuple(permutation.index(i) for i in range(9)) for permutation in PERMUTATIONS)
+
+#Every bitboard side under every symmetry, then the base 3 index of every state under every symmetry.
+_SIDE_IMAGES = tuple(
+    tuple(sum(POSITION_BITS[i] for i in range(9) if side & POSITION_BITS[permutation[i]]) for side in range(512))
+    for permutation in PERMUTATIONS
+)
+_SIDES = [(x, o) for x in range(512) for o in range(512) if not x & o]
+_SIDES.sort(key=lambda sides: BASE3_VALUES[sides[0]] + 2 * BASE3_VALUES[sides[1]])
+STATE_IMAGES = tuple(
+    tuple(BASE3_VALUES[side_images[x]] + 2 * BASE3_VALUES[side_images[o]] for x, o in _SIDES)
+    for side_images in _SIDE_IMAGES
+)
+del _SIDES
+
+
+def transform_state(board_state: str, symmetry: int):
+    """Get a board state under one of the symmetries."""
+    return STATE_STRINGS[STATE_IMAGES[symmetry][STATE_INDEX[board_state]]]
+
+
+def transform_move(move: int, symmetry: int):
+    """Get the position a move lands on after applying a symmetry to the board."""
+    return MOVE_IMAGES[symmetry][move]
+
+
+def real_move(canonical_move: int, symmetry: int):
+    """Map a move on the transformed board back to the position on the real board."""
+    return PERMUTATIONS[symmetry][canonical_move]
+
+
+def canonical_state(symmetries: Tuple[int], board_state: str):
+    """
+    Get the canonical form of a board state, the smallest image under the given symmetries.
+
+    :param symmetries: The symmetries still allowed by the history so far.
+    :param board_state: The board state to canonicalize.
+    """
+    index = STATE_INDEX[board_state]
+    return STATE_STRINGS[min(STATE_IMAGES[symmetry][index] for symmetry in symmetries)]
+
+
+def canonical_extend(symmetries: Tuple[int], board_state: str):
+    """
+    Extend a canonical history by one board state.
+
+    A history is canonicalized by the one symmetry that makes its board states smallest in order.
+    Only the symmetries tied so far can still be that one, so the canonical history only ever
+    grows, and the symmetries tied after this state are returned with it.
+
+    :param symmetries: The symmetries tied over the history so far, ALL_SYMMETRIES for an empty one.
+    :param board_state: The next board state.
+    :return: The canonical board state and the symmetries still tied.
+    """
+    index = STATE_INDEX[board_state]
+    images = [(STATE_IMAGES[symmetry][index], symmetry) for symmetry in symmetries]
+    smallest = min(images)[0]
+    return STATE_STRINGS[smallest], tuple(symmetry for image, symmetry in images if image == smallest)
+
+
+def canonical_key(key: str):
+    """Get the canonical form of a "-" joined history key."""
+    if key == "":
+        return key
+    symmetries = ALL_SYMMETRIES
+    states = []
+    for board_state in key.split("-"):
+        board_state, symmetries = canonical_extend(symmetries, board_state)
+        states.append(board_state)
+    return "-".join(states)
+
+
+def canonicalize_table(table: Dict[str, float], counts: Dict[str, int]=None):
+    """
+    Fold a flat reward table onto canonical keys so an existing brain can be loaded canonically.
+
+    Keys that share a canonical form take the mean of their rewards weighted by their update counts,
+    or the plain mean when there are no counts.
+
+    :return: The canonical reward table and its update counts.
+    """
+    counts = counts or {}
+    totals = {}
+    for key, reward in table.items():
+        canonical = canonical_key(key)
+        count = counts.get(key, 0)
+        weight = count or 1
+        total_weight, weighted_reward, total_count = totals.get(canonical, (0, 0.0, 0))
+        totals[canonical] = (total_weight + weight, weighted_reward + reward * weight, total_count + count)
+    canonical_table = {key: weighted_reward / weight for key, (weight, weighted_reward, _) in totals.items()}
+    canonical_counts = {key: count for key, (_, _, count) in totals.items()}
+    return canonical_table, canonical_counts
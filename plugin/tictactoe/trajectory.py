@@ -0,0 +1,144 @@
+from plugin.tictactoe.game import STATE_STRINGS
+from array import array
+from typing import List
+import struct
+import sys
+import os
+
+MAGIC = b"TTTG"
+VERSION = 1
+HEADER = struct.Struct("<4sHH") # Magic, version and padding, so records stay 8 byte aligned
+MARKER_CODES = {None: 0, "X": 1, "O": 2}
+MARKERS = (None, "X", "O")
+POWERS_OF_3 = tuple(3 ** i for i in range(9))
+
+
+def pack_game(first: str, moves: List[int], blocked: int, winner: str):
+    """
+    Pack a finished game into one 64 bit record.
+
+    Bits 0-1 hold the marker that moved first, bits 2-3 the winner, bits 4-7 the number of moves,
+    bits 8-16 which moves blocked a win and every 4 bits from bit 17 one move.
+
+    :param first: The marker that moved first.
+    :param moves: The positions played in order.
+    :param blocked: A mask with bit i set if move i blocked a win.
+    :param winner: The winning marker, None on a draw.
+    """
+    packed = MARKER_CODES[first] | MARKER_CODES[winner] << 2 | len(moves) << 4 | blocked << 8
+    for i, position in enumerate(moves):
+        packed |= position << (17 + 4 * i)
+    return packed
+
+
+def unpack_game(packed: int):
+    """
+    Unpack a record packed by pack_game.
+
+    :return: The first marker, the moves, the blocked mask and the winner.
+    """
+    moves = [packed >> (17 + 4 * i) & 15 for i in range(packed >> 4 & 15)]
+    return MARKERS[packed & 3], moves, packed >> 8 & 511, MARKERS[packed >> 2 & 3]
+
+
+def game_states(first: str, moves: List[int]):
+    """Get the board state after every move of a game without playing it on a board."""
+    digit = MARKER_CODES[first]
+    index = 0
+    states = []
+    for position in moves:
+        index += digit * POWERS_OF_3[position]
+        states.append(STATE_STRINGS[index])
+        digit = 3 - digit
+    return states
+
+
+class TrajectoryWriter:
+    """
+    Append finished games to a trajectory log, a header followed by one 8 byte record per game.
+
+    Records are buffered and written in blocks, call flush to make sure every recorded game is on disk.
+    """
+
+    def __init__(self, path: str, games: int=None, buffer_size: int=4096):
+        """
+        Open a log for appending, creating it if it does not exist.
+
+        :param path: The log file.
+        :param games: Drop every game past this many, so a log stays in step with a brain resumed from a
+            checkpoint. None keeps them all.
+        :param buffer_size: The number of games buffered before they are written.
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = array("Q")
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, 0))
+        else:
+            check_header(path)
+            if games is not None and self.file.tell() > HEADER.size + 8 * games:
+                self.file.truncate(HEADER.size + 8 * games)
+        self.file.seek(0, os.SEEK_END)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, first: str, moves: List[int], blocked: int, winner: str):
+        """Record a finished game, see pack_game."""
+        self.buffer.append(pack_game(first, moves, blocked, winner))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered games."""
+        if self.buffer:
+            if sys.byteorder != "little":
+                self.buffer.byteswap()
+            self.buffer.tofile(self.file)
+            self.buffer = array("Q")
+        self.file.flush()
+
+    def close(self):
+        """Write the buffered games and close the log."""
+        self.flush()
+        self.file.close()
+
+
+def check_header(path: str):
+    """Raise ValueError if a file is not a trajectory log."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) != HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, VERSION):
+        raise ValueError(f"{path} is not a version {VERSION} trajectory log")
+
+
+def count_games(path: str):
+    """Get the number of games in a trajectory log."""
+    check_header(path)
+    return (os.path.getsize(path) - HEADER.size) // 8
+
+
+def read_games(path: str, chunk: int=65536):
+    """
+    Stream the records of a trajectory log in chunks, so a log of any size is read in bounded memory.
+
+    :param chunk: The most records per chunk.
+    :return: A generator of arrays of packed games.
+    """
+    check_header(path)
+    with open(path, "rb") as f:
+        f.seek(HEADER.size)
+        while True:
+            data = f.read(8 * chunk)
+            records = array("Q")
+            records.frombytes(data[:len(data) - len(data) % 8]) # A torn last record is left out
+            if sys.byteorder != "little":
+                records.byteswap()
+            if records:
+                yield records
+            if len(data) < 8 * chunk:
+                return
@@ -0,0 +1,269 @@
+from plugin.tictactoe.agent import Agent, Brain
+from plugin.tictactoe.rewards import FlatRewardStore
+from plugin.tictactoe.trajectory import count_games, game_states, read_games, unpack_game
+from simple_selfplay import save_agent
+from tqdm import tqdm
+import numpy as np
+import argparse
+import time
+
+#The rewards self play teaches with.
+DEFAULT_REWARDS = {"win": 1, "loss": -0.33, "draw": 0.2, "block": 0.5, "blocked": 0}
+
+
+def game_lessons(packed: int, markers, rewards):
+    """
+    Work out what each agent learns from a recorded game.
+
+    :param packed: The game, packed by pack_game.
+    :param markers: The markers of the agents.
+    :param rewards: The reward for a win, loss, draw, blocking a win and having a win blocked.
+    :return: The board states of the game and, for each marker, its move rewards and outcome reward.
+    """
+    first, moves, blocked, winner = unpack_game(packed)
+    second = "O" if first == "X" else "X"
+    lessons = []
+    for marker in markers:
+        move_rewards = [
+            None if not blocked >> i & 1 else rewards["block"] if (first if i % 2 == 0 else second) == marker else rewards["blocked"]
+            for i in range(len(moves))
+        ]
+        if winner is None:
+            reward = rewards["draw"]
+        else:
+            reward = rewards["win"] if winner == marker else rewards["loss"]
+        lessons.append((move_rewards, reward))
+    return game_states(first, moves), lessons
+
+
+def history_keys(states, canonical: bool=False):
+    """Get the flat keys of every prefix of a game's history, starting with the empty history."""
+    if not canonical:
+        keys = [""]
+        for state in states:
+            keys.append(state if len(keys) == 1 else f"{keys[-1]}-{state}")
+        return keys
+    brain = _KEY_BRAIN
+    context = brain.root_context()
+    keys = [context[0]]
+    for state in states:
+        context = brain.extend_context(context, state)
+        keys.append(context[0])
+    return keys
+
+
+#A canonical brain over a flat store, whose cursors are the history keys.
+_KEY_BRAIN = Brain(FlatRewardStore(), canonical=True)
+
+
+class BulkRewards:
+    """
+    The rewards of one brain, rebuilt from a stream of reward updates a chunk at a time.
+
+    Updates to different histories never affect each other, so a chunk of updates is grouped by history
+    and every history folds its updates in one step with numpy, using the closed form of the brain's update
+    rule. The result matches updating one at a time up to rounding.
+    """
+
+    def __init__(self, brain: Brain):
+        """
+        Start from the brain's current rewards.
+
+        :param brain: The brain to rebuild, its learning rate and falloff are used.
+        """
+        self.brain = brain
+        self.table = brain.reward_table
+        self.table_counts = brain.store.to_flat_counts()
+        self.ids = {} # History key to index into the arrays below
+        self.keys = []
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.new_values = []
+        self.new_counts = []
+        self.patterns = {} # Move and outcome rewards to the updates of a game with them
+
+    def game_updates(self, keys, move_rewards, reward):
+        """
+        Get the reward updates learn_game would make for a game, in order.
+
+        :param keys: The history keys of the game, see history_keys.
+        :return: The history indexes and rewards of the updates, as arrays.
+        """
+        ids = self.ids
+        key_ids = []
+        for key in keys:
+            index = ids.get(key)
+            if index is None:
+                index = ids[key] = len(self.keys)
+                self.keys.append(key)
+                self.new_values.append(self.table.get(key, np.nan))
+                self.new_counts.append(self.table_counts.get(key, 0))
+            key_ids.append(index)
+        pattern = (tuple(move_rewards), reward)
+        updates = self.patterns.get(pattern)
+        if updates is None:
+            updates = self.patterns[pattern] = self._pattern(move_rewards, reward)
+        positions, rewards = updates
+        return np.array(key_ids, dtype=np.int64)[positions], rewards
+
+    def _pattern(self, move_rewards, reward):
+        """
+        Get the updates of every game with the same move and outcome rewards, as positions in the game's history.
+
+        :return: The history positions and rewards of the updates, as arrays.
+        """
+        falloff = self.brain.falloff
+        positions = []
+        rewards = []
+        for length in range(1, len(move_rewards) + 1):
+            #Mirrors Brain._set_rewards, the empty history and then every prefix but the whole history
+            cursors = [0] + [length - i for i in range(1, length)]
+            positions += cursors
+            rewards += [0] * length
+            move_reward = move_rewards[length - 1]
+            if move_reward is not None:
+                positions += cursors
+                rewards += [move_reward / (falloff ** (length - 1 - i)) for i in range(length)]
+        positions += cursors
+        rewards += [reward / (falloff ** (length - 1 - i)) for i in range(length)]
+        return np.array(positions, dtype=np.int64), np.array(rewards)
+
+    def apply(self, update_ids: np.ndarray, rewards: np.ndarray):
+        """Apply a chunk of updates in order."""
+        if self.new_values:
+            self.values = np.concatenate([self.values, self.new_values])
+            self.counts = np.concatenate([self.counts, np.array(self.new_counts, dtype=np.int64)])
+            self.new_values = []
+            self.new_counts = []
+        order = np.argsort(update_ids, kind="stable")
+        update_ids = update_ids[order]
+        rewards = rewards[order]
+        starts = np.flatnonzero(np.r_[True, update_ids[1:] != update_ids[:-1]])
+        keys = update_ids[starts]
+        updates = np.diff(np.r_[starts, len(update_ids)])
+        old = self.values[keys]
+        old_counts = self.counts[keys]
+        unset = np.isnan(old)
+        rate = self.brain.learning_rate
+        if rate is None:
+            #The incremental mean weighs the old reward by its count, a set reward with no count weighs as one
+            #update, but is averaged with the first new reward before that update is counted
+            totals = np.add.reduceat(rewards, starts)
+            weight = np.maximum(old_counts, 1)
+            new = np.where(unset, totals / updates, (weight * np.where(unset, 0, old) + totals) / (weight + updates))
+            uncounted = ~unset & (old_counts == 0)
+            first_rewards = rewards[starts]
+            new = np.where(uncounted, ((old + first_rewards) / 2 + totals - first_rewards) / updates, new)
+        else:
+            #Each update moves rate of the way to its reward, so the k-th of m updates keeps (1 - rate) ** (m - k)
+            #of its pull, and the first update of an unset history sets the reward outright
+            decay = 1 - rate
+            remaining = np.repeat(updates, updates) - 1 - (np.arange(len(update_ids)) - np.repeat(starts, updates))
+            weights = rate * decay ** remaining
+            first_unset = starts[unset]
+            weights[first_unset] = decay ** remaining[first_unset]
+            new = np.where(unset, 0, old * decay ** updates) + np.add.reduceat(weights * rewards, starts)
+        self.values[keys] = new
+        self.counts[keys] = old_counts + updates
+
+    def finish(self):
+        """Replace the brain's rewards with the rebuilt ones."""
+        table = dict(self.table)
+        counts = dict(self.table_counts)
+        for key, reward, count in zip(self.keys, self.values.tolist(), self.counts.tolist()):
+            if reward == reward:
+                table[key] = reward
+                counts[key] = count
+        self.brain.set_reward_table(table, counts, canonical_keys=True)
+
+
+def retrain(trajectory_log: str, agents, rewards=DEFAULT_REWARDS, chunk: int=65536, cache_size: int=100000, progress: bool=True):
+    """
+    Rebuild agents' brains in bulk from every game of a trajectory log, as if they had played them in self play.
+
+    No moves are ranked or sampled and no boards are played. The updates of games that repeat are worked
+    out once, and each chunk of games is applied to the rewards in one step per history, see BulkRewards.
+
+    :param trajectory_log: The log written by self_play_loop.
+    :param agents: The agents to teach, usually a fresh X and O agent.
+    :param rewards: The reward settings, see DEFAULT_REWARDS.
+    :param chunk: The number of games read and applied at a time.
+    :param cache_size: The most distinct games whose updates are kept.
+    :return: The number of games learned.
+    """
+    markers = [agent.marker for agent in agents]
+    bulk = [BulkRewards(agent.brain) for agent in agents]
+    canonicals = {agent.brain.canonical for agent in agents}
+    cache = {}
+    games = 0
+    with tqdm(total=count_games(trajectory_log), disable=not progress) as bar:
+        for records in read_games(trajectory_log, chunk):
+            chunk_updates = [[] for _ in agents]
+            for packed in records:
+                updates = cache.get(packed)
+                if updates is None:
+                    if len(cache) >= cache_size:
+                        cache.clear()
+                    states, lessons = game_lessons(packed, markers, rewards)
+                    keys = {canonical: history_keys(states, canonical) for canonical in canonicals}
+                    updates = cache[packed] = [
+                        brain.game_updates(keys[brain.brain.canonical], *lesson) for brain, lesson in zip(bulk, lessons)
+                    ]
+                for agent_updates, game_updates in zip(chunk_updates, updates):
+                    agent_updates.append(game_updates)
+            for brain, agent_updates in zip(bulk, chunk_updates):
+                brain.apply(np.concatenate([ids for ids, _ in agent_updates]), np.concatenate([values for _, values in agent_updates]))
+            games += len(records)
+            bar.update(len(records))
+    for brain in bulk:
+        brain.finish()
+    return games
+
+
+def replay(trajectory_log: str, agents, rewards=DEFAULT_REWARDS, chunk: int=65536, progress: bool=True):
+    """
+    Teach agents every game of a trajectory log one game at a time with learn_game.
+
+    Slower than retrain, but with the default rewards, falloff and learning rate it rebuilds exactly,
+    bit for bit, the brains self play trained while recording the log.
+
+    :return: The number of games learned.
+    """
+    markers = [agent.marker for agent in agents]
+    games = 0
+    with tqdm(total=count_games(trajectory_log), disable=not progress) as bar:
+        for records in read_games(trajectory_log, chunk):
+            for packed in records:
+                states, lessons = game_lessons(packed, markers, rewards)
+                for agent, (move_rewards, reward) in zip(agents, lessons):
+                    agent.brain.learn_game(states, move_rewards, reward)
+            games += len(records)
+            bar.update(len(records))
+    return games
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild brain1.json and brain2.json from a trajectory log with other reward settings.")
+    parser.add_argument("trajectory_log")
+    for name, reward in DEFAULT_REWARDS.items():
+        parser.add_argument(f"--{name}", type=float, default=reward, help=f"Defaults to {reward}")
+    parser.add_argument("--falloff", type=float, default=2, help="How much rewards shrink for each earlier move")
+    parser.add_argument("--learning-rate", default="0.5", help="A rate, or mean for the incremental mean")
+    parser.add_argument("--store", choices=["flat", "trie"], default=None)
+    parser.add_argument("--canonical", action="store_true", help="Share learning across rotations and reflections.")
+    parser.add_argument("--chunk", type=int, default=65536)
+    parser.add_argument("--exact", action="store_true", help="Replay the games one at a time for a bit exact rebuild")
+    parser.add_argument("--output", nargs=2, default=["brain1.json", "brain2.json"], metavar=("X_BRAIN", "O_BRAIN"))
+    args = parser.parse_args()
+
+    learning_rate = None if args.learning_rate == "mean" else float(args.learning_rate)
+    agents = [Agent(marker=marker, store=args.store, canonical=args.canonical, learning_rate=learning_rate) for marker in ("X", "O")]
+    for agent in agents:
+        agent.brain.falloff = args.falloff
+    rewards = {name: getattr(args, name) for name in DEFAULT_REWARDS}
+    start = time.perf_counter()
+    games = (replay if args.exact else retrain)(args.trajectory_log, agents, rewards, args.chunk)
+    print(f"Learned {games:,} games in {time.perf_counter() - start:.2f}s")
+    for agent, brain_file in zip(agents, args.output):
+        save_agent(agent, brain_file)
+    print(f"Saved {args.output[0]} and {args.output[1]}")
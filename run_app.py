@@ -1,6 +1,23 @@
-from plugin.__init__ import CORS_ON, PORT
+from plugin.__init__ import AGENT_MODE, CORS_ON, PORT, SESSION_DB, SESSION_TTL, MAX_SESSIONS, SERVE_MODE, WORKERS
+from plugin.tictactoe.sessions import MemorySessionStore, SQLiteSessionStore
 from plugin.app import App
+import argparse
 
 if __name__ == "__main__":
-    app = App(name="Template Plugin", cors_on=CORS_ON, port=PORT)
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the plugin, with the development server unless asked for production.")
+    parser.add_argument("--production", action="store_true", default=SERVE_MODE == "production", help="Serve with Hypercorn and debug off")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes in production, more than one needs SESSION_DB")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--session-db", default=SESSION_DB, help="SQLite file for sessions shared by workers")
+    parser.add_argument("--agent-mode", choices=("brain", "solver"), default=AGENT_MODE, help="solver plays only perfect moves")
+    args = parser.parse_args()
+
+    if args.session_db:
+        sessions = SQLiteSessionStore(args.session_db, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS)
+    else:
+        sessions = MemorySessionStore(ttl=SESSION_TTL, max_sessions=MAX_SESSIONS)
+    app = App(name="Template Plugin", cors_on=CORS_ON, port=args.port, sessions=sessions, agent_mode=args.agent_mode)
+    if args.production:
+        app.serve(args.workers)
+    else:
+        app.run()
@@ -1,5 +1,10 @@
-from plugin.tictactoe.agent import Agent
-from plugin.tictactoe.game import Board
+from plugin.tictactoe.agent import Agent, get_best_move
+from plugin.tictactoe.brainfile import load_reward_store
+from plugin.tictactoe.checkpoint import Checkpointer, resume_together
+from plugin.tictactoe.pruning import load_fallback, save_fallback
+from plugin.tictactoe.symmetry import canonicalize_table
+from plugin.tictactoe.trajectory import TrajectoryWriter
+from plugin.tictactoe.game import BitBoard, MNKBoard
 from typing import Dict
 from tqdm import tqdm
 import numpy as np
@@ -27,96 +32,169 @@ def random_weighted_move(possible_moves: Dict[str, object]):
     weights = [modified_sigmoid(x) for x in weights]
     return random.choices(moves, weights=weights)[0]
 
-def get_best_move(possible_moves: Dict[str, object]):
-    """Get the best move random on a tie."""
-    best_move = []
-    best_rewards = []
-    for move in possible_moves.keys():
-        reward = possible_moves[move]["reward"]
-        if len(best_move) == 0:
-            best_move.append(move)
-            best_rewards.append(reward)
-            continue
-        if reward > best_rewards[0]:
-            best_move = [move]
-            best_rewards = [reward]
-        elif reward == best_rewards[0]:
-            best_move.append(move)
-            best_rewards.append(reward)
-
-    best_move = random.choice(best_move)
-    return possible_moves[best_move]["index"]
-
-def load_agent(brain_file, marker):
-    """Load an agent from a brain file."""
-    with open(brain_file, "r") as f:
-        brain = json.load(f)
-    agent = Agent(marker=marker)
-    agent.brain.reward_table = brain
+def load_agent(brain_file, marker, store=None, canonical=False, cells=9, budget=None):
+    """
+    Load an agent from a JSON or binary brain file.
+
+    :param store: The name of one of the REWARD_STORES to load into, a flat one by default. Binary files are
+        loaded into it too rather than memory mapped, since the agent learns from every move it sees.
+    :param canonical: Load the brain canonically, folding the keys of a non canonical brain onto their canonical form.
+    :param cells: The number of positions on the board the brain plays, see Brain.
+    :param budget: The most histories the brain keeps, see Brain.
+    """
+    reward_store = load_reward_store(brain_file, store or "flat")
+    if canonical:
+        reward_store = type(reward_store).from_flat(*canonicalize_table(reward_store.to_flat(), reward_store.to_flat_counts()))
+    agent = Agent(marker=marker, store=reward_store, canonical=canonical, cells=cells, budget=budget)
+    agent.brain.fallback = load_fallback(brain_file)
     print(f"Loaded agent {marker} from brain file {brain_file}")
     return agent
 
-def self_play_loop(epochs: int, load_brains: bool=True, debug: bool=False):
-    """Loop for self play."""
-    board = Board()
-    agent1 = Agent(marker="X")
-    agent2 = Agent(marker="O")
+def save_agent(agent, brain_file):
+    """Save an agent's brain as a flat JSON reward table, with the fallback rewards of a pruned brain next to it."""
+    with open(brain_file, "w") as f:
+        json.dump(agent.brain.reward_table, indent=4, fp=f)
+    save_fallback(brain_file, agent.brain.fallback)
+
+def reward_blocked_win(agent1, agent2, blocker):
+    """Reward the player that blocked a win without ending either agent's game."""
+    if blocker == agent1.marker:
+        agent1.calculate_reward(0.5, False)
+        agent2.calculate_reward(0, False)
+    else:
+        agent1.calculate_reward(0, False)
+        agent2.calculate_reward(0.5, False)
+
+def reward_game_end(agent1, agent2, winner):
+    """Reward both agents for the outcome of a game and reset their past moves."""
+    if winner == agent1.marker:
+        agent1.calculate_reward(1)
+        agent2.calculate_reward(-0.33)
+    elif winner == agent2.marker:
+        agent1.calculate_reward(-0.33)
+        agent2.calculate_reward(1)
+    else:
+        agent1.calculate_reward(0.2)
+        agent2.calculate_reward(0.2)
+
+def play_training_game(board, agent1, agent2, move_picker=random_weighted_move, recorder=None):
+    """
+    Play one self play game on the board, teaching both agents every move.
+
+    :param recorder: A TrajectoryWriter the game is recorded to.
+    :return: The winner of the game, None on a draw.
+    """
+    board.reset()
+    first = "O" if board.last_player == "X" else "X"
+    played = [] # The moves of the game, kept here since not every board records them
+    blocked = 0
+    while not board.is_game_over():
+        current_player = agent1 if board.last_player == agent2.marker else agent2
+        moves = current_player.get_possible_moves_experimental()
+        move = move_picker(moves)
+        board.make_move(move)
+        played.append(move)
+        board_move = board.get_board_state()
+        agent1.add_move(board_move)
+        agent2.add_move(board_move)
+        #Check if the last move blocked a win and reward the blocking player
+        if board.check_if_last_move_blocked_win():
+            blocked |= 1 << (len(played) - 1)
+            reward_blocked_win(agent1, agent2, board.last_player)
+    winner = board.get_winner()
+    reward_game_end(agent1, agent2, winner)
+    if recorder is not None:
+        recorder.record(first, played, blocked, winner)
+    return winner
+
+def self_play_loop(epochs: int, load_brains: bool=True, debug: bool=False, store=None, canonical: bool=False,
+                   checkpoint_dir: str=None, checkpoint_epochs: int=None, checkpoint_seconds: float=None,
+                   learning_rate=0.5, converge_every: int=None, converge_threshold: float=None, trajectory_log: str=None,
+                   board_size=None, budget: int=None):
+    """
+    Loop for self play.
+
+    :param checkpoint_dir: Checkpoint both brains to this directory during training, resuming from
+        the checkpoints already there instead of loading the brain files.
+    :param checkpoint_epochs: Checkpoint after this many epochs.
+    :param checkpoint_seconds: Checkpoint after this many seconds.
+    :param learning_rate: The update rule of both brains, see Brain.
+    :param converge_every: Check every this many epochs whether the brains have settled.
+    :param converge_threshold: Stop early once the mean absolute reward change of both brains over
+        the last converge_every epochs is below this.
+    :param trajectory_log: Append every game to this trajectory log, so the brains can be rebuilt with
+        other reward settings by retrain.py without playing the games again.
+    :param board_size: The rows, columns and number in a row of an MNKBoard to train on, 3x3 tic tac
+        toe on a BitBoard if None.
+    :param budget: The most histories each brain keeps, pruning the rest, see Brain. None keeps them all.
+    """
+    if board_size is None or tuple(board_size) == (3, 3, 3):
+        board = BitBoard()
+    else:
+        board = MNKBoard(*board_size)
+        if trajectory_log is not None:
+            raise ValueError("Trajectory logs only record 3x3 games")
+    agent1 = Agent(marker="X", store=store, canonical=canonical, learning_rate=learning_rate, cells=board.cells, budget=budget)
+    agent2 = Agent(marker="O", store=store, canonical=canonical, learning_rate=learning_rate, cells=board.cells, budget=budget)
 
     if load_brains:
         brain_file = ".\\brain1.json"
-        agent1 = load_agent(brain_file, "X")
+        agent1 = load_agent(brain_file, "X", store, canonical, board.cells, budget)
         brain_file = ".\\brain2.json"
-        agent2 = load_agent(brain_file, "O")
-
-    for epoch in tqdm(range(epochs)):
-            board.reset()
-            while not board.is_game_over():
-                current_player = agent1 if board.last_player == agent2.marker else agent2
-                moves = current_player.get_possible_moves_experimental()
-                move = random_weighted_move(moves)
-                board.make_move(move)
-                board_move = board.get_board_state()
-                agent1.add_move(board_move)
-                agent2.add_move(board_move)
-                #Check if the last move blocked a win and reward the blocking player
-                if board.check_if_last_move_blocked_win():
-                    if board.last_player == agent1.marker:
-                        agent1.calculate_reward(0.5, False)
-                        agent2.calculate_reward(0, False)
-                    else:
-                        agent1.calculate_reward(0, False)
-                        agent2.calculate_reward(0.5, False)
-            winner = board.get_winner()
-            if winner == agent1.marker:
-                agent1.calculate_reward(1)
-                agent2.calculate_reward(-0.33)
-            elif winner == agent2.marker:
-                agent1.calculate_reward(-0.33)
-                agent2.calculate_reward(1)
-            else:
-                agent1.calculate_reward(0.2)
-                agent2.calculate_reward(0.2)
-            if DEBUG:
-                print(f"Epoch: {epoch} Winner: {winner}")
-                board.print_board()
-                input("Press enter to continue...")
-
+        agent2 = load_agent(brain_file, "O", store, canonical, board.cells, budget)
+        agent1.brain.learning_rate = agent2.brain.learning_rate = learning_rate
+
+    checkpointers = []
+    start_epoch = 0
+    if checkpoint_dir is not None:
+        checkpointers = [
+            Checkpointer(agent.brain, checkpoint_dir, name, checkpoint_epochs, checkpoint_seconds)
+            for agent, name in ((agent1, "brain1"), (agent2, "brain2"))
+        ]
+        start_epoch = resume_together(checkpointers)
+        if start_epoch:
+            print(f"Resumed from checkpoint at epoch {start_epoch}")
+    recorder = None
+    if trajectory_log is not None:
+        #Games played after the checkpoint are played again, so they are dropped from the log
+        recorder = TrajectoryWriter(trajectory_log, start_epoch if checkpointers else None)
+
+    for epoch in tqdm(range(start_epoch, epochs), initial=start_epoch, total=epochs):
+        winner = play_training_game(board, agent1, agent2, recorder=recorder)
+        #Both brains checkpoint whenever either is due, so they always resume from the same epoch
+        checkpointed = any(checkpointer.is_due(epoch + 1) for checkpointer in checkpointers)
+        if checkpointed:
+            for checkpointer in checkpointers:
+                checkpointer.checkpoint(epoch + 1)
+        if checkpointed and recorder is not None:
+            recorder.flush()
+        if debug:
+            print(f"Epoch: {epoch} Winner: {winner}")
+            board.print_board()
+            input("Press enter to continue...")
+        if converge_every and (epoch + 1) % converge_every == 0:
+            #A brain with no updates in the window has no mean change and does not hold back the other
+            changes = [change for change in (agent1.brain.take_mean_change(), agent2.brain.take_mean_change()) if change is not None]
+            if converge_threshold is not None and changes and max(changes) < converge_threshold:
+                print(f"Converged after {epoch + 1} epochs, mean reward change {max(changes):.6f}")
+                epochs = epoch + 1
+                break
+
+    if recorder is not None:
+        recorder.close()
     print("Training complete")
     print("Saving brains...")
-    with open("brain1.json", "w") as f:
-        brain = json.dump(agent1.brain.reward_table, indent=4, fp=f)
-    with open("brain2.json", "w") as f:
-        brain = json.dump(agent2.brain.reward_table, indent=4, fp=f)
+    for checkpointer in checkpointers:
+        checkpointer.checkpoint(epochs)
+    save_agent(agent1, "brain1.json")
+    save_agent(agent2, "brain2.json")
     print("Brains saved")
 
 def play_human(brain_file: str):
-    board = Board()
+    board = BitBoard()
 
     #Load brain
-    with open(brain_file, "r") as f:
-        brain = json.load(f)
-    agent = Agent(marker="O")
-    agent.brain.reward_table = brain
+    agent = load_agent(brain_file, "O")
 
     #Make loop for human and computer player
     while True: